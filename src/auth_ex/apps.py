@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class AuthExConfig(AppConfig):
     name = "auth_ex"
+
+    def ready(self):
+        from auth_ex.signals import connect_signals
+
+        connect_signals()
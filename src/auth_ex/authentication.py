@@ -0,0 +1,26 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from auth_ex import cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication keeping token to user mapping and user snapshots in the cache.
+    Entries are invalidated by callbacks in auth_ex.signals, connected in AuthExConfig.ready.
+    """
+
+    def authenticate_credentials(self, key: str):
+        user_id = cache.get_token_user_id(key)
+        user = cache.get_user(user_id) if user_id is not None else None
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set_token_user_id(key, user.id)
+            cache.set_user(user)
+            return user, token
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        # Views only need the key, the token row itself is not fetched.
+        return user, self.get_model()(key=key, user=user)
@@ -0,0 +1,21 @@
+from django.contrib.auth.backends import ModelBackend
+
+from auth_ex import cache
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Keeps the set of user's permissions in the cache instead of loading user and group
+    permissions from the database in every request.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, "_perm_cache"):
+            permissions = cache.get_permissions(user_obj.id)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set_permissions(user_obj.id, permissions)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
@@ -0,0 +1,88 @@
+import copy
+from typing import Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+
+from auth_ex.models import User
+from common.cache import LocalTTLCache
+
+TOKEN_KEY = "auth:token:{key}"
+USER_KEY = "auth:user:{user_id}"
+PERMISSIONS_KEY = "auth:permissions:{version}:{user_id}"
+PERMISSIONS_VERSION_KEY = "auth:permissions-version"
+
+local_cache = LocalTTLCache(
+    max_size=settings.AUTH_LOCAL_CACHE_SIZE, timeout=settings.AUTH_LOCAL_CACHE_TIMEOUT
+)
+
+
+def get_token_user_id(key: str) -> Optional[int]:
+    return _get(TOKEN_KEY.format(key=key))
+
+
+def set_token_user_id(key: str, user_id: int):
+    _set(TOKEN_KEY.format(key=key), user_id)
+
+
+def get_user(user_id: int) -> Optional[User]:
+    user = _get(USER_KEY.format(user_id=user_id))
+    # Django caches permissions on user instances, so the snapshot itself must stay untouched.
+    return copy.copy(user)
+
+
+def set_user(user: User):
+    _set(USER_KEY.format(user_id=user.id), copy.copy(user))
+
+
+def get_permissions(user_id: int) -> Optional[Set[str]]:
+    return _get(PERMISSIONS_KEY.format(version=_get_permissions_version(), user_id=user_id))
+
+
+def set_permissions(user_id: int, permissions: Set[str]):
+    _set(PERMISSIONS_KEY.format(version=_get_permissions_version(), user_id=user_id), permissions)
+
+
+def invalidate_token(key: str):
+    _delete(TOKEN_KEY.format(key=key))
+
+
+def invalidate_user(user_id: int):
+    _delete(USER_KEY.format(user_id=user_id))
+    _delete(PERMISSIONS_KEY.format(version=_get_permissions_version(), user_id=user_id))
+
+
+def invalidate_all_permissions():
+    # Group and permission changes affect many users, so all their entries are dropped at once.
+    try:
+        cache.incr(PERMISSIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMISSIONS_VERSION_KEY, 1, timeout=None)
+    local_cache.delete(PERMISSIONS_VERSION_KEY)
+
+
+def _get_permissions_version() -> int:
+    version = local_cache.get(PERMISSIONS_VERSION_KEY)
+    if version is None:
+        version = cache.get_or_set(PERMISSIONS_VERSION_KEY, 0, timeout=None)
+        local_cache.set(PERMISSIONS_VERSION_KEY, version)
+    return version
+
+
+def _get(key: str):
+    value = local_cache.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is not None:
+            local_cache.set(key, value)
+    return value
+
+
+def _set(key: str, value):
+    cache.set(key, value, timeout=settings.AUTH_CACHE_TIMEOUT)
+    local_cache.set(key, value)
+
+
+def _delete(key: str):
+    cache.delete(key)
+    local_cache.delete(key)
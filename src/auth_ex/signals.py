@@ -0,0 +1,40 @@
+from django.contrib.auth.models import Group, Permission
+from rest_framework.authtoken.models import Token
+
+from auth_ex import cache
+from auth_ex.models import User
+
+
+def token_deleted_callback(sender: type, instance: Token, **kwargs):
+    cache.invalidate_token(instance.key)
+
+
+def user_changed_callback(sender: type, instance: User, **kwargs):
+    cache.invalidate_user(instance.id)
+
+
+def user_permissions_changed_callback(sender: type, instance, action: str, reverse: bool, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, User):
+        cache.invalidate_user(instance.id)
+    else:
+        # Changed from the group or permission side, possibly for many users.
+        cache.invalidate_all_permissions()
+
+
+def permissions_changed_callback(sender: type, instance, **kwargs):
+    cache.invalidate_all_permissions()
+
+
+def connect_signals():
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    post_delete.connect(token_deleted_callback, sender=Token)
+    post_save.connect(user_changed_callback, sender=User)
+    post_delete.connect(user_changed_callback, sender=User)
+    m2m_changed.connect(user_permissions_changed_callback, sender=User.user_permissions.through)
+    m2m_changed.connect(user_permissions_changed_callback, sender=User.groups.through)
+    m2m_changed.connect(permissions_changed_callback, sender=Group.permissions.through)
+    post_delete.connect(permissions_changed_callback, sender=Group)
+    post_delete.connect(permissions_changed_callback, sender=Permission)
@@ -1,8 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import TestCase
 from parameterized import parameterized
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
+from auth_ex.cache import local_cache
+
 
 class AuthenticationTestCAse(APITestCase):
     def test_create_account_with_blank_email(self):
@@ -115,3 +121,78 @@ class AccessToOwnDataTestCase(APITestCase):
             return path
         else:
             return f"{path}{user_id}/"
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = "/api/v1/courses/"
+
+    def test_cached_authentication(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Only counting courses (there are none to select), no token nor user lookup.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token(self):
+        self.client.get(self.url)
+
+        self.token.delete()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user(self):
+        self.client.get(self.url)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedModelBackendTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.User = get_user_model()
+        self.user = self.User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+        self.permission = Permission.objects.get(codename="add_course")
+
+    def _get_fresh_user(self):
+        return self.User.objects.get(id=self.user.id)
+
+    def test_permissions_are_cached(self):
+        self.assertFalse(self._get_fresh_user().has_perm("courses.add_course"))
+
+        user = self._get_fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm("courses.add_course"))
+
+    def test_user_permission_change(self):
+        self.assertFalse(self._get_fresh_user().has_perm("courses.add_course"))
+
+        self.user.user_permissions.add(self.permission)
+
+        self.assertTrue(self._get_fresh_user().has_perm("courses.add_course"))
+
+    def test_group_permission_change(self):
+        group = Group.objects.create(name="authors")
+        self.user.groups.add(group)
+        self.assertFalse(self._get_fresh_user().has_perm("courses.add_course"))
+
+        group.permissions.add(self.permission)
+
+        self.assertTrue(self._get_fresh_user().has_perm("courses.add_course"))
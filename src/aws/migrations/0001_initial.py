@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('references', models.PositiveIntegerField(default=1)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db.models import BigIntegerField, CharField, DateTimeField, Model, PositiveIntegerField
+
+
+class Blob(Model):
+    """
+    File stored by content addressed storages, see aws.storages.ContentAddressedStorageMixin.
+    References count saved files pointing to the blob, it is deleted when none is left.
+    """
+
+    name = CharField(max_length=255, unique=True)
+    size = BigIntegerField()
+    references = PositiveIntegerField(default=1)
+    created = DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import boto3
+from django.conf import settings
+from django.core.cache import cache
+
+from common.cache import LocalTTLCache
+
+CACHE_KEY = "aws:presigned-url:{digest}"
+
+
+def create_s3_client():
+    # Clients are thread safe and expensive to create, so one is shared by the whole process.
+    return boto3.session.Session().client(
+        "s3",
+        region_name=getattr(settings, "AWS_S3_REGION_NAME", None),
+        endpoint_url=getattr(settings, "AWS_S3_ENDPOINT_URL", None),
+    )
+
+
+class PresignedUrlSigner:
+    """
+    Generates presigned GET URLs with expiry aligned to time windows as long as the requested
+    expiry. URLs are memoized per (key, window), so within a window every request gets the same,
+    browser cacheable URL. Each URL stays valid for at least `expire` seconds after its window
+    ends, i.e. as long as the caller asked for.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        client_factory: Callable = create_s3_client,
+        clock: Callable[[], float] = time.time,
+        local_cache_size: int = 4096,
+    ):
+        self._bucket_name = bucket_name
+        self._client_factory = client_factory
+        self._client = None
+        self._clock = clock
+        # Keys include the window, so entries are never read after it ends.
+        self._local_cache = LocalTTLCache(max_size=local_cache_size, timeout=60 * 60)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def sign(self, key: str, expire: int = 600) -> str:
+        now = self._clock()
+        window_start = int(now // expire * expire)
+        cache_key = self._get_cache_key(key, expire, window_start)
+
+        url = self._local_cache.get(cache_key)
+        if url is None:
+            # Another process may have signed it in this window already.
+            url = cache.get(cache_key)
+            if url is not None:
+                self._local_cache.set(cache_key, url)
+        if url is not None:
+            self._count(hit=True)
+            return url
+
+        self._count(hit=False)
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self._bucket_name, "Key": key},
+            ExpiresIn=window_start + 2 * expire - int(now),
+        )
+        cache.set(cache_key, url, timeout=window_start + expire - int(now))
+        self._local_cache.set(cache_key, url)
+        return url
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self._hits, "misses": self._misses}
+
+    def _get_cache_key(self, key: str, expire: int, window_start: int) -> str:
+        raw = f"{self._bucket_name}:{expire}:{window_start}:{key}"
+        return CACHE_KEY.format(digest=hashlib.sha256(raw.encode()).hexdigest())
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+
+_signer: Optional[PresignedUrlSigner] = None
+
+
+def get_signer() -> PresignedUrlSigner:
+    global _signer
+    if _signer is None:
+        _signer = PresignedUrlSigner(bucket_name=settings.AWS_STORAGE_BUCKET_NAME)
+    return _signer
@@ -1,7 +1,28 @@
-import boto3
-from django.conf import settings
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Tuple
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
 from storages.backends.s3boto3 import S3Boto3Storage, S3StaticStorage
 
+from aws.models import Blob
+from aws.signing import get_signer
+from common.media import SIGNED_URL_EXPIRE, SignedFileSystemStorage
+
+BLOB_PREFIX = "blobs/"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_blob_name(digest: str, extension: str) -> str:
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def is_blob_name(name: str) -> bool:
+    return name.startswith(BLOB_PREFIX)
+
 
 class BlackSheepS3StaticStorage(S3StaticStorage):
     location = "static/"
@@ -10,15 +31,72 @@ class BlackSheepS3StaticStorage(S3StaticStorage):
 class BlackSheepS3MediaStorage(S3Boto3Storage):
     location = "media/"
 
-    def url(self, name, parameters=None, expire=600, http_method=None):
-        s3_client = boto3.client("s3")
-        response = s3_client.generate_presigned_url(
-            "get_object",
-            Params={
-                "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
-                "Key": f"{self.location}{name}",
-            },
-            ExpiresIn=expire,
-        )
-
-        return response
+    def url(self, name, parameters=None, expire=SIGNED_URL_EXPIRE, http_method=None):
+        return get_signer().sign(f"{self.location}{name}", expire=expire)
+
+
+class ContentAddressedStorageMixin:
+    """
+    Stores files under names derived from the SHA-256 of their content, ignoring the requested
+    path except for the extension. Saving content the storage already has only adds a reference
+    to the existing blob, and deleting removes the blob once no reference is left.
+
+    Blob names never point to different content, so they can be cached as immutable.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        extension = os.path.splitext(name)[1].lower()
+        # Content is hashed while it is spooled, the name is not known before it is read whole.
+        with tempfile.TemporaryFile() as spool:
+            digest, size = _hash_into(content, spool)
+            blob_name = get_blob_name(digest, extension)
+            with transaction.atomic():
+                blob, created = Blob.objects.select_for_update().get_or_create(
+                    name=blob_name, defaults={"size": size}
+                )
+                if not created:
+                    Blob.objects.filter(id=blob.id).update(references=F("references") + 1)
+                if created or not super().exists(blob_name):
+                    spool.seek(0)
+                    super()._save(blob_name, File(spool, name=os.path.basename(name)))
+        return blob_name
+
+    def delete(self, name):
+        if not is_blob_name(name):
+            super().delete(name)
+            return
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.references > 1:
+                Blob.objects.filter(id=blob.id).update(references=F("references") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+class ContentAddressedS3MediaStorage(ContentAddressedStorageMixin, BlackSheepS3MediaStorage):
+    def get_object_parameters(self, name):
+        parameters = super().get_object_parameters(name)
+        # Name is already prefixed with the location here.
+        if is_blob_name(name[len(self.location) :] if name.startswith(self.location) else name):
+            parameters["CacheControl"] = "max-age=31536000, immutable"
+        return parameters
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin, SignedFileSystemStorage):
+    pass
+
+
+def _hash_into(content: File, destination: BinaryIO) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        destination.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
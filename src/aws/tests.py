@@ -1,8 +1,275 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APITestCase
+
+from aws.models import Blob
+from aws.signing import PresignedUrlSigner
+from aws.storages import ContentAddressedFileSystemStorage
+from common.cache import RedisCache, cached, cached_value, local_tiers, stats
 
 
 class HealthViewTestCase(TestCase):
     def test_request(self):
         response = self.client.get("/health/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PresignedUrlSignerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        self.clients_created = 0
+        self.signer = PresignedUrlSigner(
+            bucket_name="test-bucket", client_factory=self._create_client, clock=lambda: self.now
+        )
+
+    def _create_client(self):
+        # Presigning happens locally, a fake endpoint and credentials are enough.
+        self.clients_created += 1
+        return boto3.session.Session().client(
+            "s3",
+            region_name="eu-central-1",
+            endpoint_url="http://localhost:9000",
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+        )
+
+    def test_same_url_within_window(self):
+        first_url = self.signer.sign("media/image.png", expire=600)
+        self.now += 100
+        second_url = self.signer.sign("media/image.png", expire=600)
+
+        self.assertEqual(first_url, second_url)
+        self.assertEqual(self.signer.stats(), {"hits": 1, "misses": 1})
+        self.assertEqual(self.clients_created, 1)
+
+    def test_signs_again_in_next_window(self):
+        self.signer.sign("media/image.png", expire=600)
+        self.now += 600
+        self.signer.sign("media/image.png", expire=600)
+
+        self.assertEqual(self.signer.stats(), {"hits": 0, "misses": 2})
+
+    def test_url_valid_for_requested_time_after_window(self):
+        self.now = 1_000_500.0
+        url = self.signer.sign("media/image.png", expire=600)
+
+        expires_in = int(parse_qs(urlparse(url).query)["X-Amz-Expires"][0])
+        # The window lasts from 1_000_200 to 1_000_800, the URL can be served until its end.
+        self.assertEqual(expires_in, 1_000_800 + 600 - 1_000_500)
+
+    def test_url_shared_between_signers(self):
+        url = self.signer.sign("media/image.png")
+        other_signer = PresignedUrlSigner(
+            bucket_name="test-bucket", client_factory=self._create_client, clock=lambda: self.now
+        )
+
+        self.assertEqual(other_signer.sign("media/image.png"), url)
+        self.assertEqual(other_signer.stats(), {"hits": 1, "misses": 0})
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.storage = ContentAddressedFileSystemStorage(location=self.media_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_same_content_stored_once(self):
+        first_name = self.storage.save("videos/lessons/None/a.mp4", ContentFile(b"video"))
+        second_name = self.storage.save("videos/lessons/2/b.MP4", ContentFile(b"video"))
+
+        self.assertEqual(first_name, second_name)
+        self.assertTrue(first_name.startswith("blobs/"))
+        self.assertTrue(first_name.endswith(".mp4"))
+        self.assertEqual(Blob.objects.get(name=first_name).references, 2)
+        with self.storage.open(first_name) as file:
+            self.assertEqual(file.read(), b"video")
+
+    def test_different_content(self):
+        first_name = self.storage.save("a.txt", ContentFile(b"first"))
+        second_name = self.storage.save("a.txt", ContentFile(b"second"))
+
+        self.assertNotEqual(first_name, second_name)
+
+    def test_delete_last_reference(self):
+        name = self.storage.save("a.txt", ContentFile(b"content"))
+        self.storage.save("b.txt", ContentFile(b"content"))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_missing_blob_uploaded_again(self):
+        name = self.storage.save("a.txt", ContentFile(b"content"))
+        os.remove(self.storage.path(name))
+
+        self.storage.save("b.txt", ContentFile(b"content"))
+
+        self.assertTrue(self.storage.exists(name))
+
+    @override_settings(DEFAULT_FILE_STORAGE="aws.storages.ContentAddressedFileSystemStorage")
+    def test_served_as_immutable(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            name = default_storage.save("a.txt", ContentFile(b"content"))
+            response = self.client.get(default_storage.url(name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("immutable", response["Cache-Control"])
+
+
+class CachedValueTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_tiers.clear()
+        stats.reset()
+        self.calls = 0
+
+    def _compute(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+    def test_value_is_computed_once(self):
+        first = cached_value("test", 1, self._compute, timeout=60)
+        second = cached_value("test", 1, self._compute, timeout=60)
+
+        self.assertEqual(first, {"calls": 1})
+        self.assertEqual(second, {"calls": 1})
+        self.assertEqual(stats.snapshot()["test"]["misses"], 1)
+        self.assertEqual(stats.snapshot()["test"]["hits"], 1)
+
+    def test_none_is_cached(self):
+        compute = mock.Mock(return_value=None)
+        cached_value("test", 1, compute, timeout=60)
+        self.assertIsNone(cached_value("test", 1, compute, timeout=60))
+        compute.assert_called_once()
+
+    def test_version_change_recomputes(self):
+        cached_value("test", 1, self._compute, timeout=60, version=1)
+        value = cached_value("test", 1, self._compute, timeout=60, version=2)
+        self.assertEqual(value, {"calls": 2})
+
+    def test_local_tier(self):
+        cached_value("test", 1, self._compute, timeout=60, local_timeout=60)
+        cache.clear()
+
+        value = cached_value("test", 1, self._compute, timeout=60, local_timeout=60)
+
+        self.assertEqual(value, {"calls": 1})
+        self.assertEqual(stats.snapshot()["test"]["local_hits"], 1)
+
+    @override_settings(CACHE_LOCK_TIMEOUT=1, CACHE_LOCK_POLL_INTERVAL=0.01)
+    def test_waits_for_value_computed_elsewhere(self):
+        cache.add("test:None:1:lock", 1)
+        # Simulates another process storing the value while this one polls.
+        with mock.patch("common.cache.time.sleep", lambda _: cache.set("test:None:1", ("other",))):
+            value = cached_value("test", 1, self._compute, timeout=60)
+
+        self.assertEqual(value, "other")
+        self.assertEqual(self.calls, 0)
+
+    @override_settings(CACHE_LOCK_TIMEOUT=0.05, CACHE_LOCK_POLL_INTERVAL=0.01)
+    def test_computes_when_lock_is_not_released(self):
+        cache.add("test:None:1:lock", 1, timeout=60)
+        value = cached_value("test", 1, self._compute, timeout=60)
+        self.assertEqual(value, {"calls": 1})
+
+    @override_settings(CACHE_TIMEOUT_JITTER=0.1)
+    def test_timeout_jitter(self):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            cached_value("test", 1, self._compute, timeout=100)
+        timeout = cache_set.call_args.kwargs["timeout"]
+        self.assertTrue(90 <= timeout <= 110)
+
+    def test_decorator(self):
+        @cached("test", timeout=60)
+        def add(a, b):
+            self.calls += 1
+            return a + b
+
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(add(2, 2), 4)
+        self.assertEqual(self.calls, 2)
+
+
+class RedisCacheTestCase(TestCase):
+    def setUp(self):
+        # Tests run with an in-process cache, see common.testing. Parallel test processes share
+        # the Redis database, so each one uses its own prefix.
+        self.cache = RedisCache(settings.CACHE_URL, {"KEY_PREFIX": f"test-{os.getpid()}"})
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_add(self):
+        self.assertTrue(self.cache.add("key", "value"))
+        self.assertFalse(self.cache.add("key", "other"))
+        self.assertEqual(self.cache.get("key"), "value")
+
+    def test_incr(self):
+        self.cache.set("counter", 1)
+        self.assertEqual(self.cache.incr("counter", 2), 3)
+        self.assertEqual(self.cache.get("counter"), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_many(self):
+        self.cache.set_many({"a": [1], "b": {"c": 2}})
+        self.assertEqual(self.cache.get_many(["a", "b", "missing"]), {"a": [1], "b": {"c": 2}})
+        self.cache.delete_many(["a", "b"])
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+    def test_clear_keeps_keys_of_other_prefixes(self):
+        other = RedisCache(settings.CACHE_URL, {"KEY_PREFIX": f"test-{os.getpid()}-other"})
+        other.set("key", "value")
+        self.cache.set("key", "value")
+
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(other.get("key"), "value")
+        other.clear()
+
+
+class CacheStatsViewTestCase(APITestCase):
+    def setUp(self):
+        stats.reset()
+        self.user = get_user_model().objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats(self):
+        stats.record("test", "misses")
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(reverse("cache-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["test"]["misses"], 1)
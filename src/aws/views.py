@@ -1,7 +1,20 @@
 from django.core.handlers.wsgi import WSGIRequest
 from django.http import HttpResponse
 from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from common.cache import stats
 
 
 def health_check(request: WSGIRequest) -> HttpResponse:
     return HttpResponse(status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats(request: Request) -> Response:
+    # Counters are kept per process, so they describe only the worker handling the request.
+    return Response(stats.snapshot())
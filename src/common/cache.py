@@ -0,0 +1,307 @@
+import functools
+import logging
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db.models import QuerySet
+
+logger = logging.getLogger(__name__)
+
+CLEAR_BATCH_SIZE = 1000
+
+
+class LocalTTLCache:
+    """
+    Thread-safe in-process LRU cache with expiring entries. Meant as a small first tier in front
+    of the shared cache, so entries should expire quickly: other processes can't invalidate it.
+    """
+
+    def __init__(self, max_size: int, timeout: float):
+        self._max_size = max_size
+        self._timeout = timeout
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                expires, value = self._entries[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(BaseCache):
+    """
+    Cache backend storing entries in Redis, Django 3.2 does not provide one. Integers are stored
+    as such so that incr works atomically, other values are pickled.
+    """
+
+    def __init__(self, server: str, params: dict):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._client = redis.Redis.from_url(server, **options)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self._make_key(key, version)
+        if timeout == 0:
+            return False
+        return bool(self._client.set(key, _dumps(value), nx=True, px=self._get_px(timeout)))
+
+    def get(self, key, default=None, version=None):
+        value = self._client.get(self._make_key(key, version))
+        return default if value is None else _loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        if timeout == 0:
+            self._client.delete(key)
+            return
+        self._client.set(key, _dumps(value), px=self._get_px(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self._make_key(key, version)
+        px = self._get_px(timeout)
+        if px is None:
+            return bool(self._client.persist(key))
+        return bool(self._client.pexpire(key, px))
+
+    def delete(self, key, version=None) -> bool:
+        return bool(self._client.delete(self._make_key(key, version)))
+
+    def get_many(self, keys, version=None) -> dict:
+        keys = list(keys)
+        made_keys = [self._make_key(key, version) for key in keys]
+        values: List[Any] = self._client.mget(made_keys) if made_keys else []
+        return {key: _loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def has_key(self, key, version=None) -> bool:
+        return bool(self._client.exists(self._make_key(key, version)))
+
+    def incr(self, key, delta=1, version=None) -> int:
+        key = self._make_key(key, version)
+        if not self._client.exists(key):
+            raise ValueError(f"Key '{key}' not found.")
+        return self._client.incrby(key, delta)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None) -> list:
+        with self._client.pipeline() as pipeline:
+            for key, value in data.items():
+                key = self._make_key(key, version)
+                if timeout == 0:
+                    pipeline.delete(key)
+                else:
+                    pipeline.set(key, _dumps(value), px=self._get_px(timeout))
+            pipeline.execute()
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        if not self.key_prefix:
+            self._client.flushdb()
+            return
+        # Only keys of this cache are removed, other caches and processes may share the database.
+        keys = self._client.scan_iter(match=f"{self.key_prefix}:*", count=CLEAR_BATCH_SIZE)
+        while batch := list(islice(keys, CLEAR_BATCH_SIZE)):
+            self._client.delete(*batch)
+
+    def _make_key(self, key, version=None) -> str:
+        # Keys are not validated, memcached restrictions on length and characters don't apply.
+        return self.make_key(key, version=version)
+
+    def _get_px(self, timeout) -> Optional[int]:
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout * 1000), 1)
+
+
+def _dumps(value) -> Union[int, bytes]:
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(value: bytes):
+    try:
+        return int(value)
+    except ValueError:
+        return pickle.loads(value)
+
+
+class CacheStats:
+    """
+    Per namespace counters of cached_value lookups: hits in the local and shared tier, misses and
+    time spent computing missing values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"local_hits": 0, "hits": 0, "misses": 0, "compute_seconds": 0.0}
+        )
+
+    def record(self, namespace: str, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[namespace][counter] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {namespace: dict(counters) for namespace, counters in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+local_tiers: Dict[str, LocalTTLCache] = {}
+_local_tiers_lock = threading.Lock()
+# Distinguishes cached None from a missing entry.
+_MISSING = object()
+
+
+def cached_value(
+    namespace: str,
+    key: Hashable,
+    compute: Callable[[], Any],
+    timeout: float,
+    version: Hashable = None,
+    local_timeout: float = 0,
+) -> Any:
+    """
+    Returns the value cached under namespace, key and version, computing it on a miss.
+
+    Changing the version makes older entries unreachable, so callers pass a value that changes
+    along with the data, e.g. Course.version. Timeouts get random jitter so entries created
+    together do not expire together, and only one process computes a missing value at a time
+    while others wait for it. With local_timeout the value is also kept in process for that long,
+    which can't be invalidated from other processes.
+    """
+    cache_key = f"{namespace}:{version}:{key}"
+    local_tier = _get_local_tier(namespace, local_timeout) if local_timeout else None
+    if local_tier is not None:
+        value = local_tier.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            stats.record(namespace, "local_hits")
+            return value
+
+    entry = cache.get(cache_key)
+    if entry is None:
+        entry = _compute_single_flight(namespace, cache_key, compute, timeout)
+    else:
+        stats.record(namespace, "hits")
+    if local_tier is not None:
+        local_tier.set(cache_key, entry[0])
+    return entry[0]
+
+
+def cached(
+    namespace: str,
+    timeout: float,
+    key: Callable[..., Hashable] = lambda *args, **kwargs: (args, tuple(sorted(kwargs.items()))),
+    version: Callable[..., Hashable] = lambda *args, **kwargs: None,
+    local_timeout: float = 0,
+):
+    """
+    Decorator caching results of a function with cached_value. Key and version are computed from
+    the function arguments.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return cached_value(
+                namespace,
+                key(*args, **kwargs),
+                lambda: function(*args, **kwargs),
+                timeout=timeout,
+                version=version(*args, **kwargs),
+                local_timeout=local_timeout,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def cached_queryset(
+    namespace: str, key: Hashable, queryset: QuerySet, timeout: float, version: Hashable = None
+) -> list:
+    """
+    Evaluates the queryset only when its result isn't cached. Returned instances are shared with
+    other callers in this process when the local tier is used, so this one does not use it.
+    """
+    return cached_value(namespace, key, lambda: list(queryset), timeout=timeout, version=version)
+
+
+def _compute_single_flight(namespace: str, cache_key: str, compute: Callable[[], Any], timeout):
+    lock_key = f"{cache_key}:lock"
+    lock_timeout = settings.CACHE_LOCK_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        # Another process computes the value, it is better to wait for it than to repeat the work.
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                stats.record(namespace, "hits")
+                return entry
+    try:
+        started = time.monotonic()
+        entry = (compute(),)
+        elapsed = time.monotonic() - started
+        cache.set(cache_key, entry, timeout=_jitter(timeout))
+    finally:
+        cache.delete(lock_key)
+    stats.record(namespace, "misses")
+    stats.record(namespace, "compute_seconds", elapsed)
+    logger.debug("Computed %s in %.3fs", cache_key, elapsed)
+    return entry
+
+
+def _jitter(timeout: float) -> float:
+    jitter = settings.CACHE_TIMEOUT_JITTER
+    return timeout * random.uniform(1 - jitter, 1 + jitter)
+
+
+def _get_local_tier(namespace: str, timeout: float) -> LocalTTLCache:
+    with _local_tiers_lock:
+        if namespace not in local_tiers:
+            local_tiers[namespace] = LocalTTLCache(
+                max_size=settings.CACHE_LOCAL_SIZE, timeout=timeout
+            )
+        return local_tiers[namespace]
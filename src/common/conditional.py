@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+def get_version(moment: Optional[datetime]) -> int:
+    if moment is None:
+        return 0
+    return int(moment.timestamp() * 1_000_000)
+
+
+def conditional_response(
+    request: Request,
+    versions: Iterable,
+    modified: Iterable[Optional[datetime]],
+    get_response: Callable[[], Response],
+) -> HttpResponseBase:
+    """
+    Validators have to be computed from already fetched data. If the client sent matching
+    If-None-Match or If-Modified-Since, get_response is not called and 304 is returned.
+    """
+    etag = quote_etag("-".join(str(version) for version in versions))
+    moments = [moment for moment in modified if moment is not None]
+    # Without any moment only the ETag is validated.
+    last_modified = int(max(moments).timestamp()) if moments else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_response()
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Representations depend on the authenticated user.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Authorization",))
+    return response
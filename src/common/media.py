@@ -0,0 +1,227 @@
+import hashlib
+import mimetypes
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_CHUNK_SIZE = 64 * 1024
+SIGNING_SALT = "common.media"
+# Default lifetime of signed media URLs, here and in aws.storages.
+SIGNED_URL_EXPIRE = 600
+
+ByteRange = Tuple[int, int]
+
+
+def sign_media_path(name: str, expires: int) -> str:
+    return signing.Signer(salt=SIGNING_SALT).signature(f"{name}:{expires}")
+
+
+def get_signed_url_window(expire: int = SIGNED_URL_EXPIRE) -> int:
+    """
+    Signed URLs change together with their time window, so validators of representations holding
+    them have to include it.
+    """
+    return int(time.time()) // expire
+
+
+def get_signed_url_window_start(window: int, expire: int = SIGNED_URL_EXPIRE) -> datetime:
+    """
+    Representations holding signed URLs are modified when their window starts, so that
+    If-Modified-Since does not validate URLs that have already expired.
+    """
+    return datetime.fromtimestamp(window * expire, tz=timezone.utc)
+
+
+def is_media_signature_valid(name: str, expires: str, signature: str) -> bool:
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return constant_time_compare(sign_media_path(name, int(expires)), signature)
+
+
+class SignedFileSystemStorage(FileSystemStorage):
+    """
+    Local counterpart of presigned S3 URLs. Links expire and are aligned to time windows, like in
+    aws.signing, so a file keeps the same URL for a while and can be cached by browsers.
+    """
+
+    def url(self, name: Optional[str], expire: int = SIGNED_URL_EXPIRE) -> str:
+        url = super().url(name)
+        if name is None:
+            # There's no file to sign.
+            return url
+        now = int(time.time())
+        expires = now // expire * expire + 2 * expire
+        query = urlencode({"expires": expires, "signature": sign_media_path(name, expires)})
+        return f"{url}?{query}"
+
+
+class DjangoMediaBackend:
+    """
+    Sends files from the Django process. Full responses use the server's file wrapper, ranges are
+    streamed in chunks.
+    """
+
+    def respond(
+        self, full_path: str, name: str, size: int, byte_range: Optional[ByteRange]
+    ) -> HttpResponseBase:
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if byte_range is None:
+            return FileResponse(open(full_path, "rb"), content_type=content_type)
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return response
+
+
+class XAccelRedirectBackend:
+    """
+    Leaves sending the file, including byte ranges, to nginx. MEDIA_ACCEL_REDIRECT_PREFIX has to
+    point to an internal location serving MEDIA_ROOT.
+    """
+
+    def respond(
+        self, full_path: str, name: str, size: int, byte_range: Optional[ByteRange]
+    ) -> HttpResponseBase:
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or "")
+        response["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX}{name}"
+        return response
+
+
+class XSendfileBackend:
+    """
+    Leaves sending the file, including byte ranges, to a server supporting X-Sendfile, e.g.
+    Apache with mod_xsendfile or lighttpd.
+    """
+
+    def respond(
+        self, full_path: str, name: str, size: int, byte_range: Optional[ByteRange]
+    ) -> HttpResponseBase:
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or "")
+        response["X-Sendfile"] = full_path
+        return response
+
+
+class MediaView(APIView):
+    """
+    Serves files from MEDIA_ROOT with validators, byte ranges and optional offloading to the web
+    server. Access is granted by a valid signature from SignedFileSystemStorage, or to an
+    authenticated user passing MEDIA_ACCESS_CHECK.
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request: Request, path: str) -> HttpResponseBase:
+        if not self._has_access(request, path):
+            # Existence of files is not revealed to users without access.
+            raise Http404()
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+            stat = os.stat(full_path)
+        except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+            raise Http404()
+        if not os.path.isfile(full_path):
+            raise Http404()
+
+        etag = quote_etag(hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest())
+        last_modified = int(stat.st_mtime)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            byte_range = None
+            if _is_range_applicable(request, etag, last_modified):
+                byte_range = _parse_range(request.META.get("HTTP_RANGE", ""), stat.st_size)
+                if byte_range is False:
+                    response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                    response["Content-Range"] = f"bytes */{stat.st_size}"
+                    return response
+            backend = import_string(settings.MEDIA_SERVE_BACKEND)()
+            response = backend.respond(full_path, path, stat.st_size, byte_range)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Accept-Ranges"] = "bytes"
+        if path.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES)):
+            patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+        else:
+            patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+        return response
+
+    def _has_access(self, request: Request, path: str) -> bool:
+        expires = request.query_params.get("expires", "")
+        signature = request.query_params.get("signature", "")
+        if signature and is_media_signature_valid(path, expires, signature):
+            return True
+        if not request.user.is_authenticated:
+            return False
+        return import_string(settings.MEDIA_ACCESS_CHECK)(request.user, path)
+
+
+def _is_range_applicable(request: Request, etag: str, last_modified: int) -> bool:
+    if "HTTP_RANGE" not in request.META:
+        return False
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range is None:
+        return True
+    # Range of a file changed since the client fetched the other parts would corrupt it.
+    if if_range.startswith(('"', 'W/"')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _parse_range(header: str, size: int):
+    """
+    Returns inclusive byte range, None when the whole file should be sent or False when the range
+    can't be satisfied. Multiple ranges are not supported, the whole file is sent instead.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range, e.g. last 500 bytes.
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        return False
+    return first, last
+
+
+def _read_range(full_path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(full_path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
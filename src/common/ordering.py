@@ -0,0 +1,29 @@
+from typing import Sequence, Type
+
+from django.db import connection
+from django.db.models import Model
+
+
+def update_from_values(model: Type[Model], fields: Sequence[str], rows: Sequence[tuple]) -> int:
+    """
+    Update many rows with a single UPDATE ... FROM (VALUES ...) statement.
+    Every row is a tuple of primary key followed by values of the given fields.
+    PostgreSQL specific, unlike bulk_update it does not build a CASE per field.
+    """
+    if not rows:
+        return 0
+    quote = connection.ops.quote_name
+    opts = model._meta
+    columns = [opts.pk.column] + [opts.get_field(field).column for field in fields]
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    assignments = ", ".join(f"{quote(column)} = new.{quote(column)}" for column in columns[1:])
+    sql = (
+        f"UPDATE {quote(opts.db_table)} AS old SET {assignments} "
+        f"FROM (VALUES {', '.join([row_placeholder] * len(rows))}) "
+        f"AS new({', '.join(quote(column) for column in columns)}) "
+        f"WHERE old.{quote(columns[0])} = new.{quote(columns[0])}"
+    )
+    params = [value for row in rows for value in row]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -0,0 +1,78 @@
+from typing import Optional
+
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+
+class KeysetPagination(CursorPagination):
+    # Views may override the ordering with a keyset_ordering attribute. It has to be unique (or
+    # nearly unique) and backed by an index for every page to cost the same.
+    ordering = "id"
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def get_ordering(self, request: Request, queryset: QuerySet, view: APIView) -> tuple:
+        ordering = getattr(view, "keyset_ordering", self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class LimitOffsetOrKeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination unless a client asks for keyset pagination with ?pagination=keyset
+    (or follows a cursor link). Keyset pages never run COUNT(*) nor OFFSET scans.
+    In limit/offset mode, ?count=false skips COUNT(*) and returns null count.
+    """
+
+    mode_query_param = "pagination"
+    keyset_mode = "keyset"
+    count_query_param = "count"
+
+    keyset_paginator: Optional[KeysetPagination] = None
+    has_next = False
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: APIView = None):
+        if self._is_keyset_requested(request):
+            self.keyset_paginator = KeysetPagination()
+            return self.keyset_paginator.paginate_queryset(queryset, request, view)
+        if not self._is_count_skipped(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.count = None
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        # One extra row tells whether there is a next page.
+        results = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[: self.limit]
+
+    def get_paginated_response(self, data) -> Response:
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def _is_keyset_requested(self, request: Request) -> bool:
+        return (
+            request.query_params.get(self.mode_query_param) == self.keyset_mode
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def _is_count_skipped(self, request: Request) -> bool:
+        return request.query_params.get(self.count_query_param, "").lower() in {"false", "0"}
@@ -0,0 +1,8 @@
+from django.db.models import QuerySet
+from django.utils import timezone
+
+
+class TouchQuerySetMixin:
+    # Works with models having an `updated` auto_now field, which update() does not set.
+    def touch(self: QuerySet) -> int:
+        return self.update(updated=timezone.now())
@@ -0,0 +1,22 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+# Parallel test processes would share and flush a single Redis database. Each process gets its own
+# cache instead, tests of common.cache.RedisCache connect to Redis themselves.
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches_override = override_settings(CACHES=TEST_CACHES)
+        self._caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,6 @@
 from django.contrib.admin import ModelAdmin, site
 
-from courses.models import Course, CourseSection, CourseSignup
+from courses.models import Course, CourseProgress, CourseSection, CourseSignup
 
 
 class CourseAdmin(ModelAdmin):
@@ -15,6 +15,11 @@ class CourseSignupAdmin(ModelAdmin):
     list_display = ("course", "user")
 
 
+class CourseProgressAdmin(ModelAdmin):
+    list_display = ("course", "user", "completed_count", "total_count")
+
+
 site.register(Course, CourseAdmin)
 site.register(CourseSection, CourseSectionAdmin)
 site.register(CourseSignup, CourseSignupAdmin)
+site.register(CourseProgress, CourseProgressAdmin)
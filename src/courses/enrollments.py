@@ -0,0 +1,49 @@
+import time
+from typing import FrozenSet, Iterable
+
+from django.core.cache import cache
+
+from common.cache import cached_value
+from courses.models import CourseSignup
+
+ENROLLMENTS_CACHE_NAMESPACE = "courses:enrollments"
+ENROLLMENTS_CACHE_TIMEOUT = 60 * 60
+ENROLLMENTS_VERSION_KEY = "courses:enrollments-version:{user_id}"
+
+
+def get_enrolled_course_ids(user_id: int) -> FrozenSet[int]:
+    """
+    Ids of courses the user is signed up for. Cached under a per user version, which is replaced
+    whenever the user's signups change.
+    """
+    return cached_value(
+        ENROLLMENTS_CACHE_NAMESPACE,
+        user_id,
+        lambda: frozenset(
+            CourseSignup.objects.filter(user_id=user_id).values_list("course_id", flat=True)
+        ),
+        timeout=ENROLLMENTS_CACHE_TIMEOUT,
+        version=_get_version(user_id),
+    )
+
+
+def invalidate_enrolled_course_ids(user_ids: Iterable[int]):
+    # Versions are timestamps set in a single write, so they never repeat, even when the previous
+    # one was evicted.
+    version = time.time_ns()
+    cache.set_many(
+        {ENROLLMENTS_VERSION_KEY.format(user_id=user_id): version for user_id in set(user_ids)},
+        timeout=None,
+    )
+
+
+def _get_version(user_id: int) -> int:
+    key = ENROLLMENTS_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # A missing version must not fall back to a constant, entries cached under it before
+        # could be stale.
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
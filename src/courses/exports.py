@@ -0,0 +1,173 @@
+import json
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.db.models import QuerySet
+from djangorestframework_camel_case.util import camelize
+
+from courses.models import Course, CourseSection
+from lessons.models import Answer, BaseLesson, Lesson, TestQuestion, get_lesson_type
+
+# Rows fetched per round trip of a server-side cursor.
+EXPORT_CHUNK_SIZE = 2000
+WRITE_BUFFER_SIZE = 64 * 1024
+# Key under which children of each record are nested in the JSON export.
+CHILDREN_KEYS = {
+    "course": "sections",
+    "section": "lessons",
+    "lesson": "questions",
+    "question": "answers",
+}
+DEPTHS = {"course": 0, "section": 1, "lesson": 2, "question": 3, "answer": 4}
+
+# Kind of the record, id of its parent and the record itself.
+Record = Tuple[str, Optional[int], Dict]
+
+
+def iter_course_records(course: Course, include_media: bool = False) -> Iterator[Record]:
+    """
+    Yields the course, its sections, lessons, questions and answers in the order of the tree.
+    Every level is read with a single query through a server-side cursor, children are matched
+    to their parents while iterating, so memory use does not depend on the size of the course.
+    """
+    record = {"id": course.id, "name": course.name, "description": course.description}
+    if include_media:
+        record["cover_image"] = course.cover_image.url if course.cover_image else None
+    yield "course", None, record
+
+    # Order is not unique, e.g. lessons moved with save() keep it, so ids break ties at every
+    # level and children come in exactly the order of their parents.
+    sections = CourseSection.objects.filter(course=course).order_by("_order", "id")
+    lesson_fields = ["id", "course_section_id", "name", "description", "polymorphic_ctype_id"]
+    if include_media:
+        lesson_fields += ["lesson__video", "lesson__additional_materials"]
+    lessons = _OrderedRows(
+        BaseLesson.objects.for_listing()
+        .filter(course_section__course=course)
+        .order_by("course_section___order", "course_section_id", "_order", "id")
+        .values(*lesson_fields)
+    )
+    questions = _OrderedRows(
+        TestQuestion.objects.filter(test__course_section__course=course)
+        .order_by(
+            "test__course_section___order",
+            "test__course_section_id",
+            "test___order",
+            "test_id",
+            "id",
+        )
+        .values("id", "test_id", "text")
+    )
+    answers = _OrderedRows(
+        Answer.objects.filter(question__test__course_section__course=course)
+        .order_by(
+            "question__test__course_section___order",
+            "question__test__course_section_id",
+            "question__test___order",
+            "question__test_id",
+            "question_id",
+            "id",
+        )
+        .values("id", "question_id", "text", "is_correct")
+    )
+    storage = Lesson._meta.get_field("video").storage
+
+    for section_id, name in sections.values_list("id", "name").iterator(EXPORT_CHUNK_SIZE):
+        yield "section", course.id, {"id": section_id, "name": name}
+        for lesson in lessons.take("course_section_id", section_id):
+            record = {
+                "id": lesson["id"],
+                "name": lesson["name"],
+                "description": lesson["description"],
+                "lesson_type": get_lesson_type(lesson["polymorphic_ctype_id"]),
+            }
+            if include_media:
+                for field in ("video", "additional_materials"):
+                    file_name = lesson[f"lesson__{field}"]
+                    record[field] = storage.url(file_name) if file_name else None
+            yield "lesson", section_id, record
+            for question in questions.take("test_id", lesson["id"]):
+                yield "question", lesson["id"], {"id": question["id"], "text": question["text"]}
+                for answer in answers.take("question_id", question["id"]):
+                    yield "answer", question["id"], {
+                        "id": answer["id"],
+                        "text": answer["text"],
+                        "is_correct": answer["is_correct"],
+                    }
+
+
+def export_course_json(course: Course, include_media: bool = False) -> Iterator[str]:
+    """
+    Writes the course as a JSON list holding the nested tree, the format read by
+    courses.imports, so an export can be imported in another environment as it is.
+    """
+    return _buffered(_write_json(iter_course_records(course, include_media)))
+
+
+def export_course_ndjson(course: Course, include_media: bool = False) -> Iterator[str]:
+    """
+    Writes one JSON document per line for every record, with its type and the id of its parent.
+    """
+    return _buffered(
+        json.dumps(camelize({"type": kind, "parent": parent_id, **record})) + "\n"
+        for kind, parent_id, record in iter_course_records(course, include_media)
+    )
+
+
+class _OrderedRows:
+    """
+    Rows sorted in the order of their parents, handed out parent by parent.
+    """
+
+    def __init__(self, queryset: QuerySet):
+        self._queryset = queryset
+        self._rows: Optional[Iterator[Dict]] = None
+        self._next: Optional[Dict] = None
+
+    def take(self, key: str, value: int) -> Iterator[Dict]:
+        if self._rows is None:
+            # The cursor is opened on first use, when the response is being streamed.
+            self._rows = self._queryset.iterator(EXPORT_CHUNK_SIZE)
+            self._next = next(self._rows, None)
+        while self._next is not None and self._next[key] == value:
+            row, self._next = self._next, next(self._rows, None)
+            yield row
+
+
+def _write_json(records: Iterable[Record]) -> Iterator[str]:
+    yield "["
+    # Number of items written to each list still open, starting with the top level one.
+    open_lists = [0]
+    for kind, _, record in records:
+        depth = DEPTHS[kind] + 1
+        while len(open_lists) > depth:
+            open_lists.pop()
+            yield "]}"
+        if open_lists[-1]:
+            yield ","
+        open_lists[-1] += 1
+        document = json.dumps(camelize(record))
+        if kind in CHILDREN_KEYS:
+            # The record stays open until all of its children are written.
+            yield f'{document[:-1]}, "{CHILDREN_KEYS[kind]}": ['
+            open_lists.append(0)
+        else:
+            yield document
+    while len(open_lists) > 1:
+        open_lists.pop()
+        yield "]}"
+    yield "]"
+
+
+def _buffered(parts: Iterable[str]) -> Iterator[str]:
+    # Records are small, joining them saves a write to the client per record.
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= WRITE_BUFFER_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
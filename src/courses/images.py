@@ -0,0 +1,86 @@
+import io
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from courses.models import Course, get_course_upload_directory
+
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+FORMAT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80, "method": 4},
+}
+
+
+def is_format_supported(image_format: str) -> bool:
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def get_variant_widths(original_width: int, widths: Iterable[int]) -> List[int]:
+    """
+    Returns widths not exceeding the original one, largest first. Images smaller than all
+    configured widths get a single variant with their own width.
+    """
+    allowed = sorted({width for width in widths if width <= original_width}, reverse=True)
+    return allowed or [original_width]
+
+
+def generate_cover_variants(
+    course: Course, widths: Iterable[int], formats: Iterable[str]
+) -> List[Dict]:
+    """
+    Decodes the cover image once and stores every requested width in every requested format.
+    Returns descriptions of stored files, suitable for Course.cover_variants.
+    """
+    # Pillow may be built without some encoders (e.g. WebP), such formats are skipped.
+    formats = tuple(image_format for image_format in formats if is_format_supported(image_format))
+    with course.cover_image.open("rb") as file, Image.open(file) as image:
+        widths = get_variant_widths(image.width, widths)
+        # For JPEGs this makes the decoder do most of the downscaling with DCT scaling, which is
+        # much cheaper than decoding the full image and resizing it afterwards.
+        image.draft("RGB", _get_size(image.size, widths[0]))
+        source = image.convert("RGBA" if _has_alpha(image) else "RGB")
+
+    stem = os.path.splitext(os.path.basename(course.cover_image.name))[0]
+    variants = []
+    # Going from the largest to the smallest lets each step start from an already reduced image.
+    for width in widths:
+        size = _get_size(source.size, width)
+        if size != source.size:
+            source = source.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        for image_format in formats:
+            name = f"{stem}_{width}w.{FORMAT_EXTENSIONS[image_format]}"
+            stored_name = course.cover_image.storage.save(
+                get_course_upload_directory(course, name), _encode(source, image_format)
+            )
+            variants.append(
+                {"name": stored_name, "width": size[0], "height": size[1], "format": image_format}
+            )
+    return variants
+
+
+def delete_cover_variants(course: Course, variants: Iterable[Dict]):
+    storage = course.cover_image.storage
+    for variant in variants:
+        storage.delete(variant["name"])
+
+
+def _get_size(original_size: Tuple[int, int], width: int) -> Tuple[int, int]:
+    original_width, original_height = original_size
+    return width, max(1, round(width / original_width * original_height))
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+def _encode(image: Image.Image, image_format: str) -> ContentFile:
+    if image_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=image_format, **SAVE_OPTIONS[image_format])
+    return ContentFile(output.getvalue())
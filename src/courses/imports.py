@@ -0,0 +1,294 @@
+import codecs
+import json
+import time
+from collections import Counter
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Type
+
+import yaml
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from djangorestframework_camel_case.util import underscoreize
+from rest_framework import serializers
+
+from common.exceptions import ProcessingException
+from courses.models import Course, CourseSection
+from lessons.models import Answer, BaseLesson, Exercise, Lesson, Test, TestQuestion
+
+# Courses validated and inserted together, every level of a batch takes a single bulk insert.
+IMPORT_BATCH_SIZE = 50
+INSERT_BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+LESSON_MODELS: Dict[str, Type[BaseLesson]] = {
+    model.__name__: model for model in (Lesson, Exercise, Test)
+}
+
+Progress = Callable[[Dict], None]
+
+
+class ImportedAnswerSerializer(serializers.Serializer):
+    text = serializers.CharField()
+    is_correct = serializers.BooleanField(default=False)
+
+
+class ImportedQuestionSerializer(serializers.Serializer):
+    text = serializers.CharField()
+    answers = ImportedAnswerSerializer(many=True, default=list)
+
+
+class ImportedLessonSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=64)
+    description = serializers.CharField(allow_blank=True, default="")
+    lesson_type = serializers.ChoiceField(choices=list(LESSON_MODELS), default="Lesson")
+    questions = ImportedQuestionSerializer(many=True, default=list)
+
+    def validate(self, attrs: Dict) -> Dict:
+        if attrs["questions"] and attrs["lesson_type"] != "Test":
+            raise serializers.ValidationError("Only tests can have questions.")
+        return attrs
+
+
+class ImportedSectionSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=64)
+    lessons = ImportedLessonSerializer(many=True, default=list)
+
+
+class ImportedCourseSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=64)
+    description = serializers.CharField(allow_blank=True, default="")
+    sections = ImportedSectionSerializer(many=True, default=list)
+
+
+def read_course_document(document: IO[bytes]) -> Iterator[Dict]:
+    """
+    Lazily reads a JSON or YAML document holding a list of courses, keeping only one course in
+    memory at a time. Documents starting with "[" are read as JSON.
+    """
+    text = codecs.getreader("utf-8-sig")(document)
+    start = text.read(1)
+    while start.isspace():
+        start = text.read(1)
+    if start == "[":
+        yield from _read_json(text)
+    else:
+        yield from _read_yaml(start, text)
+
+
+@transaction.atomic()
+def import_courses(
+    courses: Iterable[Dict],
+    validate_only: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Progress] = None,
+) -> Dict:
+    """
+    Validates and inserts courses with their sections, lessons, questions and answers in one
+    transaction, so a document is imported either fully or not at all. With validate_only
+    nothing is written. Returns the number of rows per model and the import speed.
+    """
+    counts: Counter = Counter()
+    started = time.monotonic()
+    batch = []
+    for number, data in enumerate(courses, start=1):
+        # Keys are accepted in camel case as well, like everywhere in the API.
+        serializer = ImportedCourseSerializer(data=underscoreize(data))
+        if not serializer.is_valid():
+            raise ProcessingException(detail={"course": number, "errors": serializer.errors})
+        batch.append(serializer.validated_data)
+        if len(batch) >= batch_size:
+            _import_batch(batch, counts, validate_only)
+            batch = []
+            if progress is not None:
+                progress(_get_summary(counts, started, validate_only))
+    if batch:
+        _import_batch(batch, counts, validate_only)
+    return _get_summary(counts, started, validate_only)
+
+
+def _get_summary(counts: Counter, started: float, validate_only: bool) -> Dict:
+    rows = sum(counts.values())
+    elapsed = max(time.monotonic() - started, 0.001)
+    return {
+        "courses": counts["courses"],
+        "sections": counts["sections"],
+        "lessons": counts["lessons"],
+        "questions": counts["questions"],
+        "answers": counts["answers"],
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1),
+        "validate_only": validate_only,
+    }
+
+
+def _import_batch(batch: List[Dict], counts: Counter, validate_only: bool):
+    sections = [section for course in batch for section in course["sections"]]
+    lessons = [lesson for section in sections for lesson in section["lessons"]]
+    questions = [question for lesson in lessons for question in lesson["questions"]]
+    answers = [answer for question in questions for answer in question["answers"]]
+    counts.update(
+        courses=len(batch),
+        sections=len(sections),
+        lessons=len(lessons),
+        questions=len(questions),
+        answers=len(answers),
+    )
+    if validate_only:
+        return
+
+    courses = Course.objects.bulk_create(
+        [Course(name=course["name"], description=course["description"]) for course in batch],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    section_instances = CourseSection.objects.bulk_create(
+        [
+            CourseSection(course=course, name=section["name"], _order=order)
+            for course, data in zip(courses, batch)
+            for order, section in enumerate(data["sections"])
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    # Signals are not sent, content types and order are filled in as save() would do.
+    content_types = ContentType.objects.get_for_models(*LESSON_MODELS.values())
+    lesson_instances = BaseLesson.objects.bulk_create(
+        [
+            BaseLesson(
+                course_section=section,
+                name=lesson["name"],
+                description=lesson["description"],
+                polymorphic_ctype=content_types[LESSON_MODELS[lesson["lesson_type"]]],
+                _order=order,
+            )
+            for section, data in zip(section_instances, sections)
+            for order, lesson in enumerate(data["lessons"])
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    for lesson_type, model in LESSON_MODELS.items():
+        _insert_children(
+            model,
+            [
+                parent.id
+                for parent, lesson in zip(lesson_instances, lessons)
+                if lesson["lesson_type"] == lesson_type
+            ],
+        )
+    question_instances = TestQuestion.objects.bulk_create(
+        [
+            TestQuestion(test_id=lesson.id, text=question["text"])
+            for lesson, data in zip(lesson_instances, lessons)
+            for question in data["questions"]
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    Answer.objects.bulk_create(
+        [
+            Answer(question=question, text=answer["text"], is_correct=answer["is_correct"])
+            for question, data in zip(question_instances, questions)
+            for answer in data["answers"]
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+
+
+def _insert_children(model: Type[BaseLesson], parent_ids: List[int]):
+    """
+    bulk_create refuses multi-table inherited models, so only rows of the model's own table are
+    inserted here, for parents created beforehand. Fields get their defaults.
+    """
+    quote = connection.ops.quote_name
+    fields = model._meta.local_concrete_fields
+    columns = ", ".join(quote(field.column) for field in fields)
+    row_placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    for start in range(0, len(parent_ids), INSERT_BATCH_SIZE):
+        params: List[Any] = []
+        batch = parent_ids[start : start + INSERT_BATCH_SIZE]
+        for parent_id in batch:
+            child = model(pk=parent_id)
+            params.extend(
+                field.get_db_prep_save(field.pre_save(child, add=True), connection)
+                for field in fields
+            )
+        sql = (
+            f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+            f"VALUES {', '.join([row_placeholder] * len(batch))}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def _read_json(text: codecs.StreamReader) -> Iterator[Dict]:
+    # Elements of the top level list are decoded one by one, the buffer holds little more than
+    # the current course.
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    read_size = READ_SIZE
+
+    def skip_whitespace() -> bool:
+        nonlocal buffer, position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return True
+            data = text.read(READ_SIZE)
+            if not data:
+                return False
+            buffer, position = data, 0
+
+    if skip_whitespace() and buffer[position] == "]":
+        return
+    while True:
+        if not skip_whitespace():
+            raise ProcessingException(detail="Invalid JSON: unexpected end of the document.")
+        try:
+            course, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # The course may just not be read completely yet.
+            data = text.read(read_size)
+            if not data:
+                raise ProcessingException(detail=f"Invalid JSON: {e.msg}.") from e
+            buffer = buffer[position:] + data
+            position = 0
+            read_size *= 2
+            continue
+        read_size = READ_SIZE
+        yield course
+        if not skip_whitespace():
+            raise ProcessingException(detail="Invalid JSON: unexpected end of the document.")
+        separator = buffer[position]
+        position += 1
+        if separator == "]":
+            break
+        if separator != ",":
+            raise ProcessingException(detail="Invalid JSON: expected ',' or ']' after a course.")
+
+
+def _read_yaml(start: str, text: codecs.StreamReader) -> Iterator[Dict]:
+    loader = yaml.SafeLoader(_PrefixedReader(start, text))
+    try:
+        loader.get_event()
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()
+        if not loader.check_event(yaml.SequenceStartEvent):
+            raise ProcessingException(detail="Document has to be a list of courses.")
+        loader.get_event()
+        while not loader.check_event(yaml.SequenceEndEvent):
+            # Only the subtree of a single course is composed and constructed at a time.
+            yield loader.construct_document(loader.compose_node(None, None))
+    except yaml.YAMLError as e:
+        raise ProcessingException(detail=f"Invalid YAML: {e}") from e
+    finally:
+        loader.dispose()
+
+
+class _PrefixedReader:
+    # Gives back the character consumed while detecting the format.
+    def __init__(self, prefix: str, text: codecs.StreamReader):
+        self._prefix = prefix
+        self._text = text
+
+    def read(self, size: int = -1) -> str:
+        prefix, self._prefix = self._prefix, ""
+        return prefix + self._text.read(size)
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from common.exceptions import ProcessingException
+from courses.imports import IMPORT_BATCH_SIZE, import_courses, read_course_document
+
+
+class Command(BaseCommand):
+    help = "Import courses with their sections, lessons and tests from a JSON or YAML document."
+
+    def add_arguments(self, parser):
+        parser.add_argument("document", help="Path to a document holding a list of courses.")
+        parser.add_argument(
+            "--validate-only",
+            action="store_true",
+            help="Validate the whole document without writing anything.",
+        )
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["document"], "rb") as document:
+                summary = import_courses(
+                    read_course_document(document),
+                    validate_only=options["validate_only"],
+                    batch_size=max(options["batch_size"], 1),
+                    progress=self._report,
+                )
+        except ProcessingException as e:
+            raise CommandError(json.dumps(e.detail) if isinstance(e.detail, dict) else e.detail)
+        action = "Validated" if options["validate_only"] else "Imported"
+        self.stdout.write(
+            f"{action} {summary['courses']} courses, {summary['sections']} sections, "
+            f"{summary['lessons']} lessons, {summary['questions']} questions and "
+            f"{summary['answers']} answers in {summary['seconds']:.1f}s "
+            f"({summary['rows_per_second']:.1f} rows/s)."
+        )
+
+    def _report(self, summary: dict):
+        self.stdout.write(
+            f"{summary['courses']} courses, {summary['rows']} rows "
+            f"({summary['rows_per_second']:.1f} rows/s)."
+        )
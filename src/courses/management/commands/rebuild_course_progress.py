@@ -0,0 +1,68 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from courses.models import CourseProgress
+from courses.progress import calculate_course_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild course progress counters from completed lessons."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Detect counters that drifted and repair only those instead of a full rebuild.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Used with --check. Report drift without repairing it.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expected = calculate_course_progress()
+        if options["check"]:
+            self._check(expected, dry_run=options["dry_run"], batch_size=options["batch_size"])
+        else:
+            self._rebuild(expected, batch_size=options["batch_size"])
+
+    @transaction.atomic()
+    def _rebuild(self, expected: dict, batch_size: int):
+        CourseProgress.objects.all().delete()
+        CourseProgress.objects.bulk_create(expected.values(), batch_size=batch_size)
+        self.stdout.write(f"Rebuilt {len(expected)} course progress rows.")
+
+    @transaction.atomic()
+    def _check(self, expected: dict, dry_run: bool, batch_size: int):
+        drifted = []
+        for progress in CourseProgress.objects.all().iterator():
+            correct = expected.pop((progress.user_id, progress.course_id), None)
+            if correct is None:
+                continue
+            if (progress.completed_count, progress.total_count) != (
+                correct.completed_count,
+                correct.total_count,
+            ):
+                self.stdout.write(
+                    f"Drift for user {progress.user_id} in course {progress.course_id}: "
+                    f"stored {progress.completed_count}/{progress.total_count}, "
+                    f"expected {correct.completed_count}/{correct.total_count}."
+                )
+                progress.completed_count = correct.completed_count
+                progress.total_count = correct.total_count
+                progress.last_completed_at = correct.last_completed_at
+                drifted.append(progress)
+        # Whatever is left has no stored row yet.
+        missing = list(expected.values())
+        self.stdout.write(f"Found {len(drifted)} drifted and {len(missing)} missing rows.")
+        if dry_run:
+            return
+        CourseProgress.objects.bulk_update(
+            drifted,
+            ["completed_count", "total_count", "last_completed_at"],
+            batch_size=batch_size,
+        )
+        CourseProgress.objects.bulk_create(missing, batch_size=batch_size)
+        self.stdout.write("Repaired.")
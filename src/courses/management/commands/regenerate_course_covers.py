@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List
+
+import django
+from celery import group
+from django.core.management import BaseCommand
+
+from courses.models import Course
+from courses.tasks import resize_course_cover_images, resize_course_cover_images_chunk
+
+
+class Command(BaseCommand):
+    help = "Regenerate cover image variants of all courses, e.g. after changing cover sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=("celery", "local"),
+            default="local",
+            help="Fan chunks out to Celery workers or process them in a local process pool.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of chunks processed at the same time. With local mode 1 means no pool.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=20)
+        parser.add_argument(
+            "--checkpoint",
+            help="File storing id of the last processed course. Existing checkpoint is resumed.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many courses would be processed.",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        last_id = self._read_checkpoint(checkpoint)
+        queryset = Course.objects.exclude(cover_image="").filter(id__gt=last_id).order_by("id")
+        total = queryset.count()
+        if last_id:
+            self.stdout.write(f"Resuming after course {last_id}.")
+        self.stdout.write(f"{total} courses to process.")
+        if options["dry_run"] or not total:
+            return
+
+        course_ids = queryset.values_list("id", flat=True).iterator()
+        chunks = _chunked(course_ids, options["chunk_size"])
+        concurrency = max(options["concurrency"], 1)
+        if options["mode"] == "celery":
+            waves = self._process_with_celery(chunks, concurrency)
+        else:
+            waves = self._process_locally(chunks, concurrency)
+
+        processed = 0
+        failed = {}
+        started = time.monotonic()
+        for wave_ids, errors in waves:
+            processed += len(wave_ids)
+            failed.update(errors)
+            self._write_checkpoint(checkpoint, wave_ids[-1])
+            elapsed = max(time.monotonic() - started, 0.001)
+            self.stdout.write(
+                f"Processed {processed}/{total} courses ({processed / elapsed:.1f}/s), "
+                f"{len(failed)} failed."
+            )
+
+        for course_id, error in failed.items():
+            self.stderr.write(f"Course {course_id} failed: {error}")
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(
+            f"Done: {processed - len(failed)} courses regenerated, {len(failed)} failed "
+            f"in {elapsed:.1f}s ({processed / elapsed:.1f} courses/s)."
+        )
+
+    def _process_with_celery(self, chunks: Iterator[List[int]], concurrency: int):
+        # Waves of at most `concurrency` chunks keep the queue from being flooded and make the
+        # checkpoint safe to resume from.
+        while wave := list(islice(chunks, concurrency)):
+            results = group(resize_course_cover_images_chunk.s(chunk) for chunk in wave)()
+            yield _flatten(wave), _merge(results.get())
+
+    def _process_locally(self, chunks: Iterator[List[int]], concurrency: int):
+        if concurrency == 1:
+            for chunk in chunks:
+                yield chunk, resize_course_cover_images(chunk)
+            return
+        # Workers are spawned rather than forked, so they do not share database connections with
+        # this process.
+        with ProcessPoolExecutor(
+            max_workers=concurrency,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            while wave := list(islice(chunks, concurrency)):
+                results = executor.map(resize_course_cover_images, wave)
+                yield _flatten(wave), _merge(results)
+
+    def _read_checkpoint(self, checkpoint: str) -> int:
+        if checkpoint is None or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            return int(file.read().strip() or 0)
+
+    def _write_checkpoint(self, checkpoint: str, course_id: int):
+        if checkpoint is None:
+            return
+        # Replacing the file keeps the checkpoint intact if the command is killed while writing.
+        temporary = f"{checkpoint}.tmp"
+        with open(temporary, "w") as file:
+            file.write(str(course_id))
+        os.replace(temporary, checkpoint)
+
+
+def _chunked(iterator: Iterator[int], size: int) -> Iterator[List[int]]:
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _flatten(chunks: List[List[int]]) -> List[int]:
+    return [course_id for chunk in chunks for course_id in chunk]
+
+
+def _merge(results) -> Dict:
+    merged = {}
+    for errors in results:
+        merged.update(errors)
+    return merged
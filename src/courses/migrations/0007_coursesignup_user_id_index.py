@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_courseprogress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coursesignup',
+            index=models.Index(fields=['user', 'id'], name='courses_cou_user_id_ba34b4_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_coursesignup_user_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseprogress',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='coursesection',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_auto_20261017_0153'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -5,13 +5,17 @@ from django.db.models import (
     DateTimeField,
     ForeignKey,
     ImageField,
+    Index,
+    JSONField,
     Model,
+    PositiveIntegerField,
     TextField,
 )
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
 import courses.signals
-from courses.querysets import CourseQuerySet
+from common.conditional import get_version
+from courses.querysets import CourseProgressQuerySet, CourseQuerySet, CourseSectionQuerySet
 
 
 def get_course_upload_directory(course: "Course", filename: str) -> str:
@@ -23,18 +27,43 @@ class Course(Model):
     description = TextField()
     cover_image = ImageField(upload_to=get_course_upload_directory)
     small_cover_image = ImageField(null=True, blank=True, upload_to=get_course_upload_directory)
+    # Resized copies of cover image in different widths and formats, generated in background.
+    cover_variants = JSONField(default=list, blank=True)
     created = DateTimeField(auto_now_add=True)
     updated = DateTimeField(auto_now=True)
 
     objects = CourseQuerySet.as_manager()
 
+    # Name of the cover image as loaded from the database, used to detect cover changes.
+    loaded_cover_image = None
+
     def __str__(self):
         return f"{self.name} ({self.id})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_cover_image = instance.__dict__.get("cover_image")
+        return instance
+
+    @property
+    def version(self) -> int:
+        return get_version(self.updated)
+
+    @property
+    def cover_image_changed(self) -> bool:
+        # Deferred cover image has not been loaded nor assigned, so it could not change.
+        if "cover_image" not in self.__dict__:
+            return False
+        return (self.cover_image.name or None) != (self.loaded_cover_image or None)
+
 
 class CourseSection(Model):
     course = ForeignKey(Course, on_delete=CASCADE, related_name="course_sections")
     name = CharField(max_length=64)
+    updated = DateTimeField(auto_now=True)
+
+    objects = CourseSectionQuerySet.as_manager()
 
     class Meta:
         order_with_respect_to = "course"
@@ -49,6 +78,32 @@ class CourseSignup(Model):
 
     class Meta:
         unique_together = ("course", "user")
+        # Serves per-user listings ordered by id in keyset pagination.
+        indexes = [Index(fields=["user", "id"])]
+
+
+class CourseProgress(Model):
+    # Denormalized counters kept up to date by lessons app. They can be rebuilt or verified with
+    # the rebuild_course_progress management command.
+    course = ForeignKey(Course, related_name="progress", on_delete=CASCADE)
+    user = ForeignKey(settings.AUTH_USER_MODEL, related_name="course_progress", on_delete=CASCADE)
+    completed_count = PositiveIntegerField(default=0)
+    total_count = PositiveIntegerField(default=0)
+    last_completed_at = DateTimeField(null=True, blank=True)
+    # Changes whenever the user's completions in the course do.
+    updated = DateTimeField(auto_now=True)
+
+    objects = CourseProgressQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("user", "course")
+
+    def __str__(self):
+        return f"{self.user} - {self.course}: {self.completed_count}/{self.total_count}"
 
 
 post_save.connect(courses.signals.cover_image_resize_callback, sender=Course)
+post_save.connect(courses.signals.course_section_changed_callback, sender=CourseSection)
+post_delete.connect(courses.signals.course_section_changed_callback, sender=CourseSection)
+post_save.connect(courses.signals.signup_changed_callback, sender=CourseSignup)
+post_delete.connect(courses.signals.signup_changed_callback, sender=CourseSignup)
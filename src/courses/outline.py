@@ -0,0 +1,82 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from auth_ex.models import User
+from common.cache import cached_value
+from courses.models import Course, CourseSection
+
+OUTLINE_CACHE_NAMESPACE = "courses:outline"
+OUTLINE_CACHE_TIMEOUT = 60 * 60 * 24
+# Entries are versioned, so the in-process copy can't become stale.
+OUTLINE_LOCAL_CACHE_TIMEOUT = 60
+
+
+def get_course_outline(course: Course) -> dict:
+    """
+    User independent structure of a course: sections in order with their lessons' ids, names
+    and types. Cached under the course version, which changes whenever the structure does.
+    """
+    return cached_value(
+        OUTLINE_CACHE_NAMESPACE,
+        course.id,
+        lambda: _build_course_outline(course),
+        timeout=OUTLINE_CACHE_TIMEOUT,
+        version=course.version,
+        local_timeout=OUTLINE_LOCAL_CACHE_TIMEOUT,
+    )
+
+
+def get_course_outline_for_user(course: Course, user: User) -> dict:
+    from lessons.models import CompletedLesson
+
+    outline = get_course_outline(course)
+    lesson_ids = [lesson["id"] for section in outline["sections"] for lesson in section["lessons"]]
+    completed_ids = set()
+    if lesson_ids:
+        completed_ids = set(
+            CompletedLesson.objects.filter(user=user, lesson_id__in=lesson_ids).values_list(
+                "lesson_id", flat=True
+            )
+        )
+    return {
+        **outline,
+        "sections": [
+            {
+                **section,
+                "lessons": [
+                    {**lesson, "is_complete": lesson["id"] in completed_ids}
+                    for lesson in section["lessons"]
+                ],
+            }
+            for section in outline["sections"]
+        ],
+    }
+
+
+def _build_course_outline(course: Course) -> dict:
+    from lessons.models import BaseLesson, get_lesson_type
+
+    lessons: Dict[int, List[dict]] = defaultdict(list)
+    lesson_rows = (
+        BaseLesson.objects.for_listing()
+        .filter(course_section__course_id=course.id)
+        .order_by("_order")
+        .values_list("id", "name", "course_section_id", "polymorphic_ctype_id")
+    )
+    for lesson_id, name, section_id, content_type_id in lesson_rows:
+        lessons[section_id].append(
+            {
+                "id": lesson_id,
+                "name": name,
+                "lesson_type": get_lesson_type(content_type_id),
+            }
+        )
+    sections = CourseSection.objects.filter(course_id=course.id).values_list("id", "name")
+    return {
+        "id": course.id,
+        "name": course.name,
+        "sections": [
+            {"id": section_id, "name": name, "lessons": lessons[section_id]}
+            for section_id, name in sections
+        ],
+    }
@@ -16,3 +16,8 @@ class CourseEditPermission(BasePermission):
 class CourseDeletePermission(BasePermission):
     def has_permission(self, request: Request, view: ViewSet) -> bool:
         return request.user.has_perm("courses.delete_course")
+
+
+class CourseSignupBulkCreatePermission(BasePermission):
+    def has_permission(self, request: Request, view: ViewSet) -> bool:
+        return request.user.has_perm("courses.add_coursesignup")
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import Count, F, Max
+
+from courses.models import Course, CourseProgress, CourseSignup
+
+
+def calculate_course_progress(
+    user_ids: Optional[Iterable[int]] = None, course_ids: Optional[Iterable[int]] = None
+) -> Dict[Tuple[int, int], CourseProgress]:
+    """
+    Compute expected progress counters from CompletedLesson with grouped aggregates.
+    Returns unsaved CourseProgress instances keyed by (user_id, course_id). Every signup gets an
+    entry, as does every pair that has completions or an already stored row.
+    """
+    from lessons.models import CompletedLesson
+
+    signups = CourseSignup.objects.all()
+    completions = CompletedLesson.objects.all()
+    stored = CourseProgress.objects.all()
+    courses = Course.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        signups = signups.filter(user_id__in=user_ids)
+        completions = completions.filter(user_id__in=user_ids)
+        stored = stored.filter(user_id__in=user_ids)
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        signups = signups.filter(course_id__in=course_ids)
+        completions = completions.filter(lesson__course_section__course_id__in=course_ids)
+        stored = stored.filter(course_id__in=course_ids)
+        courses = courses.filter(id__in=course_ids)
+
+    totals = dict(
+        courses.annotate(total=Count("course_sections__lessons")).values_list("id", "total")
+    )
+    expected: Dict[Tuple[int, int], CourseProgress] = {}
+
+    def get_entry(user_id: int, course_id: int) -> CourseProgress:
+        key = (user_id, course_id)
+        if key not in expected:
+            expected[key] = CourseProgress(
+                user_id=user_id, course_id=course_id, total_count=totals.get(course_id, 0)
+            )
+        return expected[key]
+
+    for user_id, course_id in signups.values_list("user_id", "course_id").iterator():
+        get_entry(user_id, course_id)
+    for user_id, course_id in stored.values_list("user_id", "course_id").iterator():
+        get_entry(user_id, course_id)
+    if user_ids is not None and course_ids is not None:
+        # Lazy refresh of a single pair always needs a result.
+        for user_id in user_ids:
+            for course_id in course_ids:
+                get_entry(user_id, course_id)
+
+    aggregated = (
+        completions.values("user_id", course_id=F("lesson__course_section__course_id"))
+        .annotate(completed=Count("id"), last_completed_at=Max("created"))
+        .order_by()
+    )
+    for row in aggregated.iterator():
+        entry = get_entry(row["user_id"], row["course_id"])
+        entry.completed_count = row["completed"]
+        entry.last_completed_at = row["last_completed_at"]
+
+    return expected
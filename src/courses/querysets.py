@@ -1,9 +1,19 @@
-from django.db.models import Prefetch, QuerySet
+from datetime import datetime
+from typing import Union
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, OuterRef, Prefetch, Q, QuerySet, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 from auth_ex.models import User
+from common.querysets import TouchQuerySetMixin
+
 
+class CourseQuerySet(TouchQuerySetMixin, QuerySet):
+    # Course.updated doubles as a version of the course structure (sections and lessons), so
+    # changes to them are propagated here with touch().
 
-class CourseQuerySet(QuerySet):
     def filter_signed_up(self, user: User):
         return self.filter(signups__user=user)
 
@@ -14,6 +24,99 @@ class CourseQuerySet(QuerySet):
             "course_sections",
             Prefetch(
                 "course_sections__lessons",
-                queryset=BaseLesson.objects.all().with_completed_annotations(user=user),
+                queryset=BaseLesson.objects.for_listing().with_completed_annotations(user=user),
+            ),
+        )
+
+    def with_progress_updated(self, user: User):
+        # Version of the user's completions in the course, see CourseProgress.updated.
+        from courses.models import CourseProgress
+
+        return self.annotate(
+            progress_updated=Subquery(
+                CourseProgress.objects.filter(user=user, course=OuterRef("pk")).values("updated")[
+                    :1
+                ]
+            )
+        )
+
+    def with_progress(self, user: User):
+        from courses.models import CourseSection
+
+        # Joining completions through FilteredRelation keeps at most one row per lesson, so the
+        # counts below do not need DISTINCT.
+        return self.annotate(
+            user_completions=FilteredRelation(
+                "course_sections__lessons__completedlesson",
+                condition=Q(course_sections__lessons__completedlesson__user=user),
+            ),
+            total_lessons=Count("course_sections__lessons"),
+            completed_lessons=Count("user_completions"),
+        ).prefetch_related(
+            Prefetch(
+                "course_sections",
+                # Meta ordering is not applied to aggregated queries.
+                queryset=CourseSection.objects.with_progress(user=user).order_by("_order"),
+            )
+        )
+
+
+class CourseSectionQuerySet(TouchQuerySetMixin, QuerySet):
+    def with_progress(self, user: User):
+        return self.annotate(
+            user_completions=FilteredRelation(
+                "lessons__completedlesson",
+                condition=Q(lessons__completedlesson__user=user),
             ),
+            total_lessons=Count("lessons"),
+            completed_lessons=Count("user_completions"),
+        )
+
+
+class CourseProgressQuerySet(QuerySet):
+    def get_for(self, user: User, course_id: int):
+        try:
+            return self.get(user=user, course_id=course_id)
+        except self.model.DoesNotExist:
+            return self.refresh(user_id=user.id, course_id=course_id)
+
+    def refresh(self, user_id: int, course_id: int):
+        # Rows are created lazily, the first time they are needed.
+        from courses.progress import calculate_course_progress
+
+        expected = calculate_course_progress(user_ids=[user_id], course_ids=[course_id])
+        progress = expected[(user_id, course_id)]
+        defaults = {
+            "completed_count": progress.completed_count,
+            "total_count": progress.total_count,
+            "last_completed_at": progress.last_completed_at,
+        }
+        try:
+            with transaction.atomic():
+                return self.update_or_create(
+                    user_id=user_id, course_id=course_id, defaults=defaults
+                )[0]
+        except IntegrityError:
+            # Created by a concurrent refresh, it is updated instead.
+            return self.update_or_create(user_id=user_id, course_id=course_id, defaults=defaults)[0]
+
+    def record_completion(self, user: User, course_id: int, completed_at: datetime):
+        updated = self.filter(user=user, course_id=course_id).update(
+            completed_count=F("completed_count") + 1,
+            last_completed_at=completed_at,
+            updated=completed_at,
+        )
+        if not updated:
+            self.refresh(user_id=user.id, course_id=course_id)
+
+    def revert_completion(self, user: User, course_id: int):
+        updated = self.filter(user=user, course_id=course_id).update(
+            completed_count=Greatest(F("completed_count") - 1, 0), updated=timezone.now()
+        )
+        if not updated:
+            self.refresh(user_id=user.id, course_id=course_id)
+
+    def change_total(self, course_id: Union[int, Subquery], difference: int):
+        self.filter(course_id=course_id).update(
+            total_count=Greatest(F("total_count") + difference, 0)
         )
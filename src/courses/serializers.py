@@ -1,9 +1,12 @@
+from typing import Dict, List, Optional, Set
+
+from django.utils import timezone
 from rest_framework import serializers
-from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.validators import UniqueTogetherValidator
 
-from courses.models import Course, CourseSection, CourseSignup
-from lessons.serializers import ListLessonsSerializer
+from common.ordering import update_from_values
+from courses.images import FORMAT_MIME_TYPES
+from courses.models import Course, CourseProgress, CourseSection, CourseSignup
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -15,31 +18,86 @@ class CourseSerializer(serializers.ModelSerializer):
 class CourseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ("id", "name", "image", "description")
+        fields = ("id", "name", "image", "srcset", "sources", "description")
 
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    sources = serializers.SerializerMethodField()
 
-    def get_image(self, course: Course) -> str:
+    def get_image(self, course: Course) -> Optional[str]:
         if course.small_cover_image:
             return course.small_cover_image.url
-        else:
+        elif course.cover_image:
             return course.cover_image.url
+        # Courses may be created without a cover, e.g. by courses.imports.
+        return None
+
+    def get_srcset(self, course: Course) -> str:
+        # JPEG is understood by every client, so it is used as the default srcset.
+        return self._build_srcset(course, "JPEG")
+
+    def get_sources(self, course: Course) -> List[Dict[str, str]]:
+        return [
+            {
+                "type": FORMAT_MIME_TYPES[image_format],
+                "srcset": self._build_srcset(course, image_format),
+            }
+            for image_format in dict.fromkeys(
+                variant["format"] for variant in course.cover_variants
+            )
+        ]
+
+    def _build_srcset(self, course: Course, image_format: str) -> str:
+        storage = course.cover_image.storage
+        return ", ".join(
+            f"{storage.url(variant['name'])} {variant['width']}w"
+            for variant in course.cover_variants
+            if variant["format"] == image_format
+        )
+
+
+def _get_percent(completed: int, total: int) -> float:
+    if not total:
+        return 0.0
+    return round(completed * 100 / total, 2)
 
 
-class CourseSectionsSerializer(serializers.ModelSerializer):
+class CourseSectionProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseSection
-        fields = ("id", "name", "lessons")
+        fields = ("id", "name", "total_lessons", "completed_lessons", "percent")
 
-    lessons = ListLessonsSerializer(many=True)
+    total_lessons = serializers.IntegerField()
+    completed_lessons = serializers.IntegerField()
+    percent = serializers.SerializerMethodField()
 
+    def get_percent(self, section: CourseSection) -> float:
+        return _get_percent(section.completed_lessons, section.total_lessons)
 
-class CourseWithLessonsSerializer(serializers.ModelSerializer):
+
+class CourseProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ("id", "name", "sections")
+        fields = ("id", "name", "total_lessons", "completed_lessons", "percent", "sections")
+
+    total_lessons = serializers.IntegerField()
+    completed_lessons = serializers.IntegerField()
+    percent = serializers.SerializerMethodField()
+    sections = CourseSectionProgressSerializer(many=True, source="course_sections")
+
+    def get_percent(self, course: Course) -> float:
+        return _get_percent(course.completed_lessons, course.total_lessons)
+
 
-    sections = CourseSectionsSerializer(many=True, source="course_sections")
+class CourseProgressCountersSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CourseProgress
+        fields = ("course", "completed_count", "total_count", "percent", "last_completed_at")
+
+    percent = serializers.SerializerMethodField()
+
+    def get_percent(self, progress: CourseProgress) -> float:
+        return _get_percent(progress.completed_count, progress.total_count)
 
 
 class CourseSectionReorderSerializer(serializers.ModelSerializer):
@@ -47,10 +105,90 @@ class CourseSectionReorderSerializer(serializers.ModelSerializer):
         model = Course
         fields = ("sections",)
 
-    sections = PrimaryKeyRelatedField(many=True, queryset=CourseSection.objects.all())
+    # Default keeps an empty list sent as form data valid.
+    sections = serializers.ListField(child=serializers.IntegerField(), default=list)
+
+    def validate_sections(self, sections: List[int]) -> List[int]:
+        course_section_ids = set(self.instance.course_sections.values_list("id", flat=True))
+        for section_id in sections:
+            if section_id not in course_section_ids:
+                raise serializers.ValidationError(
+                    f'Invalid pk "{section_id}" - object does not exist.', code="does_not_exist"
+                )
+        if len(sections) != len(course_section_ids) or set(sections) != course_section_ids:
+            raise serializers.ValidationError("Every section of the course has to be ordered once.")
+        return sections
 
     def update(self, course: Course, validated_data: dict) -> Course:
-        course.set_coursesection_order((section.id for section in validated_data["sections"]))
+        update_from_values(
+            CourseSection,
+            ["_order"],
+            [(section_id, order) for order, section_id in enumerate(validated_data["sections"])],
+        )
+        Course.objects.filter(id=course.id).touch()
+        return course
+
+
+class SectionLessonsOrderSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    lessons = serializers.ListField(child=serializers.IntegerField())
+
+
+class CourseLessonsReorderSerializer(serializers.ModelSerializer):
+    """
+    Sets the order of lessons in the given sections of a course. Lessons can be moved between
+    the sections, as long as every lesson of the given sections is placed exactly once.
+    """
+
+    class Meta:
+        model = Course
+        fields = ("sections",)
+
+    sections = SectionLessonsOrderSerializer(many=True)
+
+    def validate_sections(self, sections: List[dict]) -> List[dict]:
+        current_lessons: Dict[int, Set[int]] = {}
+        for section_id, lesson_id in self.instance.course_sections.values_list("id", "lessons__id"):
+            lessons = current_lessons.setdefault(section_id, set())
+            if lesson_id is not None:
+                lessons.add(lesson_id)
+
+        section_ids = [section["id"] for section in sections]
+        lesson_ids = [lesson_id for section in sections for lesson_id in section["lessons"]]
+        for section_id in section_ids:
+            if section_id not in current_lessons:
+                raise serializers.ValidationError(
+                    f'Invalid pk "{section_id}" - object does not exist.', code="does_not_exist"
+                )
+        if len(set(section_ids)) != len(section_ids):
+            raise serializers.ValidationError("Every section can be given only once.")
+        expected_lesson_ids: Set[int] = set()
+        for section_id in section_ids:
+            expected_lesson_ids.update(current_lessons[section_id])
+        if len(lesson_ids) != len(expected_lesson_ids) or set(lesson_ids) != expected_lesson_ids:
+            raise serializers.ValidationError(
+                "Every lesson of the given sections has to be placed once."
+            )
+        return sections
+
+    def update(self, course: Course, validated_data: dict) -> Course:
+        from lessons.models import BaseLesson
+
+        # Section is a part of the lesson representation, so versions of the lessons are bumped.
+        now = timezone.now()
+        update_from_values(
+            BaseLesson,
+            ["course_section", "_order", "updated"],
+            [
+                (lesson_id, section["id"], order, now)
+                for section in validated_data["sections"]
+                for order, lesson_id in enumerate(section["lessons"])
+            ],
+        )
+        CourseSection.objects.filter(
+            id__in=[section["id"] for section in validated_data["sections"]]
+        ).touch()
+        Course.objects.filter(id=course.id).touch()
         return course
 
 
@@ -70,3 +208,18 @@ class SignupSerializer(serializers.ModelSerializer):
             "user",
             "course",
         )
+
+
+class BulkSignupSerializer(serializers.Serializer):
+    signups = serializers.ListField(child=serializers.DictField(), required=False)
+    roster = serializers.FileField(required=False)
+
+    def validate(self, attrs: dict) -> dict:
+        if ("signups" in attrs) == ("roster" in attrs):
+            raise serializers.ValidationError("Provide either signups or a roster file.")
+        return attrs
+
+
+class CourseImportSerializer(serializers.Serializer):
+    document = serializers.FileField()
+    validate_only = serializers.BooleanField(default=False)
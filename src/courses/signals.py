@@ -1,9 +1,39 @@
+from functools import partial
 from typing import TYPE_CHECKING
 
+from django.db import transaction
+
 if TYPE_CHECKING:
+    from courses.models import Course, CourseSection, CourseSignup
+from courses.tasks import schedule_course_cover_image_resize
+
+
+def cover_image_resize_callback(sender: type, instance: "Course", **kwargs):
+    if kwargs.get("raw"):
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "cover_image" not in update_fields:
+        return
+    if not instance.cover_image_changed:
+        return
+    instance.loaded_cover_image = instance.cover_image.name
+    if instance.cover_image:
+        # Task must not start before the new cover is visible to other connections.
+        transaction.on_commit(partial(schedule_course_cover_image_resize, instance.id))
+
+
+def course_section_changed_callback(sender: type, instance: "CourseSection", **kwargs):
+    if kwargs.get("raw"):
+        return
     from courses.models import Course
-from courses.tasks import resize_course_cover_image
 
+    Course.objects.filter(id=instance.course_id).touch()
+
+
+def signup_changed_callback(sender: type, instance: "CourseSignup", **kwargs):
+    if kwargs.get("raw"):
+        return
+    from courses.enrollments import invalidate_enrolled_course_ids
 
-def cover_image_resize_callback(sender: "Course", *args, **kwargs):
-    resize_course_cover_image.apply_async(args=[kwargs["instance"].id])
+    # Invalidating before commit would let concurrent requests cache the old signups again.
+    transaction.on_commit(partial(invalidate_enrolled_course_ids, [instance.user_id]))
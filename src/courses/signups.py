@@ -0,0 +1,143 @@
+import codecs
+import csv
+from functools import partial
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, cast
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from courses.enrollments import invalidate_enrolled_course_ids
+from courses.models import Course, CourseSignup
+
+BULK_SIGNUP_BATCH_SIZE = 1000
+
+STATUS_CREATED = "created"
+STATUS_ALREADY_SIGNED_UP = "already_signed_up"
+STATUS_DUPLICATE = "duplicate"
+STATUS_INVALID = "invalid"
+
+
+def read_roster(roster: IO[bytes]) -> Iterator[dict]:
+    """
+    Lazily read a CSV roster with a header. Columns: course and either user (id) or username.
+    """
+    yield from csv.DictReader(codecs.iterdecode(roster, "utf-8-sig"))
+
+
+def bulk_signup(rows: Iterable[dict], batch_size: int = BULK_SIGNUP_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Sign users up for courses, yielding a result for every input row in order.
+    Each batch takes a constant number of queries: users and courses lookup, one query for
+    existing signups and a bulk insert. Duplicates are detected in memory across all batches.
+    Statuses of created signups are taken from rows actually inserted.
+    """
+    seen: Set[Tuple[int, int]] = set()
+    numbered_rows = enumerate(rows, start=1)
+    while batch := list(islice(numbered_rows, batch_size)):
+        yield from _signup_batch(batch, seen)
+
+
+def _signup_batch(batch: List[Tuple[int, dict]], seen: Set[Tuple[int, int]]) -> Iterator[dict]:
+    parsed = [(number, *_parse_row(row)) for number, row in batch]
+    user_ids = {user for _, user, _, _ in parsed if isinstance(user, int)}
+    usernames = {user for _, user, _, _ in parsed if isinstance(user, str)}
+    course_ids = {course for _, _, course, _ in parsed if course is not None}
+
+    User = get_user_model()
+    users_by_username: Dict[str, int] = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "id")
+    )
+    existing_users = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True)) | set(
+        users_by_username.values()
+    )
+    existing_courses = set(Course.objects.filter(id__in=course_ids).values_list("id", flat=True))
+    signed_up = _get_signups(existing_users, existing_courses)
+
+    results = []
+    to_create: Dict[Tuple[int, int], dict] = {}
+    for number, user, course_id, error in parsed:
+        user_id = users_by_username.get(user) if isinstance(user, str) else user
+        result = {"row": number, "user": user_id, "course": course_id}
+        if error is None and user_id not in existing_users:
+            error = "User does not exist."
+        if error is None and course_id not in existing_courses:
+            error = "Course does not exist."
+
+        if error is not None:
+            result.update(status=STATUS_INVALID, error=error)
+            results.append(result)
+            continue
+        # Both ids were found in the database above.
+        signup = cast(Tuple[int, int], (user_id, course_id))
+        if signup in seen:
+            result["status"] = STATUS_DUPLICATE
+        elif signup in signed_up:
+            result["status"] = STATUS_ALREADY_SIGNED_UP
+        else:
+            result["status"] = STATUS_CREATED
+            to_create[signup] = result
+        seen.add(signup)
+        results.append(result)
+
+    created = _insert_signups(list(to_create))
+    for signup, result in to_create.items():
+        if signup not in created:
+            # Signed up concurrently after existing signups were read.
+            result["status"] = STATUS_ALREADY_SIGNED_UP
+    if created:
+        # Bulk inserts don't send signals, see signup_changed_callback.
+        transaction.on_commit(
+            partial(invalidate_enrolled_course_ids, [user_id for user_id, _ in created])
+        )
+    yield from results
+
+
+def _get_signups(user_ids: Set[int], course_ids: Set[int]) -> Set[Tuple[int, int]]:
+    return set(
+        CourseSignup.objects.filter(user_id__in=user_ids, course_id__in=course_ids).values_list(
+            "user_id", "course_id"
+        )
+    )
+
+
+def _insert_signups(signups: List[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+    """
+    Insert signups skipping existing ones, returns those inserted. PostgreSQL specific,
+    bulk_create with ignore_conflicts does not tell which rows were skipped.
+    """
+    if not signups:
+        return set()
+    quote = connection.ops.quote_name
+    opts = CourseSignup._meta
+    columns = ", ".join(quote(opts.get_field(field).column) for field in ("user", "course"))
+    sql = (
+        f"INSERT INTO {quote(opts.db_table)} ({columns}) "
+        f"VALUES {', '.join(['(%s, %s)'] * len(signups))} "
+        f"ON CONFLICT DO NOTHING RETURNING {columns}"
+    )
+    params = [value for signup in signups for value in signup]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return set(cursor.fetchall())
+
+
+def _parse_row(row: dict) -> Tuple[Optional[object], Optional[int], Optional[str]]:
+    if not isinstance(row, dict):
+        return None, None, "Invalid row."
+    course_id = _parse_id(row.get("course"))
+    if course_id is None:
+        return None, None, "Invalid course."
+    if row.get("username"):
+        return str(row["username"]), course_id, None
+    user_id = _parse_id(row.get("user"))
+    if user_id is None:
+        return None, course_id, "Invalid user."
+    return user_id, course_id, None
+
+
+def _parse_id(value: object) -> Optional[int]:
+    try:
+        return int(value)  # type: ignore
+    except (TypeError, ValueError):
+        return None
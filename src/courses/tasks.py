@@ -1,51 +1,94 @@
-import io
-from typing import TYPE_CHECKING
+from typing import Dict, Iterable
 
 from celery import shared_task
-from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 
-if TYPE_CHECKING:
-    from courses.models import Course
+
+def get_cover_image_resize_lock_key(course_id: int) -> str:
+    return f"courses:cover-resize:{course_id}"
+
+
+def schedule_course_cover_image_resize(course_id: int):
+    """
+    Enqueues cover resizing unless a job for the course is already waiting. The waiting job reads
+    the newest cover when it starts, so bursts of cover changes are handled by a single job.
+    """
+    if cache.add(
+        get_cover_image_resize_lock_key(course_id),
+        True,
+        timeout=settings.COURSE_COVER_RESIZE_LOCK_TIMEOUT,
+    ):
+        resize_course_cover_image.apply_async(args=[course_id])
 
 
 @shared_task
 def resize_course_cover_image(course_id: int):
-    from django.db.models import signals
-
+    from aws.storages import is_blob_name
+    from courses.images import delete_cover_variants, generate_cover_variants
     from courses.models import Course
-    from courses.signals import cover_image_resize_callback
-
-    try:
-        # Do not call signal again
-        signals.post_save.disconnect(cover_image_resize_callback, sender=Course)
 
-        course = Course.objects.get(id=course_id)
+    # Covers changed from now on have to be handled by another job.
+    cache.delete(get_cover_image_resize_lock_key(course_id))
 
-        with Image.open(course.cover_image) as original_image:
-            new_width, new_height = _get_small_size(original_image)
-            new_image = original_image.resize((new_width, new_height))
-            _save_resized(new_image, course)
+    course = Course.objects.filter(id=course_id).first()
+    if course is None or not course.cover_image:
+        return
+    old_variants = course.cover_variants
+    old_small_cover_name = course.small_cover_image.name
 
-    except Exception:
-        raise
-    finally:
-        signals.post_save.connect(cover_image_resize_callback, sender=Course)
+    variants = generate_cover_variants(
+        course, settings.COURSE_COVER_WIDTHS, settings.COURSE_COVER_FORMATS
+    )
+    # Smallest JPEG is kept as the small cover for clients not using srcset. There are no variants
+    # when none of the configured formats is supported, clients get the cover itself then.
+    candidates = [variant for variant in variants if variant["format"] == "JPEG"] or variants
+    small_cover_name = (
+        min(candidates, key=lambda variant: variant["width"])["name"] if candidates else ""
+    )
+    # A slower job for an older cover must not overwrite variants of the current one. Cover image
+    # itself is not saved, so the resize callback does not schedule another job.
+    updated = Course.objects.filter(id=course_id, cover_image=course.cover_image.name).update(
+        cover_variants=variants, small_cover_image=small_cover_name, updated=timezone.now()
+    )
+    if not updated:
+        delete_cover_variants(course, variants)
+        return
 
+    # Content addressed storage adds a reference on every save, also when the content and so the
+    # name did not change, so old blobs are always released. Other names are deleted only when
+    # they are not reused.
+    names = {variant["name"] for variant in variants}
+    delete_cover_variants(
+        course,
+        [
+            variant
+            for variant in old_variants
+            if is_blob_name(variant["name"]) or variant["name"] not in names
+        ],
+    )
+    # Small covers were stored on their own before variants existed.
+    old_names = {variant["name"] for variant in old_variants}
+    if old_small_cover_name and old_small_cover_name not in old_names:
+        if is_blob_name(old_small_cover_name) or old_small_cover_name not in names:
+            course.cover_image.storage.delete(old_small_cover_name)
 
-def _get_small_size(original_image: Image) -> tuple[int, int]:
-    original_height = original_image.height
-    original_width = original_image.width
-    new_width = 200
-    new_height = int((new_width / original_width) * original_height)
 
-    return new_width, new_height
+def resize_course_cover_images(course_ids: Iterable[int]) -> Dict[int, str]:
+    """
+    Resizes covers of many courses one by one. A failure does not stop the rest of the chunk,
+    errors are returned by course id instead.
+    """
+    errors = {}
+    for course_id in course_ids:
+        try:
+            resize_course_cover_image(course_id)
+        except Exception as error:
+            errors[course_id] = repr(error)
+    return errors
 
 
-def _save_resized(new_image: Image, course: "Course"):
-    output = io.BytesIO()
-    new_image.save(output, format="JPEG")
-    output.seek(0)
-    name_parts = course.cover_image.name.split("/")[-1].split(".")
-    name = "".join(name_parts[:-1]) + "_small" + "." + name_parts[-1]
-    course.small_cover_image.save(name, output, save=False)
-    course.save()
+@shared_task
+def resize_course_cover_images_chunk(course_ids: list[int]) -> Dict[int, str]:
+    return resize_course_cover_images(course_ids)
@@ -1,19 +1,29 @@
+import json
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models import signals
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from common.cache import local_tiers
+from common.media import get_signed_url_window
+from common.tests import get_cover_image
 from courses.models import Course, CourseSection, CourseSignup
 from courses.signals import cover_image_resize_callback
-from lessons.models import Lesson
+from lessons.models import Answer, BaseLesson, Exercise, Lesson, Test, TestQuestion
 
 
 class CoursesApiBaseTestCase(APITestCase):
     def setUp(self):
         super().setUp()
+        cache.clear()
+        local_tiers.clear()
         self.course = Course.objects.create(name="Test Course")
         self.list_url = reverse("courses:course-list")
         self.reorder_url_name = "courses:course-reorder-sections"
@@ -155,6 +165,85 @@ class CourseApiTestCase(CoursesApiBaseTestCase):
             [section2.id, section1.id],
         )
 
+    def test_reorder_number_of_queries(self):
+        sections = [CourseSection.objects.create(course=self.course) for _ in range(20)]
+        data = {"sections": [section.id for section in reversed(sections)]}
+
+        # Permission checks, course, its sections, the update and touching the course.
+        with self.assertNumQueries(6):
+            response = self.client.patch(self.reorder_url, data=data)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(self.course.get_coursesection_order().values_list("id", flat=True)),
+            data["sections"],
+        )
+
+    def test_reorder_section_of_other_course(self):
+        section = CourseSection.objects.create(course=self.course)
+        other_section = CourseSection.objects.create(course=Course.objects.create(name="other"))
+
+        response = self.client.patch(
+            self.reorder_url, data={"sections": [other_section.id, section.id]}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reorder_lessons_with_move_between_sections(self):
+        section1 = CourseSection.objects.create(course=self.course, name="first")
+        section2 = CourseSection.objects.create(course=self.course, name="second")
+        lesson1 = Lesson.objects.create(course_section=section1, name="first")
+        lesson2 = Lesson.objects.create(course_section=section1, name="second")
+        lesson3 = Lesson.objects.create(course_section=section2, name="third")
+        data = {
+            "sections": [
+                {"id": section1.id, "lessons": [lesson2.id]},
+                {"id": section2.id, "lessons": [lesson3.id, lesson1.id]},
+            ]
+        }
+
+        response = self.client.patch(
+            reverse("courses:course-reorder-lessons", args=(self.course.id,)),
+            data=data,
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(section1.get_baselesson_order().values_list("id", flat=True)), [lesson2.id]
+        )
+        self.assertEqual(
+            list(section2.get_baselesson_order().values_list("id", flat=True)),
+            [lesson3.id, lesson1.id],
+        )
+        # Lesson details are validated by the version of the lesson.
+        self.assertGreater(Lesson.objects.get(id=lesson1.id).updated, lesson1.updated)
+
+    def test_reorder_lessons_requires_every_lesson(self):
+        section1 = CourseSection.objects.create(course=self.course, name="first")
+        section2 = CourseSection.objects.create(course=self.course, name="second")
+        lesson1 = Lesson.objects.create(course_section=section1, name="first")
+        Lesson.objects.create(course_section=section2, name="second")
+
+        response = self.client.patch(
+            reverse("courses:course-reorder-lessons", args=(self.course.id,)),
+            data={"sections": [{"id": section2.id, "lessons": [lesson1.id]}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reorder_lessons_without_permissions(self):
+        self.user.user_permissions.clear()
+
+        response = self.client.patch(
+            reverse("courses:course-reorder-lessons", args=(self.course.id,)),
+            data={"sections": []},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_retrieve_assigned_structure(self):
         course_section = CourseSection.objects.create(course=self.course, name="test section")
         lesson = Lesson.objects.create(course_section=course_section, name="test_lesson")
@@ -170,6 +259,7 @@ class CourseApiTestCase(CoursesApiBaseTestCase):
                         {
                             "id": lesson.id,
                             "name": lesson.name,
+                            "lessonType": "Lesson",
                             "isComplete": lesson.is_completed_by(self.user),
                         }
                     ],
@@ -185,6 +275,19 @@ class CourseApiTestCase(CoursesApiBaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(response.json(), expected_data)
 
+    def test_list_assigned_number_of_queries(self):
+        course_section = CourseSection.objects.create(course=self.course, name="test section")
+        Lesson.objects.create(course_section=course_section, name="lesson")
+        Exercise.objects.create(course_section=course_section, name="exercise")
+        Test.objects.create(course_section=course_section, name="test")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+        self.client.force_authenticate(self.user)
+
+        # Count, courses, sections and lessons. Lessons are not upcast to their types.
+        with self.assertNumQueries(4):
+            r = self.client.get(reverse("courses:course-list-assigned"))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
     def test_retrieve_assigned_number_of_queries(self):
         course_section = CourseSection.objects.create(course=self.course, name="test section")
         Lesson.objects.create(course_section=course_section, name="test_lesson")
@@ -196,6 +299,180 @@ class CourseApiTestCase(CoursesApiBaseTestCase):
             r = self.client.get(reverse("courses:course-retrieve-assigned", args=(self.course.id,)))
         self.assertEqual(r.status_code, status.HTTP_200_OK)
 
+        # The outline is cached, only the course and completed lessons are fetched.
+        with self.assertNumQueries(2):
+            r = self.client.get(reverse("courses:course-retrieve-assigned", args=(self.course.id,)))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_assigned_cache_invalidation(self):
+        course_section = CourseSection.objects.create(course=self.course, name="test section")
+        lesson = Lesson.objects.create(course_section=course_section, name="test_lesson")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+        url = reverse("courses:course-retrieve-assigned", args=(self.course.id,))
+        self.client.get(url)
+
+        lesson.name = "renamed lesson"
+        lesson.save()
+        lesson.complete(self.user)
+        other_section = CourseSection.objects.create(course=self.course, name="other section")
+        response = self.client.get(url)
+
+        sections = response.json()["sections"]
+        self.assertEqual(sections[0]["lessons"][0]["name"], "renamed lesson")
+        self.assertTrue(sections[0]["lessons"][0]["isComplete"])
+        self.assertEqual(sections[1]["id"], other_section.id)
+
+        self.client.patch(
+            self.reorder_url, data={"sections": [other_section.id, course_section.id]}
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(
+            [section["id"] for section in response.json()["sections"]],
+            [other_section.id, course_section.id],
+        )
+
+    def test_progress_structure(self):
+        section1 = CourseSection.objects.create(course=self.course, name="first section")
+        section2 = CourseSection.objects.create(course=self.course, name="second section")
+        lesson = Lesson.objects.create(course_section=section1, name="first lesson")
+        Lesson.objects.create(course_section=section1, name="second lesson")
+        Lesson.objects.create(course_section=section2, name="third lesson")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+        lesson.complete(self.user)
+        User = get_user_model()
+        other_user = User.objects.create_user(
+            username="other", email="other@example.com", password="test"
+        )
+        CourseSignup.objects.create(user=other_user, course=self.course)
+        for other_lesson in Lesson.objects.all():
+            other_lesson.complete(other_user)
+        expected_data = [
+            {
+                "id": self.course.id,
+                "name": self.course.name,
+                "totalLessons": 3,
+                "completedLessons": 1,
+                "percent": 33.33,
+                "sections": [
+                    {
+                        "id": section1.id,
+                        "name": section1.name,
+                        "totalLessons": 2,
+                        "completedLessons": 1,
+                        "percent": 50.0,
+                    },
+                    {
+                        "id": section2.id,
+                        "name": section2.name,
+                        "totalLessons": 1,
+                        "completedLessons": 0,
+                        "percent": 0.0,
+                    },
+                ],
+            }
+        ]
+
+        response = self.client.get(reverse("courses:course-progress"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected_data)
+
+    def test_progress_lists_only_own(self):
+        Course.objects.create(name="Other Course")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+
+        response = self.client.get(reverse("courses:course-progress"))
+
+        self.assertEqual([course["id"] for course in response.json()], [self.course.id])
+
+    def test_progress_number_of_queries(self):
+        for course_number in range(3):
+            course = Course.objects.create(name=f"Course {course_number}")
+            CourseSignup.objects.create(user=self.user, course=course)
+            for section_number in range(3):
+                section = CourseSection.objects.create(course=course, name="section")
+                Lesson.objects.create(course_section=section, name="lesson").complete(self.user)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("courses:course-progress"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_not_modified(self):
+        self.course.cover_image = get_cover_image()
+        self.course.save()
+        url = reverse("courses:course-detail", args=(self.course.id,))
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        CourseSection.objects.create(course=self.course, name="new section")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_modified_when_signed_urls_change(self):
+        self.course.cover_image = get_cover_image()
+        self.course.save()
+        url = reverse("courses:course-detail", args=(self.course.id,))
+        with mock.patch("courses.views.get_signed_url_window", return_value=1):
+            etag = self.client.get(url)["ETag"]
+
+        with mock.patch("courses.views.get_signed_url_window", return_value=2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_modified_since_when_signed_urls_change(self):
+        url = reverse("courses:course-detail", args=(self.course.id,))
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        window = get_signed_url_window() + 1
+        with mock.patch("courses.views.get_signed_url_window", return_value=window):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_assigned_not_modified(self):
+        course_section = CourseSection.objects.create(course=self.course, name="test section")
+        lesson = Lesson.objects.create(course_section=course_section, name="test_lesson")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+        url = reverse("courses:course-retrieve-assigned", args=(self.course.id,))
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        lesson.complete(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["sections"][0]["lessons"][0]["isComplete"])
+
+    def test_retrieve_progress(self):
+        course_section = CourseSection.objects.create(course=self.course, name="test section")
+        lesson = Lesson.objects.create(course_section=course_section, name="test_lesson")
+        Lesson.objects.create(course_section=course_section, name="other_lesson")
+        CourseSignup.objects.create(user=self.user, course=self.course)
+        lesson.complete(self.user)
+
+        response = self.client.get(
+            reverse("courses:course-retrieve-progress", args=(self.course.id,))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["completedCount"], 1)
+        self.assertEqual(data["totalCount"], 2)
+        self.assertEqual(data["percent"], 50.0)
+
+    def test_retrieve_progress_not_signed_up(self):
+        response = self.client.get(
+            reverse("courses:course-retrieve-progress", args=(self.course.id,))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class CoursesSignupApiAccessTestCase(APITestCase):
     def setUp(self):
@@ -268,3 +545,430 @@ class CoursesSignupApiAccessTestCase(APITestCase):
 
     def tearDown(self):
         self.course.cover_image.delete(save=True)
+
+
+class CoursesPaginationTestCase(CoursesApiBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_courses = [Course.objects.create(name=f"Course {i}") for i in range(4)]
+        self.client.force_authenticate(self.user)
+
+    def test_keyset_pagination(self):
+        ids = []
+        url = f"{self.list_url}?pagination=keyset&limit=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.json())
+            ids += [course["id"] for course in response.json()["results"]]
+            url = response.json()["next"]
+
+        self.assertEqual(ids, sorted(Course.objects.values_list("id", flat=True)))
+
+    def test_keyset_pagination_does_not_count(self):
+        with self.assertNumQueries(1):
+            self.client.get(f"{self.list_url}?pagination=keyset&limit=2")
+
+    def test_skip_count(self):
+        response = self.client.get(f"{self.list_url}?count=false&limit=2&offset=2")
+
+        data = response.json()
+        self.assertIsNone(data["count"])
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIn("offset=4", data["next"])
+        self.assertIsNotNone(data["previous"])
+
+    def test_skip_count_last_page(self):
+        response = self.client.get(f"{self.list_url}?count=false&limit=5&offset=0")
+
+        data = response.json()
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNone(data["next"])
+
+    def test_default_pagination_counts(self):
+        response = self.client.get(self.list_url)
+
+        self.assertEqual(response.json()["count"], 5)
+
+
+class CoursesBulkSignupApiTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("courses:course_signups-bulk")
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+        self.user.user_permissions.add(
+            Permission.objects.get(
+                codename="add_coursesignup",
+                content_type=ContentType.objects.get_for_model(CourseSignup),
+            )
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f"student{i}", email=f"student{i}@example.com", password="test"
+            )
+            for i in range(3)
+        ]
+        self.course = Course.objects.create(name="Test Course")
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_signup_without_permissions(self):
+        self.user.user_permissions.clear()
+
+        response = self.client.post(self.url, data={"signups": []}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_signup(self):
+        CourseSignup.objects.create(user=self.students[0], course=self.course)
+        data = {
+            "signups": [
+                {"user": self.students[0].id, "course": self.course.id},
+                {"user": self.students[1].id, "course": self.course.id},
+                {"username": self.students[2].username, "course": self.course.id},
+                {"user": self.students[1].id, "course": self.course.id},
+                {"user": self.students[1].id, "course": 0},
+                {"user": "invalid", "course": self.course.id},
+            ]
+        }
+
+        response = self.client.post(self.url, data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["already_signed_up", "created", "created", "duplicate", "invalid", "invalid"],
+        )
+        self.assertEqual(
+            response.json()["summary"],
+            {"alreadySignedUp": 1, "created": 2, "duplicate": 1, "invalid": 2},
+        )
+        self.assertEqual(CourseSignup.objects.filter(course=self.course).count(), 3)
+
+    def test_bulk_signup_concurrently_signed_up(self):
+        CourseSignup.objects.create(user=self.students[0], course=self.course)
+        data = {
+            "signups": [
+                {"user": self.students[0].id, "course": self.course.id},
+                {"user": self.students[1].id, "course": self.course.id},
+            ]
+        }
+
+        # The signup is created after existing signups were read.
+        with mock.patch("courses.signups._get_signups", return_value=set()):
+            response = self.client.post(self.url, data=data, format="json")
+
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["already_signed_up", "created"],
+        )
+        self.assertEqual(response.json()["summary"], {"alreadySignedUp": 1, "created": 1})
+
+    def test_bulk_signup_number_of_queries(self):
+        data = {
+            "signups": [{"user": student.id, "course": self.course.id} for student in self.students]
+        }
+
+        # Two permission queries, then users, courses, existing signups and the insert.
+        with self.assertNumQueries(6):
+            self.client.post(self.url, data=data, format="json")
+
+    def test_bulk_signup_from_roster(self):
+        roster = "username,course\n" + "".join(
+            f"{student.username},{self.course.id}\n" for student in self.students
+        )
+        roster_file = SimpleUploadedFile("roster.csv", roster.encode(), content_type="text/csv")
+
+        response = self.client.post(self.url, data={"roster": roster_file}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["summary"], {"created": 3})
+        self.assertEqual(CourseSignup.objects.filter(course=self.course).count(), 3)
+
+    def test_bulk_signup_streaming(self):
+        data = {
+            "signups": [{"user": student.id, "course": self.course.id} for student in self.students]
+        }
+
+        response = self.client.post(f"{self.url}?stream=true", data=data, format="json")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["user"] for line in lines],
+            [student.id for student in self.students],
+        )
+        self.assertEqual(CourseSignup.objects.filter(course=self.course).count(), 3)
+
+    def test_bulk_signup_requires_input(self):
+        response = self.client.post(self.url, data={}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+COURSES_YAML = """
+- name: Imported
+  description: Imported course
+  sections:
+    - name: First
+      lessons:
+        - name: Intro
+        - name: Practice
+          lessonType: Exercise
+        - name: Quiz
+          lessonType: Test
+          questions:
+            - text: Question
+              answers:
+                - text: Right
+                  isCorrect: true
+                - text: Wrong
+    - name: Second
+- name: Empty
+"""
+
+
+class CoursesImportApiTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("courses:course-import")
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def _post(self, content: str, name: str = "courses.yaml", **data):
+        document = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, data={"document": document, **data}, format="multipart")
+
+    def test_import_not_admin(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self._post(COURSES_YAML)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Course.objects.exists())
+
+    def test_import_yaml(self):
+        response = self._post(COURSES_YAML)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        summary = response.json()
+        self.assertEqual(
+            [summary[key] for key in ("courses", "sections", "lessons", "questions", "answers")],
+            [2, 2, 3, 1, 2],
+        )
+        course = Course.objects.get(name="Imported")
+        first, second = course.course_sections.all()
+        self.assertEqual([first.name, second.name], ["First", "Second"])
+        lessons = list(first.lessons.all())
+        self.assertEqual([lesson.name for lesson in lessons], ["Intro", "Practice", "Quiz"])
+        self.assertEqual([type(lesson) for lesson in lessons], [Lesson, Exercise, Test])
+        self.assertEqual(
+            list(lessons[2].questions.get().answers.values_list("text", "is_correct")),
+            [("Right", True), ("Wrong", False)],
+        )
+
+    def test_imported_course_without_cover(self):
+        self._post(COURSES_YAML)
+        course = Course.objects.get(name="Imported")
+
+        response = self.client.get(reverse("courses:course-detail", args=(course.id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.json()["image"])
+
+    def test_import_json(self):
+        document = json.dumps(
+            [
+                {
+                    "name": f"Course {i}",
+                    "sections": [{"name": "Section", "lessons": [{"name": "L"}]}],
+                }
+                for i in range(3)
+            ]
+        )
+
+        response = self._post(document, name="courses.json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Lesson.objects.filter(course_section__course__name="Course 2").count(), 1)
+
+    def test_import_validate_only(self):
+        response = self._post(COURSES_YAML, validate_only=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["courses"], 2)
+        self.assertFalse(Course.objects.exists())
+
+    def test_import_invalid_course_rolls_back(self):
+        document = json.dumps(
+            [{"name": "Valid"}, {"name": "Invalid", "sections": [{"lessons": [{"name": "L"}]}]}]
+        )
+
+        response = self._post(document, name="courses.json")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(response.json()["course"], "2")
+        self.assertFalse(Course.objects.exists())
+
+    def test_import_questions_only_in_tests(self):
+        document = json.dumps(
+            [
+                {
+                    "name": "C",
+                    "sections": [
+                        {"name": "S", "lessons": [{"name": "L", "questions": [{"text": "Q"}]}]}
+                    ],
+                }
+            ]
+        )
+
+        response = self._post(document, name="courses.json")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(BaseLesson.objects.exists())
+
+    def test_import_malformed_json(self):
+        response = self._post('[{"name": "C"}, {"name": ', name="courses.json")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(Course.objects.exists())
+        self.assertFalse(Answer.objects.exists())
+
+
+class CoursesExportApiTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        # The exported course is created by the import, so both formats can be compared.
+        document = SimpleUploadedFile("courses.yaml", COURSES_YAML.encode())
+        self.client.post(reverse("courses:course-import"), data={"document": document})
+        self.course = Course.objects.get(name="Imported")
+        self.url = reverse("courses:course-export", args=(self.course.id,))
+
+    def _read(self, response) -> str:
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_not_admin(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_json(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        (course,) = json.loads(self._read(response))
+        self.assertEqual(course["name"], "Imported")
+        self.assertEqual([section["name"] for section in course["sections"]], ["First", "Second"])
+        lessons = course["sections"][0]["lessons"]
+        self.assertEqual(
+            [(lesson["name"], lesson["lessonType"]) for lesson in lessons],
+            [("Intro", "Lesson"), ("Practice", "Exercise"), ("Quiz", "Test")],
+        )
+        self.assertEqual(
+            [
+                (answer["text"], answer["isCorrect"])
+                for answer in lessons[2]["questions"][0]["answers"]
+            ],
+            [("Right", True), ("Wrong", False)],
+        )
+        self.assertEqual(course["sections"][1]["lessons"], [])
+        self.assertNotIn("video", lessons[0])
+
+    def test_export_can_be_imported(self):
+        exported = self._read(self.client.get(self.url))
+        document = SimpleUploadedFile("course.json", exported.encode())
+
+        response = self.client.post(reverse("courses:course-import"), data={"document": document})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = Course.objects.exclude(id=self.course.id).get(name="Imported")
+        self.assertEqual(
+            list(
+                BaseLesson.objects.filter(course_section__course=copy).values_list(
+                    "name", flat=True
+                )
+            ),
+            ["Intro", "Practice", "Quiz"],
+        )
+        self.assertEqual(
+            Answer.objects.filter(question__test__course_section__course=copy).count(), 2
+        )
+
+    def test_export_lessons_with_same_order(self):
+        section = CourseSection.objects.create(course=self.course, name="Third")
+        other_section = CourseSection.objects.create(course=self.course, name="Fourth")
+        moved = Test.objects.create(course_section=other_section, name="B")
+        TestQuestion.objects.create(test=moved, text="qb")
+        test = Test.objects.create(course_section=section, name="A")
+        TestQuestion.objects.create(test=test, text="qa")
+        # Moving with save() keeps _order, so both tests of the section share it.
+        moved.course_section = section
+        moved.save()
+
+        (course,) = json.loads(self._read(self.client.get(self.url)))
+
+        self.assertEqual(
+            {
+                lesson["name"]: [question["text"] for question in lesson["questions"]]
+                for lesson in course["sections"][2]["lessons"]
+            },
+            {"A": ["qa"], "B": ["qb"]},
+        )
+
+    def test_export_ndjson(self):
+        response = self.client.get(f"{self.url}?ndjson=true")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [json.loads(line) for line in self._read(response).splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            [
+                "course",
+                "section",
+                "lesson",
+                "lesson",
+                "lesson",
+                "question",
+                "answer",
+                "answer",
+                "section",
+            ],
+        )
+        test = Test.objects.get(course_section__course=self.course)
+        self.assertEqual(records[5]["parent"], test.id)
+        self.assertEqual(records[6]["parent"], records[5]["id"])
+
+    def test_export_media(self):
+        lesson = Lesson.objects.get(course_section__course=self.course)
+        lesson.video = SimpleUploadedFile("video.mp4", b"video")
+        lesson.save()
+
+        response = self.client.get(f"{self.url}?media=true")
+
+        (course,) = json.loads(self._read(response))
+        intro, practice, _ = course["sections"][0]["lessons"]
+        self.assertIn(lesson.video.name, intro["video"])
+        self.assertIsNone(intro["additionalMaterials"])
+        self.assertIsNone(practice["video"])
+        self.assertIsNone(course["coverImage"])
+        lesson.video.delete()
+
+    def test_export_number_of_queries(self):
+        # The course, then a single query per level no matter how many rows there are.
+        with self.assertNumQueries(5):
+            self._read(self.client.get(self.url))
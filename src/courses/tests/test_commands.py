@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import signals
+from django.test import TestCase, override_settings
+
+from courses.models import Course, CourseProgress, CourseSection, CourseSignup
+from courses.signals import cover_image_resize_callback
+from courses.tests.test_tasks import get_large_cover_image
+from lessons.models import CompletedLesson, Lesson, Test
+
+
+class RebuildCourseProgressTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        signals.post_save.disconnect(cover_image_resize_callback, sender=Course)
+        self.course = Course.objects.create(name="Test Course")
+        section = CourseSection.objects.create(course=self.course, name="section")
+        self.lesson = Lesson.objects.create(course_section=section, name="lesson")
+        Lesson.objects.create(course_section=section, name="other lesson")
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+        CourseSignup.objects.create(user=self.user, course=self.course)
+
+    def tearDown(self):
+        signals.post_save.connect(cover_image_resize_callback, sender=Course)
+
+    def test_rebuild(self):
+        CompletedLesson.objects.create(lesson=self.lesson, user=self.user)
+
+        call_command("rebuild_course_progress", stdout=StringIO())
+
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(progress.completed_count, 1)
+        self.assertEqual(progress.total_count, 2)
+        self.assertIsNotNone(progress.last_completed_at)
+
+    def test_check_repairs_drift(self):
+        self.lesson.complete(self.user)
+        CourseProgress.objects.update(completed_count=0, total_count=10)
+
+        call_command("rebuild_course_progress", "--check", stdout=StringIO())
+
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(progress.completed_count, 1)
+        self.assertEqual(progress.total_count, 2)
+
+    def test_check_dry_run(self):
+        self.lesson.complete(self.user)
+        CourseProgress.objects.update(completed_count=0)
+        output = StringIO()
+
+        call_command("rebuild_course_progress", "--check", "--dry-run", stdout=output)
+
+        self.assertIn("Found 1 drifted", output.getvalue())
+        self.assertEqual(CourseProgress.objects.get(user=self.user).completed_count, 0)
+
+
+class RegenerateCourseCoversTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        signals.post_save.disconnect(cover_image_resize_callback, sender=Course)
+        self.courses = [
+            Course.objects.create(name=f"Course {number}", cover_image=get_large_cover_image())
+            for number in range(3)
+        ]
+        Course.objects.create(name="Course without cover")
+        self.checkpoint = os.path.join(self.media_root, "checkpoint")
+
+    def tearDown(self):
+        signals.post_save.connect(cover_image_resize_callback, sender=Course)
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_regenerate(self):
+        output = StringIO()
+
+        call_command(
+            "regenerate_course_covers",
+            "--concurrency=1",
+            "--chunk-size=2",
+            f"--checkpoint={self.checkpoint}",
+            stdout=output,
+            stderr=StringIO(),
+        )
+
+        self.assertIn("Done: 3 courses regenerated, 0 failed", output.getvalue())
+        self.assertFalse(
+            Course.objects.filter(
+                id__in=[course.id for course in self.courses], cover_variants=[]
+            ).exists()
+        )
+        with open(self.checkpoint) as file:
+            self.assertEqual(int(file.read()), self.courses[-1].id)
+
+    def test_resume_from_checkpoint(self):
+        with open(self.checkpoint, "w") as file:
+            file.write(str(self.courses[0].id))
+
+        call_command(
+            "regenerate_course_covers",
+            "--concurrency=1",
+            f"--checkpoint={self.checkpoint}",
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+        self.assertEqual(Course.objects.get(id=self.courses[0].id).cover_variants, [])
+        self.assertNotEqual(Course.objects.get(id=self.courses[1].id).cover_variants, [])
+
+    def test_dry_run(self):
+        output = StringIO()
+
+        call_command("regenerate_course_covers", "--dry-run", stdout=output)
+
+        self.assertIn("3 courses to process.", output.getvalue())
+        self.assertFalse(Course.objects.exclude(cover_variants=[]).exists())
+
+
+class ImportCoursesTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "courses.yaml")
+        with open(self.path, "w") as file:
+            for i in range(5):
+                file.write(
+                    f"- name: Course {i}\n"
+                    "  sections:\n"
+                    "    - name: Section\n"
+                    "      lessons:\n"
+                    "        - name: Quiz\n"
+                    "          lesson_type: Test\n"
+                    "          questions:\n"
+                    "            - text: Question\n"
+                )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_import(self):
+        output = StringIO()
+
+        call_command("import_courses", self.path, "--batch-size=2", stdout=output)
+
+        self.assertEqual(Course.objects.count(), 5)
+        self.assertEqual(Test.objects.filter(questions__text="Question").count(), 5)
+        lines = output.getvalue().splitlines()
+        # Progress after each full batch and the summary.
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[-1].startswith("Imported 5 courses, 5 sections, 5 lessons"))
+
+    def test_validate_only(self):
+        output = StringIO()
+
+        call_command("import_courses", self.path, "--validate-only", stdout=output)
+
+        self.assertFalse(Course.objects.exists())
+        self.assertIn("Validated 5 courses", output.getvalue())
+
+    def test_invalid_document(self):
+        with open(self.path, "a") as file:
+            file.write("- description: no name\n")
+
+        with self.assertRaises(CommandError):
+            call_command("import_courses", self.path, stdout=StringIO())
+
+        self.assertFalse(Course.objects.exists())
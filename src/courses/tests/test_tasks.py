@@ -0,0 +1,199 @@
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import signals
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from aws.models import Blob
+from courses.images import FORMAT_MIME_TYPES, generate_cover_variants, is_format_supported
+from courses.models import Course
+from courses.serializers import CourseDetailSerializer
+from courses.signals import cover_image_resize_callback
+from courses.tasks import resize_course_cover_image
+
+
+def get_large_cover_image(width: int = 1000, height: int = 500) -> SimpleUploadedFile:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), color=(120, 60, 30)).save(output, format="JPEG")
+    return SimpleUploadedFile(
+        name="large_image.jpg", content=output.getvalue(), content_type="image/jpeg"
+    )
+
+
+@override_settings(COURSE_COVER_WIDTHS=[200, 400, 800, 1200], COURSE_COVER_FORMATS=["JPEG", "WEBP"])
+class ResizeCourseCoverImageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        signals.post_save.disconnect(cover_image_resize_callback, sender=Course)
+        self.course = Course.objects.create(name="Test Course", cover_image=get_large_cover_image())
+        self.formats = [
+            image_format for image_format in ("JPEG", "WEBP") if is_format_supported(image_format)
+        ]
+
+    def tearDown(self):
+        signals.post_save.connect(cover_image_resize_callback, sender=Course)
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_generates_variants(self):
+        resize_course_cover_image(self.course.id)
+
+        self.course.refresh_from_db()
+        self.assertEqual(
+            [(variant["width"], variant["format"]) for variant in self.course.cover_variants],
+            [(width, image_format) for width in (800, 400, 200) for image_format in self.formats],
+        )
+        for variant in self.course.cover_variants:
+            with self.course.cover_image.storage.open(variant["name"]) as file, Image.open(
+                file
+            ) as image:
+                self.assertEqual(image.format, variant["format"])
+                self.assertEqual(image.size, (variant["width"], variant["height"]))
+        self.assertEqual(self.course.small_cover_image.width, 200)
+
+    def test_small_image_has_single_width(self):
+        self.course.cover_image = get_large_cover_image(width=100, height=100)
+        self.course.save()
+
+        resize_course_cover_image(self.course.id)
+
+        self.course.refresh_from_db()
+        self.assertEqual({variant["width"] for variant in self.course.cover_variants}, {100})
+
+    @override_settings(COURSE_COVER_FORMATS=["NOT-A-FORMAT"])
+    def test_no_supported_formats(self):
+        resize_course_cover_image(self.course.id)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.cover_variants, [])
+        self.assertFalse(self.course.small_cover_image)
+
+    def test_regenerating_removes_old_variants(self):
+        resize_course_cover_image(self.course.id)
+        self.course.refresh_from_db()
+        old_variants = self.course.cover_variants
+
+        resize_course_cover_image(self.course.id)
+
+        storage = self.course.cover_image.storage
+        self.assertFalse(any(storage.exists(variant["name"]) for variant in old_variants))
+
+    @override_settings(DEFAULT_FILE_STORAGE="aws.storages.ContentAddressedFileSystemStorage")
+    def test_regenerating_releases_unchanged_blobs(self):
+        resize_course_cover_image(self.course.id)
+        self.course.refresh_from_db()
+        old_names = [variant["name"] for variant in self.course.cover_variants]
+
+        resize_course_cover_image(self.course.id)
+
+        self.course.refresh_from_db()
+        self.assertEqual([variant["name"] for variant in self.course.cover_variants], old_names)
+        self.assertEqual(
+            list(Blob.objects.filter(name__in=old_names).values_list("references", flat=True)),
+            [1] * len(old_names),
+        )
+
+    def test_legacy_small_cover_deleted(self):
+        storage = self.course.cover_image.storage
+        legacy_name = storage.save("images/courses/cover_small.jpg", get_large_cover_image())
+        Course.objects.filter(id=self.course.id).update(small_cover_image=legacy_name)
+
+        resize_course_cover_image(self.course.id)
+
+        self.assertFalse(storage.exists(legacy_name))
+
+    def test_outdated_cover_does_not_overwrite_newer(self):
+        generated = []
+
+        def generate_while_cover_changes(course, widths, formats):
+            Course.objects.filter(id=course.id).update(cover_image="images/courses/newer.jpg")
+            generated.extend(generate_cover_variants(course, widths, formats))
+            return generated
+
+        with patch("courses.images.generate_cover_variants", generate_while_cover_changes):
+            resize_course_cover_image(self.course.id)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.cover_variants, [])
+        storage = self.course.cover_image.storage
+        self.assertTrue(generated)
+        self.assertFalse(any(storage.exists(variant["name"]) for variant in generated))
+
+    def test_deleted_course(self):
+        course_id = self.course.id
+        self.course.delete()
+
+        resize_course_cover_image(course_id)
+
+    def test_srcset(self):
+        resize_course_cover_image(self.course.id)
+        self.course.refresh_from_db()
+
+        data = CourseDetailSerializer(instance=self.course).data
+
+        self.assertEqual(
+            [entry.split(" ")[1] for entry in data["srcset"].split(", ")], ["800w", "400w", "200w"]
+        )
+        self.assertEqual(
+            [source["type"] for source in data["sources"]],
+            [FORMAT_MIME_TYPES[image_format] for image_format in self.formats],
+        )
+
+
+@patch.object(resize_course_cover_image, "apply_async")
+class CoverImageResizeCallbackTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_scheduled_after_commit(self, apply_async):
+        with self.captureOnCommitCallbacks() as callbacks:
+            course = Course.objects.create(name="Test Course", cover_image=get_large_cover_image())
+            apply_async.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        apply_async.assert_called_once_with(args=[course.id])
+
+    def test_not_scheduled_without_cover_change(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(name="Test Course", cover_image=get_large_cover_image())
+        apply_async.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            course.name = "Renamed"
+            course.save()
+            course = Course.objects.get(id=course.id)
+            course.description = "New description"
+            course.save()
+
+        self.assertEqual(callbacks, [])
+        apply_async.assert_not_called()
+
+    def test_burst_of_changes_coalesced(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(name="Test Course", cover_image=get_large_cover_image())
+        with self.captureOnCommitCallbacks(execute=True):
+            course.cover_image = get_large_cover_image(width=800)
+            course.save()
+        apply_async.assert_called_once_with(args=[course.id])
+
+        # Starting the job releases the lock, further changes need another one.
+        resize_course_cover_image(course.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            course.cover_image = get_large_cover_image(width=600)
+            course.save()
+        self.assertEqual(apply_async.call_count, 2)
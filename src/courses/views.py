@@ -1,27 +1,48 @@
+import json
+from collections import Counter
 from typing import Type
 
 from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework.viewsets import ModelViewSet
 
-from courses.models import Course, CourseSignup
+from common.cache import cached_value
+from common.conditional import conditional_response, get_version
+from common.exceptions import ProcessingApiException, ProcessingException
+from common.media import get_signed_url_window, get_signed_url_window_start
+from courses.exports import export_course_json, export_course_ndjson
+from courses.imports import import_courses, read_course_document
+from courses.models import Course, CourseProgress, CourseSignup
+from courses.outline import get_course_outline_for_user
 from courses.permissions import (
     CourseDeletePermission,
     CourseEditPermission,
     CoursesCreatePermission,
+    CourseSignupBulkCreatePermission,
 )
 from courses.serializers import (
+    BulkSignupSerializer,
     CourseDetailSerializer,
+    CourseImportSerializer,
+    CourseLessonsReorderSerializer,
+    CourseProgressCountersSerializer,
+    CourseProgressSerializer,
     CourseSectionReorderSerializer,
     CourseSerializer,
-    CourseWithLessonsSerializer,
     SignupSerializer,
 )
+from courses.signups import bulk_signup, read_roster
+
+COURSE_DETAIL_CACHE_NAMESPACE = "courses:detail"
+# Payload contains signed media URLs, which are guaranteed to be valid for 10 minutes only.
+COURSE_DETAIL_CACHE_TIMEOUT = 60 * 5
 
 
 class CourseViewSet(ModelViewSet):
@@ -30,19 +51,45 @@ class CourseViewSet(ModelViewSet):
 
     def get_queryset(self) -> QuerySet:
         queryset = self.queryset
-        if self.action in {"list_assigned", "retrieve_assigned"}:
+        if self.action == "list_assigned":
             queryset = queryset.filter_signed_up(user=self.request.user).with_completed_lessons(
                 user=self.request.user
             )
-        return queryset.only("id", "name", "description", "cover_image", "small_cover_image")
+        elif self.action == "retrieve_assigned":
+            queryset = queryset.filter_signed_up(user=self.request.user).with_progress_updated(
+                user=self.request.user
+            )
+        elif self.action == "retrieve_progress":
+            queryset = queryset.filter_signed_up(user=self.request.user)
+        elif self.action == "progress":
+            queryset = (
+                queryset.filter_signed_up(user=self.request.user)
+                .with_progress(user=self.request.user)
+                .order_by("id")
+            )
+        return queryset.only(
+            "id",
+            "name",
+            "description",
+            "cover_image",
+            "small_cover_image",
+            "cover_variants",
+            "updated",
+        )
 
     def get_serializer_class(self) -> Type[Serializer]:
         if self.action == "retrieve":
             return CourseDetailSerializer
         elif self.action == "reorder_sections":
             return CourseSectionReorderSerializer
-        elif self.action == "retrieve_assigned":
-            return CourseWithLessonsSerializer
+        elif self.action == "reorder_lessons":
+            return CourseLessonsReorderSerializer
+        elif self.action == "progress":
+            return CourseProgressSerializer
+        elif self.action == "retrieve_progress":
+            return CourseProgressCountersSerializer
+        elif self.action == "import_courses":
+            return CourseImportSerializer
         else:
             return CourseSerializer
 
@@ -56,12 +103,75 @@ class CourseViewSet(ModelViewSet):
             permission_classes = [IsAuthenticated, CoursesCreatePermission]
         elif self.action in {"retrieve", "list"}:
             permission_classes = self.permission_classes
-        elif self.action in {"create", "update", "partial_update", "reorder_sections"}:
+        elif self.action in {
+            "create",
+            "update",
+            "partial_update",
+            "reorder_sections",
+            "reorder_lessons",
+        }:
             permission_classes = [IsAuthenticated, CourseEditPermission]
         elif self.action == "delete":
             permission_classes = [IsAuthenticated, CourseDeletePermission]
+        elif self.action in ("import_courses", "export"):
+            permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        course = self.get_object()
+        # Cover URLs are signed, the payload changes with their window.
+        window = get_signed_url_window()
+        return conditional_response(
+            request,
+            versions=("course", course.id, course.version, window),
+            modified=(course.updated, get_signed_url_window_start(window)),
+            get_response=lambda: Response(
+                cached_value(
+                    COURSE_DETAIL_CACHE_NAMESPACE,
+                    f"{course.id}:{window}",
+                    lambda: self.get_serializer(instance=course).data,
+                    timeout=COURSE_DETAIL_CACHE_TIMEOUT,
+                    version=course.version,
+                )
+            ),
+        )
+
+    @action(detail=False, methods=["POST"], url_path="import", url_name="import")
+    def import_courses(self, request: Request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validate_only = serializer.validated_data["validate_only"]
+        try:
+            summary = import_courses(
+                read_course_document(serializer.validated_data["document"]),
+                validate_only=validate_only,
+            )
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return Response(
+            summary, status=status.HTTP_200_OK if validate_only else status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=["GET"], url_path="export")
+    def export(self, request: Request, pk: int) -> HttpResponseBase:
+        course = self.get_object()
+        include_media = request.query_params.get("media") == "true"
+        if request.query_params.get("ndjson") == "true":
+            content, content_type, extension = (
+                export_course_ndjson(course, include_media),
+                "application/x-ndjson",
+                "ndjson",
+            )
+        else:
+            content, content_type, extension = (
+                export_course_json(course, include_media),
+                "application/json",
+                "json",
+            )
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="course-{course.id}.{extension}"'
+        return response
+
     @action(detail=True, methods=["PATCH"], url_path="reorder-sections")
     def reorder_sections(self, request: Request, pk: int) -> Response:
         course = self.get_object()
@@ -71,6 +181,15 @@ class CourseViewSet(ModelViewSet):
         serializer.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=["PATCH"], url_path="reorder-lessons")
+    def reorder_lessons(self, request: Request, pk: int) -> Response:
+        course = self.get_object()
+        serializer = self.get_serializer(instance=course, data=self.request.data)
+        if not serializer.is_valid():
+            return Response(status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=False, methods=["GET"], url_path="list-assigned")
     def list_assigned(self, request: Request) -> Response:
         queryset = self.get_queryset()
@@ -79,9 +198,29 @@ class CourseViewSet(ModelViewSet):
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=["GET"], url_path="retrieve-assigned")
-    def retrieve_assigned(self, request: Request, pk: int) -> Response:
+    def retrieve_assigned(self, request: Request, pk: int) -> HttpResponseBase:
+        course = self.get_object()
+        return conditional_response(
+            request,
+            versions=("assigned", course.id, course.version, get_version(course.progress_updated)),
+            modified=(course.updated, course.progress_updated),
+            get_response=lambda: Response(
+                get_course_outline_for_user(course=course, user=self.request.user)
+            ),
+        )
+
+    @action(detail=False, methods=["GET"], url_path="progress")
+    def progress(self, request: Request) -> Response:
+        # Counts are aggregated in SQL: one query for courses and one for their sections.
+        queryset = self.get_queryset()
+        serializer = self.get_serializer(instance=queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=["GET"], url_path="progress")
+    def retrieve_progress(self, request: Request, pk: int) -> Response:
         course = self.get_object()
-        serializer = self.get_serializer(instance=course)
+        progress = CourseProgress.objects.get_for(user=self.request.user, course_id=course.id)
+        serializer = self.get_serializer(instance=progress)
         return Response(serializer.data)
 
 
@@ -89,6 +228,17 @@ class CourseSignupView(ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = SignupSerializer
 
+    def get_serializer_class(self) -> Type[Serializer]:
+        if self.action == "bulk":
+            return BulkSignupSerializer
+        return self.serializer_class
+
+    def get_permissions(self):
+        permission_classes = self.permission_classes
+        if self.action == "bulk":
+            permission_classes = [IsAuthenticated, CourseSignupBulkCreatePermission]
+        return [permission() for permission in permission_classes]
+
     def get_queryset(self) -> QuerySet:
         if self.request.user.is_staff:
             return CourseSignup.objects.all()
@@ -103,3 +253,22 @@ class CourseSignupView(ModelViewSet):
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(detail=False, methods=["POST"], url_path="bulk")
+    def bulk(self, request: Request) -> HttpResponseBase:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if "roster" in serializer.validated_data:
+            rows = read_roster(serializer.validated_data["roster"])
+        else:
+            rows = serializer.validated_data["signups"]
+
+        if request.query_params.get("stream") == "true":
+            # Results are written as they are processed, one JSON document per line.
+            return StreamingHttpResponse(
+                (json.dumps(result) + "\n" for result in bulk_signup(rows)),
+                content_type="application/x-ndjson",
+            )
+        results = list(bulk_signup(rows))
+        summary = Counter(result["status"] for result in results)
+        return Response({"summary": summary, "results": results})
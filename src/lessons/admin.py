@@ -1,6 +1,6 @@
 from django.contrib.admin import ModelAdmin, TabularInline, site
 
-from lessons.models import Answer, Exercise, Lesson, Test, TestQuestion
+from lessons.models import Answer, Exercise, Lesson, Test, TestAttempt, TestQuestion
 
 
 class BaseLessonAdmin(ModelAdmin):
@@ -16,7 +16,13 @@ class QuestionAdmin(ModelAdmin):
     inlines = [AnswerInline]
 
 
+class TestAttemptAdmin(ModelAdmin):
+    list_display = ("test", "user", "correct_count", "question_count", "created")
+    raw_id_fields = ("test", "user")
+
+
 site.register(Lesson, BaseLessonAdmin)
 site.register(Exercise, BaseLessonAdmin)
 site.register(Test, BaseLessonAdmin)
 site.register(TestQuestion, QuestionAdmin)
+site.register(TestAttempt, TestAttemptAdmin)
@@ -0,0 +1,121 @@
+"""
+Writes questions and answers of a test with a constant number of queries, regardless of how many
+of them there are. Incoming items are matched with existing rows by id and compared in memory, so
+only changed rows are updated.
+"""
+from typing import Dict, List, Optional, Set
+
+from django.db import transaction
+
+from common.exceptions import ProcessingException
+from lessons.models import Answer, BaseLesson, Test, TestQuestion
+from lessons.signals import bulk_test_write
+
+
+@transaction.atomic()
+def write_test_questions(test: Test, questions: List[Dict]):
+    """
+    Replaces questions of the test with the given ones. Questions and answers with an id are
+    updated, the ones without are created and the ones missing are deleted. A question without
+    the answers key keeps its answers.
+    """
+    existing_questions = {question.id: question for question in test.questions.all()}
+    existing_answers = {
+        answer.id: answer for answer in Answer.objects.filter(question__test_id=test.id)
+    }
+    _check_ids(questions, existing_questions, "Questions")
+    _check_ids(
+        [answer for question in questions for answer in question.get("answers") or []],
+        existing_answers,
+        "Answers",
+    )
+
+    question_instances = []
+    questions_to_create: List[TestQuestion] = []
+    questions_to_update: List[TestQuestion] = []
+    for data in questions:
+        question = _get_or_build(data, existing_questions, TestQuestion(test_id=test.id))
+        if _assign(question, data, {"text": None}, required=("text",)):
+            (questions_to_update if question.id else questions_to_create).append(question)
+        question_instances.append(question)
+
+    token = bulk_test_write.set(True)
+    try:
+        TestQuestion.objects.bulk_create(questions_to_create)
+        TestQuestion.objects.bulk_update(questions_to_update, ["text"])
+
+        kept_answer_ids: Set[int] = set()
+        answers_to_create = []
+        answers_to_update = []
+        for question, data in zip(question_instances, questions):
+            if data.get("answers") is None:
+                kept_answer_ids.update(
+                    answer.id
+                    for answer in existing_answers.values()
+                    if answer.question_id == question.id
+                )
+                continue
+            for answer_data in data["answers"]:
+                answer = _get_or_build(answer_data, existing_answers, Answer())
+                changed = _assign(
+                    answer,
+                    {**answer_data, "question_id": question.id},
+                    {"question_id": None, "text": None, "is_correct": False},
+                    required=("text",),
+                )
+                if answer.id:
+                    kept_answer_ids.add(answer.id)
+                    if changed:
+                        answers_to_update.append(answer)
+                else:
+                    answers_to_create.append(answer)
+        Answer.objects.bulk_create(answers_to_create)
+        Answer.objects.bulk_update(answers_to_update, ["question_id", "text", "is_correct"])
+
+        answer_ids_to_delete = existing_answers.keys() - kept_answer_ids
+        if answer_ids_to_delete:
+            Answer.objects.filter(id__in=answer_ids_to_delete).delete()
+        question_ids_to_delete = existing_questions.keys() - {
+            question.id for question in question_instances
+        }
+        if question_ids_to_delete:
+            TestQuestion.objects.filter(id__in=question_ids_to_delete).delete()
+    finally:
+        bulk_test_write.reset(token)
+    # Stands for the per row signals skipped above, see test_changed_callback.
+    BaseLesson.objects.filter(id=test.id).touch()
+
+
+def _check_ids(items: List[Dict], existing: Dict, name: str):
+    ids = [item["id"] for item in items if item.get("id") is not None]
+    unknown = sorted(set(ids) - existing.keys())
+    if unknown:
+        raise ProcessingException(detail=f"{name} {unknown} do not belong to the test.")
+    if len(ids) != len(set(ids)):
+        raise ProcessingException(detail=f"{name} can't be repeated.")
+
+
+def _get_or_build(data: Dict, existing: Dict, new):
+    item_id: Optional[int] = data.get("id")
+    return existing[item_id] if item_id is not None else new
+
+
+def _assign(instance, data: Dict, defaults: Dict, required: tuple) -> bool:
+    """
+    Sets values from data, or defaults on new instances, returning whether anything changed.
+    Values missing from a partial update are kept.
+    """
+    changed = instance.id is None
+    for field, default in defaults.items():
+        if field in data:
+            value = data[field]
+        elif instance.id is None:
+            if field in required:
+                raise ProcessingException(detail=f"Field {field} is required for new items.")
+            value = default
+        else:
+            continue
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
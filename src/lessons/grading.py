@@ -0,0 +1,95 @@
+from typing import Dict, FrozenSet, Iterable, NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+
+from auth_ex.models import User
+from common.cache import cached_value
+from common.exceptions import ProcessingException
+from lessons.models import Test, TestAttempt, TestQuestion
+
+ANSWER_KEY_CACHE_NAMESPACE = "lessons:answer-keys"
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+# Keys are versioned, so the in-process copy can't become stale.
+ANSWER_KEY_LOCAL_CACHE_TIMEOUT = 60
+
+
+class AnswerKey(NamedTuple):
+    # Question id -> ids of its correct answers.
+    correct: Dict[int, FrozenSet[int]]
+    # Answer id -> id of its question.
+    questions: Dict[int, int]
+
+
+def get_answer_key(test: Test) -> AnswerKey:
+    """
+    Answer key of the test, cached under the test version, which changes with any question or
+    answer.
+    """
+    return cached_value(
+        ANSWER_KEY_CACHE_NAMESPACE,
+        test.id,
+        lambda: _build_answer_key(test.id),
+        timeout=ANSWER_KEY_CACHE_TIMEOUT,
+        version=test.version,
+        local_timeout=ANSWER_KEY_LOCAL_CACHE_TIMEOUT,
+    )
+
+
+def grade(answer_key: AnswerKey, answer_ids: Iterable[int]) -> int:
+    """
+    Returns the number of correctly answered questions. A question is answered correctly when
+    exactly its correct answers are selected.
+    """
+    selected: Dict[int, set] = {}
+    for answer_id in answer_ids:
+        selected.setdefault(answer_key.questions[answer_id], set()).add(answer_id)
+    return sum(
+        selected.get(question_id, set()) == correct
+        for question_id, correct in answer_key.correct.items()
+    )
+
+
+@transaction.atomic()
+def submit_test(test: Test, user: User, answer_ids: Iterable[int]) -> TestAttempt:
+    answer_ids = sorted(set(answer_ids))
+    answer_key = get_answer_key(test)
+    if not answer_key.correct:
+        raise ProcessingException(detail="Test has no questions.")
+    unknown = [answer_id for answer_id in answer_ids if answer_id not in answer_key.questions]
+    if unknown:
+        raise ProcessingException(detail=f"Answers {unknown} do not belong to the test.")
+
+    attempt = TestAttempt.objects.create(
+        test=test,
+        user=user,
+        answers=answer_ids,
+        correct_count=grade(answer_key, answer_ids),
+        question_count=len(answer_key.correct),
+    )
+    if attempt.score >= settings.TEST_PASS_THRESHOLD:
+        try:
+            test.complete(user=user)
+        except ProcessingException:
+            # Already completed, e.g. by an earlier attempt.
+            pass
+    return attempt
+
+
+def _build_answer_key(test_id: int) -> AnswerKey:
+    correct: Dict[int, set] = {}
+    questions: Dict[int, int] = {}
+    rows = TestQuestion.objects.filter(test_id=test_id).values_list(
+        "id", "answers__id", "answers__is_correct"
+    )
+    for question_id, answer_id, is_correct in rows:
+        question_correct = correct.setdefault(question_id, set())
+        if answer_id is None:
+            continue
+        questions[answer_id] = question_id
+        if is_correct:
+            question_correct.add(answer_id)
+    return AnswerKey(
+        correct={question_id: frozenset(ids) for question_id, ids in correct.items()},
+        questions=questions,
+    )
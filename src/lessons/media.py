@@ -0,0 +1,21 @@
+import re
+
+from auth_ex.models import User
+from courses.enrollments import get_enrolled_course_ids
+from lessons.models import Lesson
+
+# See get_lesson_video_upload_directory and get_lesson_additional_materials_upload_directory.
+LESSON_FILE_RE = re.compile(r"^(?:videos|additional_materials)/lessons/(\d+)/")
+# Covers are shown in course listings to everyone, see get_course_upload_directory.
+PUBLIC_PREFIXES = ("images/courses/",)
+
+
+def can_access_media(user: User, path: str) -> bool:
+    if user.is_staff or user.is_superuser or path.startswith(PUBLIC_PREFIXES):
+        return True
+    match = LESSON_FILE_RE.match(path)
+    if match is None:
+        return False
+    return Lesson.objects.filter(
+        id=int(match.group(1)), course_section__course_id__in=get_enrolled_course_ids(user.id)
+    ).exists()
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0003_answer_testquestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baselesson',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
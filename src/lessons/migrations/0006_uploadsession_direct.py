@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='direct',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0006_uploadsession_direct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='video_bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='video_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='video_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-17 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lessons', '0007_lesson_video_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answers', models.JSONField(default=list)),
+                ('correct_count', models.PositiveIntegerField()),
+                ('question_count', models.PositiveIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='lessons.test')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['user', 'test'], name='lessons_tes_user_id_816ae7_idx'),
+        ),
+    ]
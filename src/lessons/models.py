@@ -1,26 +1,41 @@
-from django.db import IntegrityError
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
 from django.db.models import (
     CASCADE,
+    BigIntegerField,
     BooleanField,
     Case,
     CharField,
     DateTimeField,
     Exists,
     FileField,
+    FloatField,
     ForeignKey,
+    Index,
+    JSONField,
     Model,
     OuterRef,
+    PositiveIntegerField,
+    Subquery,
+    TextChoices,
     TextField,
+    UUIDField,
     Value,
     When,
 )
+from django.db.models.signals import post_delete, post_save, pre_delete
 from polymorphic.managers import PolymorphicManager
 from polymorphic.models import PolymorphicModel
 from polymorphic.query import PolymorphicQuerySet
 
+import lessons.signals
 from auth_ex.models import User
+from common.conditional import get_version
 from common.exceptions import ProcessingException
-from courses.models import CourseSection
+from common.querysets import TouchQuerySetMixin
+from courses.models import CourseProgress, CourseSection
 
 
 def get_lesson_video_upload_directory(lesson: "Lesson", filename: str) -> str:
@@ -31,7 +46,19 @@ def get_lesson_additional_materials_upload_directory(lesson: "Lesson", filename:
     return f"additional_materials/lessons/{lesson.id}/{filename}"
 
 
-class BaseLessonQuerySet(PolymorphicQuerySet):
+def get_lesson_type(content_type_id: int) -> str:
+    """
+    Name of the lesson subclass stored in polymorphic_ctype, so listings can load lessons with
+    non_polymorphic() instead of a query per subclass. Content types are cached by Django.
+    """
+    return ContentType.objects.get_for_id(content_type_id).model_class().__name__
+
+
+class BaseLessonQuerySet(TouchQuerySetMixin, PolymorphicQuerySet):
+    def for_listing(self):
+        # Listings only need base fields, upcasting is left to detail views.
+        return self.non_polymorphic()
+
     def with_completed_annotations(self, user: User):
         completed_lesson = CompletedLesson.objects.filter(user=user, lesson=OuterRef("pk"))
         return self.annotate(
@@ -42,17 +69,38 @@ class BaseLessonQuerySet(PolymorphicQuerySet):
             )
         )
 
+    def with_progress_updated(self, user: User):
+        # Version of the user's completions in the lesson's course, see CourseProgress.updated.
+        progress = CourseProgress.objects.filter(
+            user=user, course=OuterRef("course_section__course")
+        )
+        return self.annotate(progress_updated=Subquery(progress.values("updated")[:1]))
+
 
 class BaseLesson(PolymorphicModel):
     name = CharField(max_length=64)
     course_section = ForeignKey(CourseSection, on_delete=CASCADE, related_name="lessons")
     description = TextField(blank=True)
+    updated = DateTimeField(auto_now=True)
 
     objects = PolymorphicManager.from_queryset(BaseLessonQuerySet)()
 
     class Meta:
         order_with_respect_to = "course_section"
 
+    # Section as loaded from the database, to tell whether the lesson was moved on save.
+    loaded_course_section_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_course_section_id = instance.__dict__.get("course_section_id")
+        return instance
+
+    @property
+    def version(self) -> int:
+        return get_version(self.updated)
+
     def is_completed_by(self, user: User) -> bool:
         # is_completed is annotated in with_completed_annotations queryset method.
         # However, if the queryset was not annotated, there's a fallback that performs this check.
@@ -61,14 +109,26 @@ class BaseLesson(PolymorphicModel):
             return completed
         return CompletedLesson.objects.filter(lesson=self, user=user).exists()
 
+    @transaction.atomic()
     def complete(self, user: User):
         try:
-            CompletedLesson.objects.create(lesson=self, user=user)
+            with transaction.atomic():
+                completed_lesson = CompletedLesson.objects.create(lesson=self, user=user)
         except IntegrityError as e:
             raise ProcessingException(detail="Already marked as complete.") from e
+        CourseProgress.objects.record_completion(
+            user=user,
+            course_id=self.course_section.course_id,
+            completed_at=completed_lesson.created,
+        )
 
+    @transaction.atomic()
     def revert_complete(self, user: User):
-        CompletedLesson.objects.filter(lesson=self, user=user).delete()
+        deleted, _ = CompletedLesson.objects.filter(lesson=self, user=user).delete()
+        if deleted:
+            CourseProgress.objects.revert_completion(
+                user=user, course_id=self.course_section.course_id
+            )
 
 
 class Lesson(BaseLesson):
@@ -76,6 +136,25 @@ class Lesson(BaseLesson):
     additional_materials = FileField(
         upload_to=get_lesson_additional_materials_upload_directory, null=True, blank=True
     )
+    # Filled in by lessons.tasks.process_lesson_video after the video changes.
+    video_duration = FloatField(null=True, blank=True)
+    video_bitrate = PositiveIntegerField(null=True, blank=True)
+    video_size = BigIntegerField(null=True, blank=True)
+
+    # Video as loaded from the database, to tell whether it changed on save.
+    loaded_video = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_video = instance.__dict__.get("video")
+        return instance
+
+    @property
+    def video_changed(self) -> bool:
+        if "video" not in self.__dict__:
+            return False
+        return (self.video.name or None) != (self.loaded_video or None)
 
 
 class Exercise(BaseLesson):
@@ -104,3 +183,77 @@ class CompletedLesson(Model):
 
     class Meta:
         unique_together = ("lesson", "user")
+
+
+class TestAttempt(Model):
+    """
+    Submission of a test graded by lessons.grading. Selected answers are kept as a list of ids.
+    """
+
+    test = ForeignKey(Test, on_delete=CASCADE, related_name="attempts")
+    user = ForeignKey(User, on_delete=CASCADE, related_name="test_attempts")
+    answers = JSONField(default=list)
+    correct_count = PositiveIntegerField()
+    question_count = PositiveIntegerField()
+    created = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [Index(fields=["user", "test"])]
+
+    @property
+    def score(self) -> float:
+        return self.correct_count / self.question_count if self.question_count else 0.0
+
+    def __str__(self):
+        return f"{self.user} - {self.test}: {self.correct_count}/{self.question_count}"
+
+
+class UploadSession(Model):
+    """
+    Upload of a lesson file sent in numbered parts, see lessons.uploads. The file is attached to the
+    lesson once the session is completed.
+    """
+
+    class Field(TextChoices):
+        VIDEO = "video"
+        ADDITIONAL_MATERIALS = "additional_materials"
+
+    id = UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lesson = ForeignKey(Lesson, on_delete=CASCADE, related_name="upload_sessions")
+    user = ForeignKey(User, on_delete=CASCADE, related_name="upload_sessions")
+    field = CharField(max_length=32, choices=Field.choices)
+    filename = CharField(max_length=255)
+    # Name of the target file in the storage, reserved when the session starts.
+    name = CharField(max_length=255)
+    # Identifier of the upload in the storage, e.g. S3 multipart upload id.
+    upload_id = CharField(max_length=255, blank=True)
+    # Direct uploads are sent by the client straight to the storage and confirmed afterwards.
+    direct = BooleanField(default=False)
+    size = BigIntegerField(null=True, blank=True)
+    content_type = CharField(max_length=255, blank=True)
+    created = DateTimeField(auto_now_add=True)
+    completed = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.id}) - {self.lesson}"
+
+
+class UploadPart(Model):
+    session = ForeignKey(UploadSession, on_delete=CASCADE, related_name="parts")
+    number = PositiveIntegerField()
+    size = BigIntegerField()
+    etag = CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = ("session", "number")
+        ordering = ("number",)
+
+
+for lesson_model in (Lesson, Exercise, Test):
+    post_save.connect(lessons.signals.lesson_saved_callback, sender=lesson_model)
+post_save.connect(lessons.signals.video_changed_callback, sender=Lesson)
+# Parent rows are collected for every deleted subclass instance, so this fires once per lesson.
+pre_delete.connect(lessons.signals.lesson_deleted_callback, sender=BaseLesson)
+for test_model in (TestQuestion, Answer):
+    post_save.connect(lessons.signals.test_changed_callback, sender=test_model)
+    post_delete.connect(lessons.signals.test_changed_callback, sender=test_model)
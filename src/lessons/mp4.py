@@ -0,0 +1,167 @@
+"""
+Minimal reader and rewriter of the ISO base media file format (MP4, QuickTime) boxes. Only the
+parts needed to move the movie header (moov) before media data and to read the duration are
+supported.
+"""
+import struct
+from typing import IO, List, NamedTuple, Optional, Tuple
+
+# Boxes containing only other boxes on the path to chunk offset tables.
+CONTAINER_TYPES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class Mp4Error(Exception):
+    pass
+
+
+class Box(NamedTuple):
+    type: bytes
+    offset: int
+    size: int
+    header_size: int
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+class VideoInfo(NamedTuple):
+    duration: Optional[float]
+    size: int
+    # Whether moov was moved to the front and the destination holds the rewritten file.
+    rewritten: bool
+
+    @property
+    def bitrate(self) -> Optional[int]:
+        if not self.duration:
+            return None
+        return int(self.size * 8 / self.duration)
+
+
+def read_boxes(file: IO[bytes], file_size: int) -> List[Box]:
+    boxes = []
+    offset = 0
+    while offset < file_size:
+        file.seek(offset)
+        box = _parse_header(file.read(16), offset, file_size)
+        boxes.append(box)
+        offset = box.end
+    return boxes
+
+
+def process_video(source: IO[bytes], destination: IO[bytes], file_size: int) -> VideoInfo:
+    """
+    Reads the duration and, when moov follows media data, writes a copy of the file with moov at
+    the front into destination. Media data is copied in chunks, only moov is kept in memory.
+    """
+    boxes = read_boxes(source, file_size)
+    moov = next((box for box in boxes if box.type == b"moov"), None)
+    if moov is None:
+        raise Mp4Error("File has no moov box.")
+    source.seek(moov.offset)
+    moov_data = bytearray(source.read(moov.size))
+    duration = _get_duration(moov_data)
+
+    first_mdat = next((box for box in boxes if box.type == b"mdat"), None)
+    if first_mdat is None or moov.offset < first_mdat.offset:
+        return VideoInfo(duration=duration, size=file_size, rewritten=False)
+
+    # Boxes between the first mdat and moov move down by the size of moov.
+    _shift_chunk_offsets(
+        moov_data, 0, len(moov_data), moved=(first_mdat.offset, moov.offset), shift=moov.size
+    )
+    for box in boxes:
+        if box.offset == first_mdat.offset:
+            destination.write(moov_data)
+        if box is not moov:
+            _copy_range(source, destination, box.offset, box.size)
+    return VideoInfo(duration=duration, size=file_size, rewritten=True)
+
+
+def _parse_header(data: bytes, offset: int, limit: int) -> Box:
+    if len(data) < 8:
+        raise Mp4Error(f"Truncated box header at {offset}.")
+    size, box_type = struct.unpack(">I4s", data[:8])
+    header_size = 8
+    if size == 1:
+        if len(data) < 16:
+            raise Mp4Error(f"Truncated box header at {offset}.")
+        (size,) = struct.unpack(">Q", data[8:16])
+        header_size = 16
+    elif size == 0:
+        # Box extends to the end of the file.
+        size = limit - offset
+    if size < header_size or offset + size > limit:
+        raise Mp4Error(f"Invalid size of {box_type!r} box at {offset}.")
+    return Box(type=box_type, offset=offset, size=size, header_size=header_size)
+
+
+def _iter_children(data: bytearray, start: int, end: int):
+    offset = start
+    while offset < end:
+        box = _parse_header(bytes(data[offset : offset + 16]), offset, end)
+        yield box
+        offset = box.end
+
+
+def _get_duration(moov: bytearray) -> Optional[float]:
+    moov_box = _parse_header(bytes(moov[:16]), 0, len(moov))
+    for box in _iter_children(moov, moov_box.header_size, len(moov)):
+        if box.type != b"mvhd":
+            continue
+        payload = box.offset + box.header_size
+        version = moov[payload]
+        if version == 1:
+            timescale, duration = struct.unpack(">IQ", moov[payload + 20 : payload + 32])
+        else:
+            timescale, duration = struct.unpack(">II", moov[payload + 12 : payload + 20])
+        return duration / timescale if timescale else None
+    return None
+
+
+def _shift_chunk_offsets(data: bytearray, start: int, end: int, moved: Tuple[int, int], shift: int):
+    """
+    Adds shift to chunk offsets pointing into the moved range of the original file.
+    """
+    for box in _iter_children(data, start, end):
+        payload = box.offset + box.header_size
+        if box.type in CONTAINER_TYPES:
+            _shift_chunk_offsets(data, payload, box.end, moved, shift)
+        elif box.type == b"stco":
+            _shift_table(data, payload, ">I", 0xFFFFFFFF, moved, shift)
+        elif box.type == b"co64":
+            _shift_table(data, payload, ">Q", 0xFFFFFFFFFFFFFFFF, moved, shift)
+
+
+def _shift_table(
+    data: bytearray,
+    payload: int,
+    entry_format: str,
+    maximum: int,
+    moved: Tuple[int, int],
+    shift: int,
+):
+    # Payload starts with version, flags and number of entries.
+    (count,) = struct.unpack(">I", data[payload + 4 : payload + 8])
+    entry_size = struct.calcsize(entry_format)
+    for index in range(count):
+        position = payload + 8 + index * entry_size
+        (chunk_offset,) = struct.unpack(entry_format, data[position : position + entry_size])
+        if moved[0] <= chunk_offset < moved[1]:
+            chunk_offset += shift
+            if chunk_offset > maximum:
+                # Would require converting stco to co64, which changes the size of moov.
+                raise Mp4Error("Chunk offset does not fit after moving moov.")
+            struct.pack_into(entry_format, data, position, chunk_offset)
+
+
+def _copy_range(source: IO[bytes], destination: IO[bytes], offset: int, size: int):
+    source.seek(offset)
+    remaining = size
+    while remaining > 0:
+        data = source.read(min(COPY_BUFFER_SIZE, remaining))
+        if not data:
+            raise Mp4Error("File is shorter than its boxes.")
+        destination.write(data)
+        remaining -= len(data)
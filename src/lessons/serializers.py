@@ -1,12 +1,31 @@
-from collections import defaultdict
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
-from drf_writable_nested import WritableNestedModelSerializer
-from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer
+from django.db import transaction
+from django.db.models import Manager
+from rest_framework.fields import IntegerField, ListField, SerializerMethodField
+from rest_framework.serializers import ListSerializer, ModelSerializer
 from rest_polymorphic.serializers import PolymorphicSerializer
 
-from lessons.models import Answer, BaseLesson, Exercise, Lesson, Test, TestQuestion
+from common.cache import cached_value
+from common.exceptions import ProcessingApiException, ProcessingException
+from lessons.bulk import write_test_questions
+from lessons.grading import submit_test
+from lessons.models import (
+    Answer,
+    BaseLesson,
+    Exercise,
+    Lesson,
+    Test,
+    TestAttempt,
+    TestQuestion,
+    UploadPart,
+    UploadSession,
+    get_lesson_type,
+)
+from lessons.uploads import start_direct_upload, start_upload
+
+TEST_QUESTIONS_CACHE_NAMESPACE = "lessons:test-questions"
+TEST_QUESTIONS_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 class LessonSerializer(ModelSerializer):
@@ -17,11 +36,14 @@ class LessonSerializer(ModelSerializer):
             "name",
             "description",
             "video",
+            "video_duration",
+            "video_bitrate",
+            "video_size",
             "additional_materials",
             "course_section",
             "is_complete",
         )
-        read_only_fields = ("is_complete",)
+        read_only_fields = ("is_complete", "video_duration", "video_bitrate", "video_size")
 
     is_complete = SerializerMethodField()
 
@@ -45,7 +67,7 @@ class ExerciseSerializer(ModelSerializer):
         return lesson.is_completed_by(user=self.context["user"])
 
 
-class AnswersSerializer(WritableNestedModelSerializer):
+class AnswersSerializer(ModelSerializer):
     class Meta:
         model = Answer
         fields = (
@@ -54,8 +76,34 @@ class AnswersSerializer(WritableNestedModelSerializer):
             "is_correct",
         )
 
+    # Sent back to update existing answers, see lessons.bulk.
+    id = IntegerField(required=False)
+
+
+class QuestionsListSerializer(ListSerializer):
+    """
+    Renders questions of a test with all answers in two queries. The result is cached under the
+    test version, which changes with any question or answer, see test_changed_callback.
+    """
+
+    def to_representation(self, data):
+        if not isinstance(data, Manager):
+            return super().to_representation(data)
+        test = data.instance
+        questions = data.prefetch_related("answers")
+        # Representations returned after writes are built from the written data, not cached.
+        if hasattr(self.root, "initial_data"):
+            return super().to_representation(questions)
+        return cached_value(
+            TEST_QUESTIONS_CACHE_NAMESPACE,
+            test.id,
+            lambda: super(QuestionsListSerializer, self).to_representation(questions),
+            timeout=TEST_QUESTIONS_CACHE_TIMEOUT,
+            version=test.version,
+        )
+
 
-class QuestionsSerializer(WritableNestedModelSerializer):
+class QuestionsSerializer(ModelSerializer):
     class Meta:
         model = TestQuestion
         fields = (
@@ -63,13 +111,16 @@ class QuestionsSerializer(WritableNestedModelSerializer):
             "text",
             "answers",
         )
+        list_serializer_class = QuestionsListSerializer
 
+    # Sent back to update existing questions, see lessons.bulk.
+    id = IntegerField(required=False)
     answers = AnswersSerializer(
         many=True,
     )
 
 
-class TestSerializer(WritableNestedModelSerializer):
+class TestSerializer(ModelSerializer):
     class Meta:
         model = Test
         fields = (
@@ -83,11 +134,40 @@ class TestSerializer(WritableNestedModelSerializer):
     questions = QuestionsSerializer(many=True)
     is_complete = SerializerMethodField()
 
-    _save_kwargs: Dict = defaultdict(dict)
-
     def get_is_complete(self, lesson: BaseLesson) -> bool:
         return lesson.is_completed_by(user=self.context["user"])
 
+    @transaction.atomic()
+    def create(self, validated_data: Dict) -> Test:
+        questions = validated_data.pop("questions", [])
+        test = super().create(validated_data)
+        self._write_questions(test, questions)
+        return test
+
+    @transaction.atomic()
+    def update(self, test: Test, validated_data: Dict) -> Test:
+        # Questions are left untouched when not sent, e.g. in a partial update.
+        questions = validated_data.pop("questions", None)
+        test = super().update(test, validated_data)
+        if questions is not None:
+            self._write_questions(test, questions)
+        return test
+
+    def _write_questions(self, test: Test, questions: List[Dict]):
+        try:
+            write_test_questions(test, questions)
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+
+    def to_representation(self, test: Test) -> Dict:
+        representation = super().to_representation(test)
+        # Tests are graded on the server, correct answers are shown only to their editors.
+        if not self.context["user"].has_perm("lessons.change_baselesson"):
+            for question in representation["questions"]:
+                for answer in question["answers"]:
+                    answer.pop("is_correct", None)
+        return representation
+
 
 class BaseLessonSerializer(PolymorphicSerializer):
     resource_type_field_name = "lesson_type"
@@ -105,11 +185,104 @@ class ListLessonsSerializer(ModelSerializer):
         fields = (
             "id",
             "name",
+            "lesson_type",
             "is_complete",
         )
         read_only_fields = ("is_complete",)
 
+    lesson_type = SerializerMethodField()
     is_complete = SerializerMethodField()
 
+    def get_lesson_type(self, lesson: BaseLesson) -> str:
+        return get_lesson_type(lesson.polymorphic_ctype_id)
+
     def get_is_complete(self, lesson: BaseLesson) -> bool:
         return lesson.is_completed_by(user=self.context["user"])
+
+
+class UploadPartSerializer(ModelSerializer):
+    class Meta:
+        model = UploadPart
+        fields = ("number", "size")
+
+
+class UploadSessionSerializer(ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields: Tuple[str, ...] = ("id", "lesson", "field", "filename", "parts", "completed")
+        read_only_fields = ("completed",)
+
+    parts = UploadPartSerializer(many=True, read_only=True)
+
+    def create(self, validated_data: Dict) -> UploadSession:
+        try:
+            return start_upload(
+                lesson=validated_data["lesson"],
+                user=self.context["user"],
+                field=validated_data["field"],
+                filename=validated_data["filename"],
+            )
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+
+
+class DirectUploadSessionSerializer(UploadSessionSerializer):
+    class Meta(UploadSessionSerializer.Meta):
+        fields = ("id", "lesson", "field", "filename", "size", "content_type", "completed")
+        extra_kwargs = {
+            "size": {"required": True, "allow_null": False},
+            "content_type": {"required": True, "allow_blank": False},
+        }
+
+    # Description of the request uploading the file, set once the session is created.
+    upload: Optional[Dict] = None
+
+    def create(self, validated_data: Dict) -> UploadSession:
+        try:
+            session, self.upload = start_direct_upload(
+                lesson=validated_data["lesson"],
+                user=self.context["user"],
+                field=validated_data["field"],
+                filename=validated_data["filename"],
+                size=validated_data["size"],
+                content_type=validated_data["content_type"],
+            )
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return session
+
+
+class TestAttemptSerializer(ModelSerializer):
+    class Meta:
+        model = TestAttempt
+        fields = (
+            "id",
+            "test",
+            "answers",
+            "correct_count",
+            "question_count",
+            "score",
+            "is_complete",
+            "created",
+        )
+        read_only_fields = ("test", "correct_count", "question_count", "created")
+
+    answers = ListField(child=IntegerField())
+    score = SerializerMethodField()
+    is_complete = SerializerMethodField()
+
+    def get_score(self, attempt: TestAttempt) -> float:
+        return round(attempt.score, 4)
+
+    def get_is_complete(self, attempt: TestAttempt) -> bool:
+        return attempt.test.is_completed_by(user=self.context["user"])
+
+    def create(self, validated_data: Dict) -> TestAttempt:
+        try:
+            return submit_test(
+                test=validated_data["test"],
+                user=self.context["user"],
+                answer_ids=validated_data["answers"],
+            )
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
@@ -0,0 +1,102 @@
+from contextvars import ContextVar
+from functools import partial
+from typing import TYPE_CHECKING, Union
+
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.db.models.functions import Greatest
+
+from courses.models import Course, CourseProgress, CourseSection
+
+if TYPE_CHECKING:
+    from lessons.models import Answer, BaseLesson, Lesson, TestQuestion
+
+# Set by lessons.bulk, which touches the test once instead of once per question and answer.
+bulk_test_write = ContextVar("bulk_test_write", default=False)
+
+
+def lesson_saved_callback(sender: type, instance: "BaseLesson", created: bool, **kwargs):
+    if kwargs.get("raw"):
+        return
+    # A lesson moved to another section changes the structure of both courses.
+    previous_section_id = instance.loaded_course_section_id
+    section_ids = {instance.course_section_id, previous_section_id} - {None}
+    CourseSection.objects.filter(id__in=section_ids).touch()
+    Course.objects.filter(course_sections__in=section_ids).touch()
+    instance.loaded_course_section_id = instance.course_section_id
+    if created:
+        CourseProgress.objects.change_total(
+            course_id=instance.course_section.course_id, difference=1
+        )
+    elif previous_section_id not in (None, instance.course_section_id):
+        course_ids = dict(
+            CourseSection.objects.filter(id__in=section_ids).values_list("id", "course_id")
+        )
+        if course_ids[previous_section_id] != course_ids[instance.course_section_id]:
+            _move_progress(
+                instance,
+                from_course_id=course_ids[previous_section_id],
+                to_course_id=course_ids[instance.course_section_id],
+            )
+
+
+def _move_progress(instance: "BaseLesson", from_course_id: int, to_course_id: int):
+    # Completions of the lesson move along with it.
+    from lessons.models import CompletedLesson
+
+    completed_by = CompletedLesson.objects.filter(lesson=instance).values("user")
+    CourseProgress.objects.change_total(course_id=from_course_id, difference=-1)
+    CourseProgress.objects.filter(course_id=from_course_id, user__in=completed_by).update(
+        completed_count=Greatest(F("completed_count") - 1, 0)
+    )
+    CourseProgress.objects.change_total(course_id=to_course_id, difference=1)
+    CourseProgress.objects.filter(course_id=to_course_id, user__in=completed_by).update(
+        completed_count=F("completed_count") + 1
+    )
+
+
+def lesson_deleted_callback(sender: type, instance: "BaseLesson", **kwargs):
+    from lessons.models import CompletedLesson
+
+    # The course is looked up within the queries, going through instance.course_section would
+    # cost a query per lesson in bulk and cascade deletes.
+    course_id = Subquery(
+        CourseSection.objects.filter(id=instance.course_section_id).values("course_id")
+    )
+    CourseSection.objects.filter(id=instance.course_section_id).touch()
+    Course.objects.filter(id=course_id).touch()
+    CourseProgress.objects.change_total(course_id=course_id, difference=-1)
+    CourseProgress.objects.filter(
+        course_id=course_id,
+        user__in=CompletedLesson.objects.filter(lesson=instance).values("user"),
+    ).update(completed_count=Greatest(F("completed_count") - 1, 0))
+
+
+def test_changed_callback(sender: type, instance: Union["TestQuestion", "Answer"], **kwargs):
+    # Questions and answers are part of the test's representation.
+    if kwargs.get("raw") or bulk_test_write.get():
+        return
+    from lessons.models import Answer, BaseLesson, Lesson, TestQuestion
+
+    if isinstance(instance, Answer):
+        test_ids = TestQuestion.objects.filter(id=instance.question_id).values("test_id")
+        BaseLesson.objects.filter(id__in=test_ids).touch()
+    else:
+        BaseLesson.objects.filter(id=instance.test_id).touch()
+
+
+def video_changed_callback(sender: type, instance: "Lesson", **kwargs):
+    if kwargs.get("raw"):
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "video" not in update_fields:
+        return
+    if not instance.video_changed:
+        return
+    from lessons.tasks import process_lesson_video
+
+    instance.loaded_video = instance.video.name
+    if instance.video:
+        transaction.on_commit(
+            partial(process_lesson_video.apply_async, args=[instance.id, instance.video.name])
+        )
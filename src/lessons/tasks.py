@@ -0,0 +1,50 @@
+import logging
+import os
+import tempfile
+
+from celery import shared_task
+from django.core.files import File
+from django.utils import timezone
+
+from lessons.mp4 import Mp4Error, VideoInfo, process_video
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_lesson_video(lesson_id: int, video_name: str):
+    """
+    Moves moov of the lesson video to the front, so playback can start before the whole file is
+    downloaded, and stores duration, bitrate and size of the video on the lesson.
+    """
+    from lessons.models import Lesson
+
+    storage = Lesson._meta.get_field("video").storage
+    if not storage.exists(video_name):
+        return
+    size = storage.size(video_name)
+    with storage.open(video_name, "rb") as source, tempfile.TemporaryFile() as destination:
+        try:
+            info = process_video(source, destination, size)
+        except Mp4Error as e:
+            logger.warning("Could not process video %s: %s", video_name, e)
+            info = VideoInfo(duration=None, size=size, rewritten=False)
+        new_name = video_name
+        if info.rewritten:
+            destination.seek(0)
+            new_name = storage.save(
+                video_name, File(destination, name=os.path.basename(video_name))
+            )
+
+    # Video could have been replaced while it was processed, the result is discarded then.
+    updated = Lesson.objects.filter(id=lesson_id, video=video_name).update(
+        video=new_name,
+        video_duration=info.duration,
+        video_bitrate=info.bitrate,
+        video_size=info.size,
+        updated=timezone.now(),
+    )
+    if updated and new_name != video_name:
+        storage.delete(video_name)
+    elif not updated and new_name != video_name:
+        storage.delete(new_name)
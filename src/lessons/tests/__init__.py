@@ -1,11 +1,15 @@
 from unittest import TestCase
 
+from django.core.cache import cache
+
 from courses.models import Course, CourseSection
 from lessons.models import Exercise, Lesson, Test
 
 
 class BaseLessonTestCase(TestCase):
     def setUp(self):
+        # Cached signups must not leak from other tests.
+        cache.clear()
         self.course = Course.objects.create(name="test")
         self.course_section = CourseSection.objects.create(course=self.course, name="test section")
         self.lesson = Lesson.objects.create(course_section=self.course_section)
@@ -1,10 +1,31 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
+from common.media import get_signed_url_window
+from courses.enrollments import get_enrolled_course_ids
 from courses.models import CourseSignup
-from lessons.models import Answer, Lesson, Test, TestQuestion
+from lessons.models import (
+    Answer,
+    BaseLesson,
+    Exercise,
+    Lesson,
+    Test,
+    TestAttempt,
+    TestQuestion,
+    UploadSession,
+)
 from lessons.tests import BaseLessonTestCase
 
 
@@ -48,6 +69,15 @@ class LessonAPITestCase(APITestCase, BaseLessonTestCase):
 
         self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
 
+    def test_mark_test_as_complete(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-mark_as_complete", args=(self.test.id,))
+
+        response = self.client.patch(url)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(self.test.is_completed_by(self.user))
+
     def test_nested_test_lesson_serializer(self):
         self.user.is_superuser = True
         self.user.save()
@@ -83,9 +113,625 @@ class LessonAPITestCase(APITestCase, BaseLessonTestCase):
             Answer.objects.filter(question__test__course_section=self.course_section).count(), 2
         )
 
+    def test_retrieve_not_modified(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-detail", args=(self.lesson.id,))
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.complete(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["isComplete"])
+
+    def test_retrieve_modified_when_signed_urls_change(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-detail", args=(self.lesson.id,))
+        with mock.patch("lessons.views.get_signed_url_window", return_value=1):
+            etag = self.client.get(url)["ETag"]
+
+        with mock.patch("lessons.views.get_signed_url_window", return_value=2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_modified_since_when_signed_urls_change(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-detail", args=(self.lesson.id,))
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        window = get_signed_url_window() + 1
+        with mock.patch("lessons.views.get_signed_url_window", return_value=window):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_test_modified_by_answer_change(self):
+        self.client.force_authenticate(self.user)
+        question = TestQuestion.objects.create(test=self.test, text="question")
+        answer = Answer.objects.create(question=question, text="answer")
+        url = reverse("lessons:lesson-detail", args=(self.test.id,))
+        etag = self.client.get(url)["ETag"]
+
+        answer.is_correct = True
+        answer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_test_number_of_queries(self):
+        for number in range(5):
+            question = TestQuestion.objects.create(test=self.test, text=f"question {number}")
+            for answer in range(3):
+                Answer.objects.create(question=question, text=f"answer {answer}")
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-detail", args=(self.test.id,))
+        get_enrolled_course_ids(self.user.id)
+        # Permissions are cached on the user, they decide whether correct answers are shown.
+        self.user.has_perm("lessons.change_baselesson")
+
+        # Lesson, its Test row, questions and answers of all questions.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        questions = response.json()["questions"]
+        self.assertEqual(len(questions), 5)
+        self.assertEqual([len(question["answers"]) for question in questions], [3] * 5)
+
+        # Questions and answers are cached.
+        with self.assertNumQueries(2):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.json(), response.json())
+
+    def test_retrieve_test_after_answer_change(self):
+        question = TestQuestion.objects.create(test=self.test, text="question")
+        answer = Answer.objects.create(question=question, text="answer")
+        self.client.force_authenticate(self.user)
+        url = reverse("lessons:lesson-detail", args=(self.test.id,))
+        self.client.get(url)
+
+        answer.text = "changed"
+        answer.save()
+        response = self.client.get(url)
+
+        self.assertEqual(response.json()["questions"][0]["answers"][0]["text"], "changed")
+
     def test_number_of_queries_on_list(self):
         self.client.force_authenticate(self.user)
+        # Content types are cached per process after the first lookup.
+        ContentType.objects.get_for_models(Lesson, Exercise, Test)
+        get_enrolled_course_ids(self.user.id)
+
+        # Count and lessons, regardless of lesson types. Previously a query per type was added.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.lesson_create_url)
+
+        lesson_types = {lesson["id"]: lesson["lessonType"] for lesson in response.json()["results"]}
+        self.assertEqual(
+            lesson_types,
+            {self.lesson.id: "Lesson", self.exercise.id: "Exercise", self.test.id: "Test"},
+        )
+
+
+class TestWriteAPITestCase(APITestCase, BaseLessonTestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test", is_superuser=True
+        )
+        self.client.force_authenticate(self.user)
+        self.list_url = reverse("lessons:lesson-list")
+        self.question = TestQuestion.objects.create(test=self.test, text="question")
+        self.answer = Answer.objects.create(question=self.question, text="answer")
+        self.other_answer = Answer.objects.create(question=self.question, text="other")
+
+    def _build_questions(self, count: int) -> list:
+        return [
+            {
+                "text": f"question {number}",
+                "answers": [
+                    {"text": "right", "is_correct": True},
+                    {"text": "wrong", "is_correct": False},
+                ],
+            }
+            for number in range(count)
+        ]
+
+    def _create(self, questions: list):
+        data = {
+            "course_section": self.course_section.id,
+            "name": "test",
+            "lesson_type": "Test",
+            "questions": questions,
+        }
+        return self.client.post(self.list_url, data=data, format="json")
+
+    def _update(self, questions: list, method: str = "put"):
+        url = reverse("lessons:lesson-detail", args=(self.test.id,))
+        data = {"course_section": self.course_section.id, "name": "test", "lesson_type": "Test"}
+        if questions is not None:
+            data["questions"] = questions
+        return getattr(self.client, method)(url, data=data, format="json")
+
+    def test_number_of_queries_does_not_depend_on_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self._create(self._build_questions(1)).status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self._create(self._build_questions(100)).status_code, 201)
+
+        self.assertEqual(len(large), len(small))
+        test = Test.objects.latest("id")
+        self.assertEqual(test.questions.count(), 100)
+        self.assertEqual(Answer.objects.filter(question__test=test, is_correct=True).count(), 100)
+
+    def test_update(self):
+        response = self._update(
+            [
+                {
+                    "id": self.question.id,
+                    "text": "changed question",
+                    "answers": [
+                        {"id": self.answer.id, "text": "changed answer", "is_correct": True},
+                        {"text": "new answer"},
+                    ],
+                },
+                {"text": "new question", "answers": [{"text": "answer", "is_correct": True}]},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.question.refresh_from_db()
+        self.answer.refresh_from_db()
+        self.assertEqual(self.question.text, "changed question")
+        self.assertEqual(self.answer.text, "changed answer")
+        self.assertTrue(self.answer.is_correct)
+        self.assertFalse(Answer.objects.filter(id=self.other_answer.id).exists())
+        self.assertEqual(
+            list(self.question.answers.order_by("id").values_list("text", flat=True)),
+            ["changed answer", "new answer"],
+        )
+        self.assertEqual(self.test.questions.count(), 2)
+        questions = response.json()["questions"]
+        self.assertEqual([question["text"] for question in questions][0], "changed question")
+
+    def test_update_removes_missing_questions(self):
+        response = self._update([{"text": "new question", "answers": []}])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(TestQuestion.objects.filter(id=self.question.id).exists())
+        self.assertFalse(Answer.objects.filter(question__test=self.test).exists())
+
+    def test_update_without_answers_keeps_them(self):
+        response = self._update(
+            [{"id": self.question.id, "text": "changed question"}], method="patch"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.question.answers.count(), 2)
+
+    def test_partial_update_without_questions_keeps_them(self):
+        response = self._update(None, method="patch")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.test.questions.count(), 1)
+
+    def test_update_changes_version(self):
+        updated = BaseLesson.objects.get(id=self.test.id).updated
+
+        self._update([{"id": self.question.id, "text": "changed question", "answers": []}])
+
+        self.assertGreater(BaseLesson.objects.get(id=self.test.id).updated, updated)
+
+    def test_question_of_other_test(self):
+        other_test = Test.objects.create(course_section=self.course_section)
+        other_question = TestQuestion.objects.create(test=other_test, text="other")
+
+        response = self._update([{"id": other_question.id, "text": "stolen", "answers": []}])
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        other_question.refresh_from_db()
+        self.assertEqual(other_question.text, "other")
+        self.assertTrue(TestQuestion.objects.filter(id=self.question.id).exists())
+
+    def test_repeated_question(self):
+        question = {"id": self.question.id, "text": "question", "answers": []}
+        response = self._update([question, question])
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class TestSubmitAPITestCase(APITestCase, BaseLessonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = []
+        self.correct_answers = []
+        self.wrong_answers = []
+        for number in range(5):
+            question = TestQuestion.objects.create(test=self.test, text=f"question {number}")
+            self.correct_answers.append(
+                Answer.objects.create(question=question, text="right", is_correct=True)
+            )
+            self.wrong_answers.append(Answer.objects.create(question=question, text="wrong"))
+            self.questions.append(question)
+        self.url = reverse("lessons:lesson-submit", args=(self.test.id,))
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+        CourseSignup.objects.create(course=self.course, user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def _submit(self, answers):
+        return self.client.post(self.url, data={"answers": [answer.id for answer in answers]})
+
+    def test_passed(self):
+        answers = self.correct_answers[:4] + self.wrong_answers[4:]
+
+        response = self._submit(answers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["correct_count"], 4)
+        self.assertEqual(response.data["question_count"], 5)
+        self.assertEqual(response.data["score"], 0.8)
+        self.assertTrue(response.data["is_complete"])
+        attempt = TestAttempt.objects.get(user=self.user, test=self.test)
+        self.assertEqual(attempt.answers, sorted(answer.id for answer in answers))
+        self.assertTrue(self.test.is_completed_by(self.user))
+
+    def test_failed(self):
+        response = self._submit(self.correct_answers[:3])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["correct_count"], 3)
+        self.assertFalse(response.data["is_complete"])
+        self.assertFalse(self.test.is_completed_by(self.user))
+
+    def test_passed_again(self):
+        self._submit(self.correct_answers)
+        response = self._submit(self.correct_answers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(TestAttempt.objects.filter(user=self.user).count(), 2)
+
+    def test_extra_answer_makes_question_wrong(self):
+        response = self._submit(self.correct_answers + self.wrong_answers[:1])
+        self.assertEqual(response.data["correct_count"], 4)
+
+    def test_answer_of_other_test(self):
+        other_test = Test.objects.create(course_section=self.course_section)
+        question = TestQuestion.objects.create(test=other_test, text="question")
+        answer = Answer.objects.create(question=question, text="answer", is_correct=True)
+
+        response = self._submit([answer])
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(TestAttempt.objects.exists())
+
+    def test_not_a_test(self):
+        url = reverse("lessons:lesson-submit", args=(self.lesson.id,))
+        response = self.client.post(url, data={"answers": []})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_not_signed_up(self):
+        CourseSignup.objects.all().delete()
+        get_user_model().objects.filter(id=self.user.id).update(username="other")
+        other = get_user_model().objects.create_user(username="test", email="t@example.com")
+        self.client.force_authenticate(other)
+
+        response = self._submit(self.correct_answers)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_answer_key_cached(self):
+        self._submit(self.correct_answers)
+
+        # Lesson, its Test row, the attempt in a savepoint and the completion check. Completing the
+        # lesson is skipped when the score is below the threshold.
+        with self.assertNumQueries(6):
+            self._submit(self.wrong_answers)
+
+    def test_answer_key_changes_with_answers(self):
+        self.wrong_answers[0].is_correct = True
+        self.wrong_answers[0].save()
+
+        response = self._submit(self.correct_answers)
+
+        self.assertEqual(response.data["correct_count"], 4)
+
+    def test_correct_answers_hidden_from_learners(self):
+        url = reverse("lessons:lesson-detail", args=(self.test.id,))
+        response = self.client.get(url)
+        self.assertNotIn("isCorrect", response.json()["questions"][0]["answers"][0])
+
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertIn("isCorrect", response.json()["questions"][0]["answers"][0])
+
+
+class UploadSessionAPITestCase(APITestCase, BaseLessonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            UPLOAD_SESSION_DIRECTORY=os.path.join(self.media_root, "sessions"),
+            UPLOAD_MIN_PART_SIZE=6,
+        )
+        self.settings_override.enable()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test", is_superuser=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _start(self) -> str:
+        response = self.client.post(
+            reverse("lessons:upload-session-list"),
+            {"lesson": self.lesson.id, "field": "video", "filename": "video.mp4"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["id"]
+
+    def _put_part(self, session_id: str, number: int, content: bytes):
+        return self.client.put(
+            reverse("lessons:upload-session-part", args=(session_id, number)),
+            data=content,
+            content_type="application/octet-stream",
+        )
+
+    def test_upload(self):
+        session_id = self._start()
+
+        # Parts may arrive in any order and be sent again.
+        self.assertEqual(self._put_part(session_id, 2, b"world").status_code, status.HTTP_200_OK)
+        self._put_part(session_id, 1, b"hello ")
+        self._put_part(session_id, 1, b"hello, ")
+        response = self.client.get(reverse("lessons:upload-session-detail", args=(session_id,)))
+        self.assertEqual(
+            response.json()["parts"], [{"number": 1, "size": 7}, {"number": 2, "size": 5}]
+        )
+
+        response = self.client.post(reverse("lessons:upload-session-complete", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.json()["completed"])
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.video.name, f"videos/lessons/{self.lesson.id}/video.mp4")
+        with self.lesson.video.open("rb") as file:
+            self.assertEqual(file.read(), b"hello, world")
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "sessions", session_id)))
+
+    def test_complete_with_missing_part(self):
+        session_id = self._start()
+        self._put_part(session_id, 2, b"world")
+
+        response = self.client.post(reverse("lessons:upload-session-complete", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_part_smaller_than_minimum(self):
+        session_id = self._start()
+        self._put_part(session_id, 2, b"world!")
+
+        # Only the last part may be smaller.
+        self.assertEqual(
+            self._put_part(session_id, 1, b"hi").status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(self._put_part(session_id, 3, b"!").status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self._put_part(session_id, 2, b"hello").status_code,
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    def test_complete_with_small_part(self):
+        session_id = self._start()
+        self._put_part(session_id, 1, b"hello")
+
+        with override_settings(UPLOAD_MIN_PART_SIZE=1):
+            self._put_part(session_id, 2, b"world")
+        response = self.client.post(reverse("lessons:upload-session-complete", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_part_after_completion(self):
+        session_id = self._start()
+        self._put_part(session_id, 1, b"hello")
+        self.client.post(reverse("lessons:upload-session-complete", args=(session_id,)))
+
+        response = self._put_part(session_id, 2, b"world")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_abort(self):
+        session_id = self._start()
+        self._put_part(session_id, 1, b"hello")
+
+        response = self.client.delete(reverse("lessons:upload-session-detail", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "sessions", session_id)))
+
+    def test_other_users_session(self):
+        session_id = self._start()
+        other_user = get_user_model().objects.create_user(
+            username="other", email="other@example.com", password="test", is_superuser=True
+        )
+        self.client.force_authenticate(other_user)
+
+        response = self._put_part(session_id, 1, b"hello")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def _start_direct(self, size: int = 5, content_type: str = "video/mp4"):
+        return self.client.post(
+            reverse("lessons:upload-session-direct"),
+            {
+                "lesson": self.lesson.id,
+                "field": "video",
+                "filename": "video.mp4",
+                "size": size,
+                "content_type": content_type,
+            },
+        )
+
+    def test_direct_upload(self):
+        response = self._start_direct()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        session_id = response.json()["id"]
+        upload = response.json()["upload"]
+        self.assertEqual(upload["method"], "PUT")
+
+        # Uploading client is not authenticated, the signed URL grants access.
+        self.client.force_authenticate(None)
+        response = self.client.put(upload["url"], data=b"hello", content_type="video/mp4")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse("lessons:upload-session-confirm", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.lesson.refresh_from_db()
+        with self.lesson.video.open("rb") as file:
+            self.assertEqual(file.read(), b"hello")
+
+    def test_direct_upload_sent_again(self):
+        upload = self._start_direct().json()["upload"]
+        self.client.put(upload["url"], data=b"hello", content_type="video/mp4")
+
+        response = self.client.put(upload["url"], data=b"world", content_type="video/mp4")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        directory = os.path.join(self.media_root, "videos", "lessons", str(self.lesson.id))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        session = UploadSession.objects.get()
+        with Lesson._meta.get_field("video").storage.open(session.name) as file:
+            self.assertEqual(file.read(), b"world")
+
+    def test_direct_upload_size_mismatch(self):
+        upload = self._start_direct(size=10).json()["upload"]
+
+        response = self.client.put(upload["url"], data=b"hello", content_type="video/mp4")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_direct_upload_invalid_signature(self):
+        upload = self._start_direct().json()["upload"]
+
+        response = self.client.put(
+            upload["url"][:-3] + "xx/", data=b"hello", content_type="video/mp4"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_direct_upload_content_type_not_allowed(self):
+        response = self._start_direct(content_type="text/html")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_confirm_before_upload(self):
+        session_id = self._start_direct().json()["id"]
+
+        response = self.client.post(reverse("lessons:upload-session-confirm", args=(session_id,)))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.lesson.refresh_from_db()
+        self.assertFalse(self.lesson.video)
+
+
+class MediaAPITestCase(APITestCase, BaseLessonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, MEDIA_SERVE_BACKEND="common.media.DjangoMediaBackend"
+        )
+        self.settings_override.enable()
+        self.lesson.video = SimpleUploadedFile("video.mp4", b"0123456789")
+        self.lesson.save()
+        self.path = f"/media/{self.lesson.video.name}"
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _content(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_signed_url(self):
+        response = self.client.get(self.lesson.video.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._content(response), b"0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_invalid_signature(self):
+        response = self.client.get(f"{self.path}?expires=9999999999&signature=invalid")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_signed_up_user(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.path).status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSignup.objects.create(course=self.course, user=self.user)
+
+        self.assertEqual(self.client.get(self.path).status_code, status.HTTP_200_OK)
+
+    def test_range(self):
+        response = self.client.get(self.lesson.video.url, HTTP_RANGE="bytes=2-5")
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self._content(response), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+    def test_suffix_range(self):
+        response = self.client.get(self.lesson.video.url, HTTP_RANGE="bytes=-3")
+
+        self.assertEqual(self._content(response), b"789")
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(self.lesson.video.url, HTTP_RANGE="bytes=20-")
+
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_if_range_mismatch(self):
+        response = self.client.get(
+            self.lesson.video.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"outdated"'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._content(response), b"0123456789")
+
+    def test_not_modified(self):
+        etag = self.client.get(self.lesson.video.url)["ETag"]
+
+        response = self.client.get(self.lesson.video.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(
+        MEDIA_SERVE_BACKEND="common.media.XAccelRedirectBackend",
+        MEDIA_ACCEL_REDIRECT_PREFIX="/protected/",
+    )
+    def test_accel_redirect(self):
+        response = self.client.get(self.lesson.video.url)
 
-        # Without prefetch there were 8.
-        with self.assertNumQueries(5):
-            self.client.get(self.lesson_create_url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected/{self.lesson.video.name}")
+        self.assertEqual(response.content, b"")
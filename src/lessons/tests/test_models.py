@@ -1,10 +1,25 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from parameterized import parameterized
 
 from common.exceptions import ProcessingException
-from lessons.models import BaseLesson, Exercise, Lesson, Test
+from courses.enrollments import ENROLLMENTS_VERSION_KEY, get_enrolled_course_ids
+from courses.models import Course, CourseProgress, CourseSection, CourseSignup
+from courses.querysets import CourseProgressQuerySet
+from courses.signups import bulk_signup
+from lessons.models import BaseLesson, CompletedLesson, Exercise, Lesson, Test
+from lessons.mp4 import Mp4Error, process_video, read_boxes
+from lessons.tasks import process_lesson_video
 from lessons.tests import BaseLessonTestCase
 
 
@@ -79,3 +94,286 @@ class LessonModelsTestCase(BaseLessonTestCase, TestCase):
 
         for lesson in BaseLesson.objects.all().with_completed_annotations(user=user):
             self.assertTrue(lesson.is_completed)
+
+
+class CourseProgressCountersTestCase(BaseLessonTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="test", email="test@example.com", password="test"
+        )
+
+    def test_complete_increments_counter(self):
+        self.lesson.complete(self.user)
+        self.exercise.complete(self.user)
+
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(progress.completed_count, 2)
+        self.assertEqual(progress.total_count, 3)
+        self.assertIsNotNone(progress.last_completed_at)
+
+    def test_revert_complete_decrements_counter(self):
+        self.lesson.complete(self.user)
+        self.exercise.complete(self.user)
+
+        self.lesson.revert_complete(self.user)
+        self.lesson.revert_complete(self.user)
+
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(progress.completed_count, 1)
+
+    def test_lesson_create_and_delete_update_total(self):
+        self.lesson.complete(self.user)
+
+        new_lesson = Lesson.objects.create(course_section=self.course_section, name="new")
+        self.assertEqual(CourseProgress.objects.get(user=self.user).total_count, 4)
+
+        self.lesson.delete()
+        progress = CourseProgress.objects.get(user=self.user)
+        self.assertEqual(progress.total_count, 3)
+        self.assertEqual(progress.completed_count, 0)
+
+        new_lesson.delete()
+        self.assertEqual(CourseProgress.objects.get(user=self.user).total_count, 2)
+
+    def test_lesson_moved_to_other_course_updates_totals(self):
+        self.lesson.complete(self.user)
+        other_course = Course.objects.create(name="other")
+        other_section = CourseSection.objects.create(course=other_course, name="other section")
+        CourseProgress.objects.get_for(user=self.user, course_id=other_course.id)
+
+        lesson = Lesson.objects.get(id=self.lesson.id)
+        lesson.course_section = other_section
+        lesson.save()
+
+        progress = CourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual((progress.completed_count, progress.total_count), (0, 2))
+        progress = CourseProgress.objects.get(user=self.user, course=other_course)
+        self.assertEqual((progress.completed_count, progress.total_count), (1, 1))
+
+    def test_concurrent_refresh(self):
+        update_or_create = CourseProgressQuerySet.update_or_create
+        calls = []
+
+        def lose_first_race(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # Another refresh creates the row in the meantime.
+                CourseProgress.objects.create(user=self.user, course=self.course, total_count=0)
+                raise IntegrityError()
+            return update_or_create(queryset, **kwargs)
+
+        with mock.patch.object(
+            CourseProgressQuerySet, "update_or_create", autospec=True, side_effect=lose_first_race
+        ):
+            progress = CourseProgress.objects.refresh(
+                user_id=self.user.id, course_id=self.course.id
+            )
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(progress.total_count, 3)
+
+    def test_get_for_builds_missing_row(self):
+        CompletedLesson.objects.create(lesson=self.test, user=self.user)
+
+        progress = CourseProgress.objects.get_for(user=self.user, course_id=self.course.id)
+
+        self.assertEqual(progress.completed_count, 1)
+        self.assertEqual(progress.total_count, 3)
+        self.assertTrue(CourseProgress.objects.filter(user=self.user).exists())
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def build_mp4(media: bytes, moov_first: bool = False) -> bytes:
+    """
+    Builds a file with a single chunk of media, 2 seconds long with 1000 units per second.
+    """
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isommp41")
+    mvhd = _box(b"mvhd", b"\x00" * 4 + struct.pack(">III", 0, 0, 1000) + struct.pack(">I", 2000))
+
+    def build_moov(chunk_offset: int) -> bytes:
+        stco = _box(b"stco", b"\x00" * 4 + struct.pack(">II", 1, chunk_offset))
+        stbl = _box(b"stbl", stco)
+        trak = _box(b"trak", _box(b"mdia", _box(b"minf", stbl)))
+        return _box(b"moov", mvhd + trak)
+
+    moov_size = len(build_moov(0))
+    if moov_first:
+        return ftyp + build_moov(len(ftyp) + moov_size + 8) + _box(b"mdat", media)
+    return ftyp + _box(b"mdat", media) + build_moov(len(ftyp) + 8)
+
+
+def read_chunk(data: bytes, size: int) -> bytes:
+    offset = data.index(b"stco") + 12
+    (chunk_offset,) = struct.unpack(">I", data[offset : offset + 4])
+    return data[chunk_offset : chunk_offset + size]
+
+
+class EnrolledCourseIdsTestCase(BaseLessonTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_course = Course.objects.create(name="other")
+        other_section = CourseSection.objects.create(course=self.other_course, name="section")
+        self.other_lesson = Lesson.objects.create(course_section=other_section)
+        User = get_user_model()
+        self.user = User.objects.create_user(username="test", email="test@example.com")
+
+    def _assert_same_as_join(self):
+        joined = BaseLesson.objects.filter(course_section__course__signups__user=self.user)
+        cached = BaseLesson.objects.filter(
+            course_section__course_id__in=get_enrolled_course_ids(self.user.id)
+        )
+        self.assertEqual(set(cached), set(joined))
+
+    def test_no_signups(self):
+        self.assertEqual(get_enrolled_course_ids(self.user.id), frozenset())
+        self._assert_same_as_join()
+
+    def test_signup_created_and_deleted(self):
+        self._assert_same_as_join()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            signup = CourseSignup.objects.create(user=self.user, course=self.course)
+        self._assert_same_as_join()
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSignup.objects.create(user=self.user, course=self.other_course)
+        self._assert_same_as_join()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            signup.delete()
+        self.assertEqual(get_enrolled_course_ids(self.user.id), {self.other_course.id})
+        self._assert_same_as_join()
+
+    def test_course_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSignup.objects.create(user=self.user, course=self.other_course)
+        self._assert_same_as_join()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_course.delete()
+        self.assertEqual(get_enrolled_course_ids(self.user.id), frozenset())
+
+    def test_evicted_version(self):
+        self.assertEqual(get_enrolled_course_ids(self.user.id), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSignup.objects.create(user=self.user, course=self.course)
+
+        cache.delete(ENROLLMENTS_VERSION_KEY.format(user_id=self.user.id))
+
+        self.assertEqual(get_enrolled_course_ids(self.user.id), {self.course.id})
+
+    def test_bulk_signup(self):
+        self._assert_same_as_join()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            list(bulk_signup([{"user": self.user.id, "course": self.course.id}]))
+        self.assertEqual(get_enrolled_course_ids(self.user.id), {self.course.id})
+        self._assert_same_as_join()
+
+    def test_cached(self):
+        get_enrolled_course_ids(self.user.id)
+        with self.assertNumQueries(0):
+            get_enrolled_course_ids(self.user.id)
+
+    def test_other_users_not_affected(self):
+        other_user = get_user_model().objects.create_user(username="other", email="o@example.com")
+        get_enrolled_course_ids(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseSignup.objects.create(user=other_user, course=self.course)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_enrolled_course_ids(self.user.id), frozenset())
+
+
+class Mp4TestCase(TestCase):
+    def test_moves_moov_to_front(self):
+        data = build_mp4(b"media-data")
+        destination = io.BytesIO()
+
+        info = process_video(io.BytesIO(data), destination, len(data))
+
+        rewritten = destination.getvalue()
+        self.assertTrue(info.rewritten)
+        self.assertEqual(len(rewritten), len(data))
+        self.assertEqual(
+            [box.type for box in read_boxes(io.BytesIO(rewritten), len(rewritten))],
+            [b"ftyp", b"moov", b"mdat"],
+        )
+        self.assertEqual(read_chunk(rewritten, 10), b"media-data")
+        self.assertEqual(info.duration, 2.0)
+        self.assertEqual(info.bitrate, len(data) * 8 // 2)
+
+    def test_moov_already_first(self):
+        data = build_mp4(b"media-data", moov_first=True)
+        destination = io.BytesIO()
+
+        info = process_video(io.BytesIO(data), destination, len(data))
+
+        self.assertFalse(info.rewritten)
+        self.assertEqual(destination.getvalue(), b"")
+        self.assertEqual(read_chunk(data, 10), b"media-data")
+
+    def test_not_mp4(self):
+        data = b"definitely not a video"
+
+        with self.assertRaises(Mp4Error):
+            process_video(io.BytesIO(data), io.BytesIO(), len(data))
+
+
+class ProcessLessonVideoTestCase(BaseLessonTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_scheduled_when_video_changes(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.lesson.name = "renamed"
+            self.lesson.save()
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.lesson.video = SimpleUploadedFile("video.mp4", build_mp4(b"media-data"))
+            self.lesson.save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_process(self):
+        self.lesson.video = SimpleUploadedFile("video.mp4", build_mp4(b"media-data"))
+        self.lesson.save()
+        old_name = self.lesson.video.name
+
+        process_lesson_video(self.lesson.id, old_name)
+
+        self.lesson.refresh_from_db()
+        with self.lesson.video.open("rb") as file:
+            data = file.read()
+        self.assertEqual(read_chunk(data, 10), b"media-data")
+        self.assertEqual(self.lesson.video_duration, 2.0)
+        self.assertEqual(self.lesson.video_size, len(data))
+        self.assertFalse(self.lesson.video.storage.exists(old_name))
+
+    def test_process_replaced_video(self):
+        self.lesson.video = SimpleUploadedFile("video.mp4", build_mp4(b"media-data"))
+        self.lesson.save()
+        old_name = self.lesson.video.name
+        self.lesson.video = SimpleUploadedFile("other.mp4", build_mp4(b"other-data"))
+        self.lesson.save()
+
+        process_lesson_video(self.lesson.id, old_name)
+
+        self.lesson.refresh_from_db()
+        self.assertIsNone(self.lesson.video_duration)
+        # Rewritten copy of the replaced video is discarded.
+        self.assertEqual(
+            set(os.listdir(os.path.dirname(self.lesson.video.path))), {"video.mp4", "other.mp4"}
+        )
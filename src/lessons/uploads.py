@@ -0,0 +1,383 @@
+import mimetypes
+import os
+import shutil
+import tempfile
+from typing import IO, Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from auth_ex.models import User
+from common.exceptions import ProcessingException
+from lessons.models import Lesson, UploadPart, UploadSession
+
+# S3 does not accept more parts in a single multipart upload.
+MAX_PARTS = 10000
+COPY_BUFFER_SIZE = 1024 * 1024
+DIRECT_UPLOAD_SALT = "lessons.direct-upload"
+# Prefixes of content types accepted by direct uploads, fields not listed accept any type.
+ALLOWED_CONTENT_TYPES = {UploadSession.Field.VIDEO: "video/"}
+# Object parameters of the storage as form fields of a presigned POST.
+POST_FIELD_NAMES = {
+    "CacheControl": "Cache-Control",
+    "ServerSideEncryption": "x-amz-server-side-encryption",
+}
+
+
+class LocalUploadBackend:
+    """
+    Keeps received parts as temporary files and joins them into the storage on completion.
+    """
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    def initiate(self, session: UploadSession) -> str:
+        os.makedirs(self._get_directory(session), exist_ok=True)
+        return ""
+
+    def upload_part(self, session: UploadSession, number: int, stream: BinaryIO, size: int) -> str:
+        path = self._get_part_path(session, number)
+        # Part retried after a dropped connection replaces the previous one only once it is whole.
+        with open(f"{path}.tmp", "wb") as file:
+            _copy_exactly(stream, file, size)
+        os.replace(f"{path}.tmp", path)
+        return ""
+
+    def complete(self, session: UploadSession, parts: List[UploadPart]) -> str:
+        reader = PartsReader([self._get_part_path(session, part.number) for part in parts])
+        try:
+            name = self.storage.save(session.name, File(reader))
+        finally:
+            reader.close()
+        self.abort(session)
+        return name
+
+    def abort(self, session: UploadSession):
+        shutil.rmtree(self._get_directory(session), ignore_errors=True)
+
+    def get_direct_upload(self, session: UploadSession) -> Dict:
+        token = signing.dumps(str(session.id), salt=DIRECT_UPLOAD_SALT)
+        return {
+            "method": "PUT",
+            "url": reverse("lessons:direct-upload", args=(token,)),
+            "fields": {},
+            "headers": {"Content-Type": session.content_type},
+        }
+
+    def stat(self, session: UploadSession) -> Optional[Tuple[int, str]]:
+        if not self.storage.exists(session.name):
+            return None
+        # Content type was checked by the signed upload view, see receive_direct_upload.
+        return self.storage.size(session.name), session.content_type
+
+    def _get_directory(self, session: UploadSession) -> str:
+        return os.path.join(settings.UPLOAD_SESSION_DIRECTORY, str(session.id))
+
+    def _get_part_path(self, session: UploadSession, number: int) -> str:
+        return os.path.join(self._get_directory(session), f"{number:05d}")
+
+
+class S3MultipartUploadBackend:
+    """
+    Sends every part directly to an S3 multipart upload, so the file is never stored locally.
+    """
+
+    def __init__(self, storage: S3Boto3Storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+
+    def initiate(self, session: UploadSession) -> str:
+        content_type = mimetypes.guess_type(session.filename)[0] or "application/octet-stream"
+        response = self._call(
+            "create_multipart_upload",
+            **self._get_object_params(session),
+            **self.storage.object_parameters,
+            ContentType=content_type,
+        )
+        return response["UploadId"]
+
+    def upload_part(self, session: UploadSession, number: int, stream: BinaryIO, size: int) -> str:
+        # Part is spooled so it can be signed and retried by boto. Only small parts stay in memory.
+        with tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as body:
+            _copy_exactly(stream, body, size)
+            body.seek(0)
+            response = self._call(
+                "upload_part",
+                **self._get_object_params(session),
+                UploadId=session.upload_id,
+                PartNumber=number,
+                Body=body,
+                ContentLength=size,
+            )
+        return response["ETag"]
+
+    def complete(self, session: UploadSession, parts: List[UploadPart]) -> str:
+        self._call(
+            "complete_multipart_upload",
+            **self._get_object_params(session),
+            UploadId=session.upload_id,
+            MultipartUpload={
+                "Parts": [{"ETag": part.etag, "PartNumber": part.number} for part in parts]
+            },
+        )
+        return session.name
+
+    def abort(self, session: UploadSession):
+        self._call(
+            "abort_multipart_upload", **self._get_object_params(session), UploadId=session.upload_id
+        )
+
+    def get_direct_upload(self, session: UploadSession) -> Dict:
+        fields = {"Content-Type": session.content_type}
+        for parameter, value in self.storage.object_parameters.items():
+            if parameter in POST_FIELD_NAMES:
+                fields[POST_FIELD_NAMES[parameter]] = value
+        conditions: List[Any] = [{name: value} for name, value in fields.items()]
+        conditions.append(["content-length-range", session.size, session.size])
+        post = self._call(
+            "generate_presigned_post",
+            **self._get_object_params(session),
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=settings.DIRECT_UPLOAD_EXPIRE,
+        )
+        return {"method": "POST", "url": post["url"], "fields": post["fields"], "headers": {}}
+
+    def stat(self, session: UploadSession) -> Optional[Tuple[int, str]]:
+        try:
+            response = self.client.head_object(**self._get_object_params(session))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise ProcessingException(detail=e.response["Error"].get("Message")) from e
+        return response["ContentLength"], response["ContentType"]
+
+    def _get_object_params(self, session: UploadSession) -> dict:
+        key = self.storage._normalize_name(self.storage._clean_name(session.name))
+        return {"Bucket": self.storage.bucket_name, "Key": key}
+
+    def _call(self, method: str, **params) -> dict:
+        try:
+            return getattr(self.client, method)(**params)
+        except ClientError as e:
+            raise ProcessingException(detail=e.response["Error"].get("Message")) from e
+
+
+class PartsReader:
+    """
+    File-like object reading consecutive part files as one stream.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self._paths = iter(paths)
+        self._file: Optional[BinaryIO] = None
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self._file is None:
+                path = next(self._paths, None)
+                if path is None:
+                    break
+                self._file = open(path, "rb")
+            data = self._file.read(remaining if size >= 0 else -1)
+            if not data:
+                self._file.close()
+                self._file = None
+                continue
+            chunks.append(data)
+            remaining -= len(data)
+        return b"".join(chunks)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_upload_backend(storage: Storage):
+    if isinstance(storage, S3Boto3Storage):
+        return S3MultipartUploadBackend(storage)
+    return LocalUploadBackend(storage)
+
+
+def start_upload(lesson: Lesson, user: User, field: str, filename: str) -> UploadSession:
+    session = _create_session(lesson, user, field, filename)
+    session.upload_id = _get_backend(session).initiate(session)
+    session.save()
+    return session
+
+
+def start_direct_upload(
+    lesson: Lesson, user: User, field: str, filename: str, size: int, content_type: str
+) -> Tuple[UploadSession, Dict]:
+    """
+    Starts an upload sent by the client straight to the storage. Returns the session and
+    description of the request the client has to make.
+    """
+    if not 0 < size <= settings.DIRECT_UPLOAD_MAX_SIZE:
+        raise ProcessingException(
+            detail=f"File size has to be between 1 and {settings.DIRECT_UPLOAD_MAX_SIZE} bytes."
+        )
+    if not content_type.startswith(ALLOWED_CONTENT_TYPES.get(field, "")):
+        raise ProcessingException(detail=f"Content type {content_type} is not allowed.")
+    session = _create_session(lesson, user, field, filename)
+    session.direct = True
+    session.size = size
+    session.content_type = content_type
+    session.save()
+    return session, _get_backend(session).get_direct_upload(session)
+
+
+def receive_direct_upload(token: str, stream: BinaryIO, size: int, content_type: str):
+    """
+    Stores a direct upload sent to the signed upload view, which stands in for S3 when media is
+    kept in the local file system.
+    """
+    try:
+        session_id = signing.loads(
+            token, salt=DIRECT_UPLOAD_SALT, max_age=settings.DIRECT_UPLOAD_EXPIRE
+        )
+    except signing.BadSignature as e:
+        raise ProcessingException(detail="Invalid or expired upload signature.") from e
+    session = UploadSession.objects.filter(id=session_id, direct=True).first()
+    if session is None:
+        raise ProcessingException(detail="Invalid or expired upload signature.")
+    _check_active(session)
+    if size != session.size or content_type != session.content_type:
+        raise ProcessingException(detail="File does not match the declared size or type.")
+    storage = Lesson._meta.get_field(session.field).storage
+    # Upload sent again replaces the file received before, which is deleted once the new one is
+    # stored. Content addressed storage only releases a reference then, so same content is kept.
+    previous_name = session.name if storage.exists(session.name) else None
+    # Request stream is limited to its content length, it is copied into the storage in chunks.
+    name = storage.save(session.name, File(stream))
+    if previous_name is not None:
+        storage.delete(previous_name)
+    if name != session.name:
+        session.name = name
+        session.save(update_fields=["name"])
+
+
+@transaction.atomic()
+def confirm_direct_upload(session: UploadSession) -> UploadSession:
+    session = UploadSession.objects.select_for_update().get(id=session.id)
+    _check_active(session)
+    _check_direct(session, True)
+    stat = _get_backend(session).stat(session)
+    if stat is None:
+        raise ProcessingException(detail="File has not been uploaded.")
+    if stat != (session.size, session.content_type):
+        raise ProcessingException(detail="File does not match the declared size or type.")
+    return _attach(session)
+
+
+def upload_part(session: UploadSession, number: int, stream: BinaryIO, size: int) -> UploadPart:
+    _check_active(session)
+    _check_direct(session, False)
+    if not 1 <= number <= MAX_PARTS:
+        raise ProcessingException(detail=f"Part number has to be between 1 and {MAX_PARTS}.")
+    if not 0 < size <= settings.UPLOAD_MAX_PART_SIZE:
+        raise ProcessingException(
+            detail=f"Part size has to be between 1 and {settings.UPLOAD_MAX_PART_SIZE} bytes."
+        )
+    _check_part_size(session, number, size)
+    etag = _get_backend(session).upload_part(session, number, stream, size)
+    part, _ = UploadPart.objects.update_or_create(
+        session=session, number=number, defaults={"size": size, "etag": etag}
+    )
+    return part
+
+
+@transaction.atomic()
+def complete_upload(session: UploadSession) -> UploadSession:
+    # Lock prevents joining the parts twice when completion is retried concurrently.
+    session = UploadSession.objects.select_for_update().get(id=session.id)
+    _check_active(session)
+    _check_direct(session, False)
+    parts = list(session.parts.all())
+    if not parts or [part.number for part in parts] != list(range(1, len(parts) + 1)):
+        raise ProcessingException(detail="Parts have to be numbered from 1 without gaps.")
+    if any(part.size < settings.UPLOAD_MIN_PART_SIZE for part in parts[:-1]):
+        raise ProcessingException(detail=_get_min_part_size_error())
+
+    session.name = _get_backend(session).complete(session, parts)
+    return _attach(session)
+
+
+def abort_upload(session: UploadSession):
+    _check_active(session)
+    if session.direct:
+        Lesson._meta.get_field(session.field).storage.delete(session.name)
+    else:
+        _get_backend(session).abort(session)
+    session.delete()
+
+
+def _create_session(lesson: Lesson, user: User, field: str, filename: str) -> UploadSession:
+    file_field = Lesson._meta.get_field(field)
+    session = UploadSession(lesson=lesson, user=user, field=field, filename=filename)
+    session.name = file_field.storage.get_available_name(
+        file_field.generate_filename(lesson, filename), max_length=file_field.max_length
+    )
+    return session
+
+
+def _attach(session: UploadSession) -> UploadSession:
+    lesson = session.lesson
+    setattr(lesson, session.field, session.name)
+    lesson.save(update_fields=[session.field, "updated"])
+    session.completed = timezone.now()
+    session.save(update_fields=["name", "completed"])
+    return session
+
+
+def _get_backend(session: UploadSession):
+    return get_upload_backend(Lesson._meta.get_field(session.field).storage)
+
+
+def _check_active(session: UploadSession):
+    if session.completed is not None:
+        raise ProcessingException(detail="Upload has already been completed.")
+
+
+def _check_direct(session: UploadSession, direct: bool):
+    if session.direct != direct:
+        raise ProcessingException(detail="Operation is not available for this kind of upload.")
+
+
+def _check_part_size(session: UploadSession, number: int, size: int):
+    # Only the last part may be smaller than the minimum. Parts arrive in any order, so they are
+    # checked against those already received here and all together on completion.
+    min_size = settings.UPLOAD_MIN_PART_SIZE
+    conflicts = Q(number__lt=number, size__lt=min_size)
+    if size < min_size:
+        conflicts |= Q(number__gt=number)
+    if session.parts.filter(conflicts).exists():
+        raise ProcessingException(detail=_get_min_part_size_error())
+
+
+def _get_min_part_size_error() -> str:
+    return (
+        f"Parts other than the last one have to be at least {settings.UPLOAD_MIN_PART_SIZE} bytes."
+    )
+
+
+def _copy_exactly(source: IO[bytes], destination: IO[bytes], size: int):
+    remaining = size
+    while remaining > 0:
+        data = source.read(min(COPY_BUFFER_SIZE, remaining))
+        if not data:
+            raise ProcessingException(detail="Part is shorter than declared.")
+        destination.write(data)
+        remaining -= len(data)
@@ -1,11 +1,15 @@
+from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from lessons.views import LessonViewSet
+from lessons.views import DirectUploadView, LessonViewSet, UploadSessionViewSet
 
 app_name = "lessons"
 
 router = SimpleRouter()
 router.register("lessons", LessonViewSet, basename="lesson")
+router.register("upload-sessions", UploadSessionViewSet, basename="upload-session")
 
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("direct-uploads/<str:token>/", DirectUploadView.as_view(), name="direct-upload"),
+]
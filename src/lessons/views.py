@@ -1,24 +1,44 @@
-from typing import Type
+from typing import List, Type
 
 from django.db import transaction
 from django.db.models import QuerySet
+from django.http.response import HttpResponseBase
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import APIException
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
+from common.conditional import conditional_response, get_version
 from common.exceptions import ProcessingApiException, ProcessingException
-from lessons.models import BaseLesson
+from common.media import get_signed_url_window, get_signed_url_window_start
+from courses.enrollments import get_enrolled_course_ids
+from lessons.models import BaseLesson, Test, UploadSession
 from lessons.permissions import (
     LessonCreatePermission,
     LessonDeletePermission,
     LessonUpdatePermission,
 )
-from lessons.serializers import BaseLessonSerializer, ListLessonsSerializer
+from lessons.serializers import (
+    BaseLessonSerializer,
+    DirectUploadSessionSerializer,
+    ListLessonsSerializer,
+    TestAttemptSerializer,
+    UploadPartSerializer,
+    UploadSessionSerializer,
+)
+from lessons.uploads import (
+    abort_upload,
+    complete_upload,
+    confirm_direct_upload,
+    receive_direct_upload,
+    upload_part,
+)
 
 
 class LessonViewSet(ModelViewSet):
@@ -26,9 +46,19 @@ class LessonViewSet(ModelViewSet):
 
     def get_queryset(self) -> QuerySet:
         if self.action == "list":
-            self.queryset = self.queryset.with_completed_annotations(user=self.request.user)
+            self.queryset = self.queryset.for_listing().with_completed_annotations(
+                user=self.request.user
+            )
+        elif self.action == "retrieve":
+            self.queryset = self.queryset.with_completed_annotations(
+                user=self.request.user
+            ).with_progress_updated(user=self.request.user)
         if not self.request.user.is_staff and not self.request.user.is_superuser:
-            return self.queryset.filter(course_section__course__signups__user=self.request.user)
+            # Checked against cached signups instead of joining them, which also can't duplicate
+            # lessons.
+            return self.queryset.filter(
+                course_section__course_id__in=get_enrolled_course_ids(self.request.user.id)
+            )
         return self.queryset
 
     def get_permissions(self):
@@ -44,12 +74,32 @@ class LessonViewSet(ModelViewSet):
     def get_serializer_class(self) -> Type[Serializer]:
         if self.action == "list":
             return ListLessonsSerializer
+        elif self.action == "submit":
+            return TestAttemptSerializer
         else:
             return BaseLessonSerializer
 
     def get_serializer_context(self):
         return {"user": self.request.user}
 
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        lesson = self.get_object()
+        # Video and materials URLs are signed, they change with the window.
+        window = get_signed_url_window()
+        return conditional_response(
+            request,
+            versions=(
+                "lesson",
+                lesson.id,
+                lesson.version,
+                get_version(lesson.progress_updated),
+                int(lesson.is_completed),
+                window,
+            ),
+            modified=(lesson.updated, lesson.progress_updated, get_signed_url_window_start(window)),
+            get_response=lambda: Response(self.get_serializer(instance=lesson).data),
+        )
+
     @transaction.atomic()
     def create(self, request: Request, *args, **kwargs) -> Response:
         return super().create(request, *args, **kwargs)
@@ -62,12 +112,25 @@ class LessonViewSet(ModelViewSet):
     )
     def mark_as_complete(self, request: Request, pk: int) -> Response:
         lesson = self.get_object()
+        if isinstance(lesson, Test):
+            # Tests are completed by passing them, see submit.
+            raise ProcessingApiException(detail="Tests are completed by submitting them.")
         try:
             lesson.complete(user=self.request.user)
         except ProcessingException as e:
             raise ProcessingApiException(detail=e.detail) from e
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=["POST"], url_path="submit")
+    def submit(self, request: Request, pk: int) -> Response:
+        test = self.get_object()
+        if not isinstance(test, Test):
+            raise ProcessingApiException(detail="Only tests can be submitted.")
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(test=test)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(
         detail=True,
         methods=["PATCH", "POST"],
@@ -78,3 +141,92 @@ class LessonViewSet(ModelViewSet):
         lesson = self.get_object()
         lesson.revert_complete(user=self.request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
+    """
+    Uploads lesson files in numbered parts. A session is started for a lesson field, parts are
+    sent as raw request bodies and can be retried, and completing the session attaches the file.
+
+    Direct sessions let the client send the whole file straight to the storage with the returned
+    request description. Confirming the session verifies the file and attaches it.
+    """
+
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated, LessonUpdatePermission]
+
+    def get_queryset(self) -> QuerySet:
+        return self.queryset.filter(user=self.request.user).prefetch_related("parts")
+
+    def get_serializer_context(self):
+        return {"user": self.request.user}
+
+    def get_serializer_class(self) -> Type[Serializer]:
+        if self.action == "direct":
+            return DirectUploadSessionSerializer
+        return UploadSessionSerializer
+
+    def perform_destroy(self, instance: UploadSession):
+        try:
+            abort_upload(instance)
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+
+    @action(detail=True, methods=["PUT"], url_path=r"parts/(?P<number>\d+)", url_name="part")
+    def upload_part(self, request: Request, pk: str, number: str) -> Response:
+        session = self.get_object()
+        # Body is read straight from the request stream, it is never parsed or fully buffered.
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+        try:
+            part = upload_part(session, number=int(number), stream=request.stream, size=size)
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return Response(UploadPartSerializer(instance=part).data)
+
+    @action(detail=True, methods=["POST"])
+    def complete(self, request: Request, pk: str) -> Response:
+        try:
+            session = complete_upload(self.get_object())
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return Response(self.get_serializer(instance=session).data)
+
+    @action(detail=False, methods=["POST"])
+    def direct(self, request: Request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        upload = serializer.upload
+        upload["url"] = request.build_absolute_uri(upload["url"])
+        return Response({**serializer.data, "upload": upload}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["POST"])
+    def confirm(self, request: Request, pk: str) -> Response:
+        try:
+            session = confirm_direct_upload(self.get_object())
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return Response(self.get_serializer(instance=session).data)
+
+
+class DirectUploadView(APIView):
+    """
+    Receives direct uploads when media is kept in the local file system, the same way S3 receives
+    them otherwise. Access is granted by the signed token instead of user authentication.
+    """
+
+    authentication_classes: List[type] = []
+    permission_classes = [AllowAny]
+
+    def put(self, request: Request, token: str) -> Response:
+        try:
+            receive_direct_upload(
+                token,
+                stream=request.stream,
+                size=int(request.META.get("CONTENT_LENGTH") or 0),
+                content_type=request.content_type,
+            )
+        except ProcessingException as e:
+            raise ProcessingApiException(detail=e.detail) from e
+        return Response(status=status.HTTP_204_NO_CONTENT)
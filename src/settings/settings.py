@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 import environ
@@ -88,6 +89,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "settings.wsgi.application"
 
+TEST_RUNNER = "common.testing.TestRunner"
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
@@ -124,6 +127,14 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "auth_ex.User"
 
+AUTHENTICATION_BACKENDS = ["auth_ex.backends.CachedModelBackend"]
+
+# Tokens, user snapshots and permission sets are kept in the shared cache and, for a short time,
+# in a per process LRU cache which is not invalidated across processes.
+AUTH_CACHE_TIMEOUT = env.int("AUTH_CACHE_TIMEOUT", default=300)
+AUTH_LOCAL_CACHE_TIMEOUT = env.int("AUTH_LOCAL_CACHE_TIMEOUT", default=5)
+AUTH_LOCAL_CACHE_SIZE = env.int("AUTH_LOCAL_CACHE_SIZE", default=1024)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -159,9 +170,13 @@ if env.bool("LOG_DB", False):
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
+# Uploaded files are stored once per content under digest based names, see aws.storages.
+MEDIA_CONTENT_ADDRESSED = env.bool("MEDIA_CONTENT_ADDRESSED", default=False)
 AWS_STORAGE_BUCKET_NAME = env("AWS_STORAGE_BUCKET_NAME", default=None)
 if AWS_STORAGE_BUCKET_NAME is not None:
     AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com"
+    # Allows pointing storages and URL signing to a local S3 compatible server.
+    AWS_S3_ENDPOINT_URL = env("AWS_S3_ENDPOINT_URL", default=None)
     AWS_S3_OBJECT_PARAMETERS = {
         "CacheControl": "max-age=86400",
         "ServerSideEncryption": "AES256",
@@ -173,16 +188,21 @@ if AWS_STORAGE_BUCKET_NAME is not None:
     MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/media/"
     MEDIA_ROOT = "/media/"
     DEFAULT_FILE_STORAGE = "aws.storages.BlackSheepS3MediaStorage"
+    if MEDIA_CONTENT_ADDRESSED:
+        DEFAULT_FILE_STORAGE = "aws.storages.ContentAddressedS3MediaStorage"
 else:
     STATIC_URL = "/static/"
     MEDIA_URL = "/media/"
     MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+    DEFAULT_FILE_STORAGE = "common.media.SignedFileSystemStorage"
+    if MEDIA_CONTENT_ADDRESSED:
+        DEFAULT_FILE_STORAGE = "aws.storages.ContentAddressedFileSystemStorage"
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 
 # DRF
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework.authentication.TokenAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("auth_ex.authentication.CachedTokenAuthentication",),
     "DEFAULT_RENDERER_CLASSES": (
         "djangorestframework_camel_case.render.CamelCaseJSONRenderer",
         "djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer",
@@ -192,7 +212,7 @@ REST_FRAMEWORK = {
         "djangorestframework_camel_case.parser.CamelCaseMultiPartParser",
         "djangorestframework_camel_case.parser.CamelCaseJSONParser",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "common.pagination.LimitOffsetOrKeysetPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -220,3 +240,53 @@ CELERY_TASK_ALWAYS_EAGER = env("CELERY_ALWAYS_EAGER")
 CELERY_BROKER_HOST = env("CELERY_BROKER_HOST")
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_BROKER_URL = f"redis://{CELERY_BROKER_HOST}:6379/0"
+
+
+# Cache, see common.cache. Redis deployed for Celery is used, with a separate database. Tests use
+# an in-process cache instead, see common.testing.
+CACHE_URL = env("CACHE_URL", default=f"redis://{CELERY_BROKER_HOST}:6379/1")
+CACHES = {
+    "default": {
+        "BACKEND": "common.cache.RedisCache",
+        "LOCATION": CACHE_URL,
+        "KEY_PREFIX": "blacksheeplearns",
+    }
+}
+# Share of a timeout randomly added or subtracted, so that entries do not expire together.
+CACHE_TIMEOUT_JITTER = 0.1
+# How long other processes wait for a value being computed before computing it themselves.
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_LOCAL_SIZE = 1024
+
+
+# Course cover images
+COURSE_COVER_WIDTHS = env.list("COURSE_COVER_WIDTHS", cast=int, default=[200, 400, 800, 1200])
+COURSE_COVER_FORMATS = env.list("COURSE_COVER_FORMATS", default=["JPEG", "WEBP"])
+# Saves changing the cover while a resize job is waiting do not enqueue another one. The lock
+# expires in case the job is lost.
+COURSE_COVER_RESIZE_LOCK_TIMEOUT = 600
+
+# Lesson files uploaded in parts, see lessons.uploads. Parts are kept in this directory until
+# the upload is completed unless S3 storage is used.
+UPLOAD_SESSION_DIRECTORY = env(
+    "UPLOAD_SESSION_DIRECTORY", default=os.path.join(tempfile.gettempdir(), "upload-sessions")
+)
+UPLOAD_MAX_PART_SIZE = env.int("UPLOAD_MAX_PART_SIZE", default=100 * 1024 * 1024)
+# S3 does not accept smaller parts, except for the last one.
+UPLOAD_MIN_PART_SIZE = env.int("UPLOAD_MIN_PART_SIZE", default=5 * 1024 * 1024)
+# Files uploaded by clients straight to the storage, see lessons.uploads.start_direct_upload.
+DIRECT_UPLOAD_EXPIRE = env.int("DIRECT_UPLOAD_EXPIRE", default=3600)
+# S3 does not accept larger objects in a single request.
+DIRECT_UPLOAD_MAX_SIZE = env.int("DIRECT_UPLOAD_MAX_SIZE", default=5 * 1024 * 1024 * 1024)
+# Fraction of correctly answered questions completing a test, see lessons.grading.
+TEST_PASS_THRESHOLD = env.float("TEST_PASS_THRESHOLD", default=0.8)
+
+# Media served by common.media.MediaView when S3 is not used. Backend can be switched to
+# common.media.XAccelRedirectBackend or common.media.XSendfileBackend to offload sending files.
+MEDIA_SERVE_BACKEND = env("MEDIA_SERVE_BACKEND", default="common.media.DjangoMediaBackend")
+MEDIA_ACCEL_REDIRECT_PREFIX = env("MEDIA_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+MEDIA_ACCESS_CHECK = "lessons.media.can_access_media"
+MEDIA_CACHE_MAX_AGE = 600
+# Names under these prefixes never change content, see aws.storages.ContentAddressedStorageMixin.
+MEDIA_IMMUTABLE_PREFIXES = ["blobs/"]
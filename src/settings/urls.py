@@ -14,14 +14,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
-from aws.views import health_check
+from aws.views import cache_stats, health_check
+from common.media import MediaView
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -43,6 +43,7 @@ urlpatterns = [
     path("api/v1/auth/", include("djoser.urls.authtoken")),
     path("api/v1/", include("courses.urls")),
     path("api/v1/", include("lessons.urls")),
+    path("api/v1/cache-stats/", cache_stats, name="cache-stats"),
 ]
 
 if settings.DEBUG:
@@ -60,4 +61,8 @@ if settings.DEBUG:
 
 
 if not settings.AWS_STORAGE_BUCKET_NAME:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", MediaView.as_view(), name="media"
+        )
+    ]
@@ -29,6 +29,7 @@ const CourseDetailsApp = {
         setupTest(){
             this.testQuestionIndex = 0;
             this.testQuestions = [];
+            this.testResult = null;
             if(this.lessonDetails.questions === undefined){
                 return;
             }
@@ -36,7 +37,7 @@ const CourseDetailsApp = {
                 this.testQuestions.push({
                     text: value.text,
                     answers: value.answers,
-                    markedCorrect: false
+                    selectedAnswerId: null
                 });
             });
             if(this.lessonDetails.questions.length > 0){
@@ -82,38 +83,39 @@ const CourseDetailsApp = {
             return this.lessonDetails.lessonType.toLowerCase() === "test";
         },
         getCorrectAnswersCounter() {
-            let correctAnswers = 0;
-            this.testQuestions.forEach((value, index, array) => {
-                if (value.markedCorrect)
-                    correctAnswers++;
-            });
-            return correctAnswers + '/' + this.testQuestions.length;
+            if (this.testResult === null)
+                return '';
+            return this.testResult.correctCount + '/' + this.testResult.questionCount;
         },
-        checkAnswer(event){
-            const correctAnswers = this.currentTestQuestion.answers.filter((answer) => {
-                return answer.isCorrect
-            });
-            const correctId = correctAnswers.map((answer) => {return answer.id})[0];
-            if (this.selectedAnswerId !== null && Number(this.selectedAnswerId) === correctId){
-                this.currentTestQuestion.markedCorrect = true;
-            } else {
-                this.currentTestQuestion.markedCorrect = false;
-                if(this.selectedAnswerId !== null ){
-                    let answerLabel = document.getElementById('answer-' + this.selectedAnswerId);
-                    answerLabel.classList.add('incorrect-answer');
+        async submitTest(){
+            const answers = this.testQuestions.filter((question) => {
+                return question.selectedAnswerId !== null
+            }).map((question) => {return question.selectedAnswerId});
+            const response = await axios.post(
+                '/api/v1/lessons/' + this.lessonId + '/submit/',
+                {answers: answers},
+                {
+                    headers: {
+                        Authorization: 'Token ' + window.localStorage.token
+                    }
                 }
+            );
+            this.testResult = response.data;
+            if (this.testResult.isComplete && !this.lessonDetails.isComplete){
+                this.lessonDetails.isComplete = true;
+                await this.fillSectionsList();
             }
-            let correctAnswerLabel = document.getElementById('answer-' + correctId);
-            correctAnswerLabel.classList.add('correct-answer');
         },
         selectAnswer(event){
-            this.selectedAnswerId = event.target.id;
+            this.currentTestQuestion.selectedAnswerId = Number(event.target.id);
         },
         moveToNextQuestion(){
             if (this.testQuestionIndex < this.testQuestions.length)
                 this.testQuestionIndex++;
             if(!this.isBeyondLastQuestion())
                 this.setCurrentTestQuestion();
+            else if(this.testResult === null)
+                this.submitTest().then();
         },
         moveToPreviousQuestion() {
             if(this.testQuestionIndex > 1)
@@ -136,7 +138,7 @@ const CourseDetailsApp = {
             testQuestionIndex: 0,
             testQuestions: [],
             currentTestQuestion: null,
-            selectedAnswerId: null
+            testResult: null
         }
     },
     mounted() {